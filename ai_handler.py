@@ -1,132 +1,267 @@
 """
 AI response generation with tool calling support
+
+Streamlit adapter over chat_engine.ChatEngine: builds the message history
+from session state, drives the async engine on a shared event loop and
+renders its events.
 """
+import asyncio
 import json
+import queue
+import threading
+import time
 import streamlit as st
 import logging
-from litellm import completion
-from prompts import get_prompt
-from tools_executor import execute_tool
-from config import TOOL_DEFINITIONS, MAX_TOOL_ITERATIONS, MAX_TOKENS
+from prompts import get_prompt, searches_on_first_turn
+from chat_engine import ChatEngine, FALLBACK_RESPONSE, TIMEOUT_RESPONSE
+from answer_cache import AnswerCache
+from conversation_context import ConversationContext
+from config import PREFETCH_RECIPE_SEARCH, MAX_SESSION_TRACES, TOOL_PLANNING_MODEL
+import tracing
 
 logger = logging.getLogger(__name__)
 
+_DONE = object()
+
 
-def generate_response(user_message: str) -> str:
+def generate_response(user_message: str, stream: bool = False, ingredients: list = None):
     """
     Generate AI response with tool calling support
     
     Args:
         user_message: User's input message
+        stream: If True, return a generator that yields text as it arrives
+        ingredients: Ingredient list behind a templated first prompt; enables
+            the shared answer cache for that prompt
     
     Returns:
-        AI-generated response string
+        AI-generated response string, or a generator of text chunks
+        when streaming
+    """
+    chunks = _generate(user_message, stream, ingredients)
+    
+    if stream:
+        return chunks
+    
+    return "".join(chunks)
+
+
+def _generate(user_message: str, stream: bool, ingredients: list = None):
     """
+    Run one user turn through the chat engine, yielding response text
+    
+    In non-streaming mode the final response is yielded once. In streaming
+    mode every content delta is yielded as soon as it arrives.
+    """
+    trace = []
+    
     try:
+        # Only the first prompt of a chat is answered from the cache
+        use_cache = bool(ingredients) and not any(
+            m["role"] == "user" for m in st.session_state.messages
+        )
+        cache_scope = (st.session_state.model, st.session_state.prompt_type)
+        
         # Add user message
         st.session_state.messages.append({"role": "user", "content": user_message})
         
-        # Prepare messages with system prompt
+        if use_cache:
+            cached = _get_answer_cache().get(ingredients, cache_scope)
+            if cached:
+                for call in cached["transcript"]:
+                    status = st.status(f"♻️ {call['name']} - จากแคช", state="complete", expanded=False)
+                    _write_tool_arguments(status, call["arguments"])
+                    _write_tool_result(status, call["result"])
+                
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": cached["answer"]
+                })
+                yield cached["answer"]
+                return
+        
         system_prompt = get_prompt(st.session_state.prompt_type)
-        messages = [
-            {"role": "system", "content": system_prompt}
-        ] + st.session_state.messages
+        context = ConversationContext(model=st.session_state.model)
+        engine = ChatEngine(
+            model=st.session_state.model,
+            temperature=st.session_state.temperature,
+            planner_model=TOOL_PLANNING_MODEL
+        )
+        
+        # With a prompt that searches right away, the model almost always
+        # searches recipes for a known pantry next, so start that search
+        # alongside the first completion. The cooking prompts ask questions
+        # first, and a started search cannot be called back.
+        prefetch = []
+        if use_cache and PREFETCH_RECIPE_SEARCH and \
+           searches_on_first_turn(st.session_state.prompt_type):
+            prefetch.append(("search_recipes", {"ingredients": ingredients}))
+        
+        events = _run_turn(
+            engine,
+            context,
+            system_prompt,
+            list(st.session_state.messages),
+            st.session_state.context_state,
+            stream,
+            prefetch,
+            trace
+        )
+        
+        statuses = {}
+        transcript = []
         
-        # Tool calling loop
-        for iteration in range(MAX_TOOL_ITERATIONS):
-            response = completion(
-                model=st.session_state.model,
-                messages=messages,
-                temperature=st.session_state.temperature,
-                max_tokens=MAX_TOKENS,
-                tools=TOOL_DEFINITIONS,
-                tool_choice="auto"
-            )
+        for event in _iterate_events(events):
+            if event["type"] == "token":
+                yield event["text"]
             
-            message = response.choices[0].message
+            elif event["type"] == "tool_start":
+                # Show tool execution status
+                status = st.status(f"🔧 ใช้เครื่องมือ: {event['name']}", expanded=False)
+                _write_tool_arguments(status, event["arguments"])
+                statuses[event["id"]] = (status, event["arguments"])
             
-            # Check for tool calls
-            if hasattr(message, 'tool_calls') and message.tool_calls:
-                # Process tool calls
-                messages = _process_tool_calls(messages, message)
-                continue  # Continue to next iteration
+            elif event["type"] == "tool_end":
+                status, arguments = statuses[event["id"]]
+                _write_tool_result(status, event["result"])
+                status.update(label=f"✅ {event['name']} - สำเร็จ", state="complete")
+                transcript.append({
+                    "name": event["name"],
+                    "arguments": arguments,
+                    "result": event["result"]
+                })
             
-            else:
-                # No more tool calls - this is the final response
-                final_response = message.content or "ขออภัยครับ ไม่สามารถสร้างคำตอบได้"
-                
+            elif event["type"] == "final":
                 # Save assistant response
                 st.session_state.messages.append({
                     "role": "assistant",
-                    "content": final_response
+                    "content": event["content"]
                 })
                 
-                return final_response
-        
-        # Max iterations reached
-        error_msg = "⚠️ ระบบใช้เวลานานเกินไป กรุณาลองใหม่อีกครั้ง"
-        st.session_state.messages.append({"role": "assistant", "content": error_msg})
-        return error_msg
+                if use_cache and event["content"] not in (FALLBACK_RESPONSE, TIMEOUT_RESPONSE):
+                    _get_answer_cache().put(ingredients, cache_scope, event["content"], transcript)
+                
+                # Streamed content has already been yielded
+                if not event["streamed"]:
+                    yield event["content"]
     
     except Exception as e:
         logger.error(f"Response generation error: {str(e)}", exc_info=True)
         error_msg = "ขออภัยครับ เกิดข้อผิดพลาด กรุณาลองใหม่อีกครั้ง"
         st.session_state.messages.append({"role": "assistant", "content": error_msg})
-        return error_msg
+        yield error_msg
+    
+    finally:
+        if trace:
+            record_trace(trace)
 
 
-def _process_tool_calls(messages: list, message) -> list:
+def record_trace(trace: list):
+    """Keep the most recent traces of this session for the debug panel"""
+    st.session_state.traces = ([trace] + st.session_state.get("traces", []))[:MAX_SESSION_TRACES]
+
+
+def _write_tool_arguments(status, arguments: dict):
+    """Write tool call parameters into a status panel"""
+    params = json.dumps(arguments, ensure_ascii=False)
+    status.write(f"**พารามิเตอร์:** `{params}`")
+
+
+def _write_tool_result(status, tool_result: str):
+    """Write a preview of a tool result into a status panel"""
+    status.write("**ผลลัพธ์:**")
+    preview = tool_result[:300] + "..." if len(tool_result) > 300 else tool_result
+    status.write(preview)
+
+
+@st.cache_resource
+def _get_answer_cache() -> AnswerCache:
+    """Answer cache shared by all sessions"""
+    return AnswerCache()
+
+
+async def _run_turn(engine, context, system_prompt, history, context_state, stream,
+                    prefetch=None, trace=None):
     """
-    Process tool calls from the AI model
+    Build the token-budgeted prompt and run the engine for one turn
     
     Args:
-        messages: Current message history
-        message: Message object with tool calls
+        engine: ChatEngine instance
+        context: ConversationContext instance
+        system_prompt: System prompt text
+        history: Snapshot of the conversation including the new user message
+        context_state: Rolling summary state, updated in place
+        stream: Stream content tokens as they arrive
+        prefetch: Tool calls to start speculatively
+        trace: List that receives the turn's serialized spans
     
-    Returns:
-        Updated message history
+    Yields:
+        Engine events
     """
-    # Add assistant message with tool calls
-    tool_calls_list = [
-        {
-            "id": tc.id,
-            "type": "function",
-            "function": {
-                "name": tc.function.name,
-                "arguments": tc.function.arguments
-            }
-        }
-        for tc in message.tool_calls
-    ]
-    
-    messages.append({
-        "role": "assistant",
-        "content": message.content or "",
-        "tool_calls": tool_calls_list
-    })
-    
-    # Execute tools
-    for tool_call in message.tool_calls:
-        func_name = tool_call.function.name
-        func_args = json.loads(tool_call.function.arguments)
-        
-        # Show tool execution status
-        with st.status(f"🔧 ใช้เครื่องมือ: {func_name}", expanded=False) as status:
-            st.write(f"**พารามิเตอร์:** `{json.dumps(func_args, ensure_ascii=False)}`")
+    with tracing.span("turn", model=engine.model, planner_model=engine.planner_model, stream=stream) as root:
+        try:
+            with tracing.span("context.build"):
+                messages = await context.build(system_prompt, history, context_state)
             
-            tool_result = execute_tool(func_name, func_args)
+            async for event in engine.run(messages, stream=stream, prefetch=prefetch):
+                yield event
+        finally:
+            if trace is not None:
+                root.end = time.time()
+                trace.extend(tracing.trace_to_dicts(root))
+
+
+@st.cache_resource
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """Start the background event loop shared by all sessions"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(
+        target=loop.run_forever,
+        name="chat-engine-loop",
+        daemon=True
+    )
+    thread.start()
+    return loop
+
+
+def _iterate_events(events):
+    """
+    Consume an async event generator from the Streamlit script thread
+    
+    The generator runs on the shared event loop. If the script run stops
+    early (rerun, disconnect or a closed generator), the engine task is
+    cancelled so its completion and tool calls are abandoned.
+    
+    Args:
+        events: Async generator of engine events
+    
+    Yields:
+        Engine events in order
+    """
+    results = queue.Queue()
+    
+    async def pump():
+        try:
+            async for event in events:
+                results.put(event)
+        except Exception as e:
+            results.put(e)
+        finally:
+            await events.aclose()
+            results.put(_DONE)
+    
+    future = asyncio.run_coroutine_threadsafe(pump(), _get_event_loop())
+    
+    try:
+        while True:
+            item = results.get()
             
-            st.write("**ผลลัพธ์:**")
-            preview = tool_result[:300] + "..." if len(tool_result) > 300 else tool_result
-            st.write(preview)
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
             
-            status.update(label=f"✅ {func_name} - สำเร็จ", state="complete")
-        
-        # Add tool result to messages
-        messages.append({
-            "role": "tool",
-            "content": tool_result,
-            "tool_call_id": tool_call.id
-        })
-    
-    return messages
\ No newline at end of file
+            yield item
+    finally:
+        if not future.done():
+            future.cancel()
@@ -0,0 +1,154 @@
+"""
+Answer cache for the templated first prompt of home page chats
+
+Stores the final answer and tool transcript per canonical ingredient set so
+repeated pantries skip the whole tool loop. A pantry that differs only in
+spelling ("tomatoe" for "tomato") reuses the stored answer; any other
+difference is a miss, since the answer names the pantry's ingredients.
+"""
+import threading
+import time
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+from cook_tool import canonicalize_ingredients
+from config import (
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_MAX_ENTRIES,
+    INGREDIENT_SPELLING_SIMILARITY
+)
+
+
+class AnswerCache:
+    """Thread-safe TTL + LRU cache of final answers keyed by ingredient set"""
+
+    def __init__(
+        self,
+        ttl: float = ANSWER_CACHE_TTL,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES
+    ):
+        """
+        Initialize answer cache
+
+        Args:
+            ttl: Seconds an entry stays valid
+            max_entries: Maximum number of entries before LRU eviction
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ingredients: List[str], scope: Tuple) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached answer for an ingredient set
+
+        Args:
+            ingredients: Ingredient names as entered by the user
+            scope: Settings the answer depends on (model, prompt type, ...)
+
+        Returns:
+            Entry with "answer" and "transcript", or None on a miss
+        """
+        canonical = canonicalize_ingredients(ingredients)
+        if not canonical:
+            return None
+
+        now = time.time()
+        key = (scope, canonical)
+
+        with self._lock:
+            self._evict_expired(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                stored = [k for k in self._entries if k[0] == scope and len(k[1]) == len(canonical)]
+
+        if entry is None:
+            # Compare spellings outside the lock, over a snapshot of the keys
+            key = self._find_near_match(canonical, stored)
+
+        with self._lock:
+            entry = self._entries.get(key) if key else None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(
+        self,
+        ingredients: List[str],
+        scope: Tuple,
+        answer: str,
+        transcript: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Store the final answer and tool transcript for an ingredient set
+
+        Args:
+            ingredients: Ingredient names as entered by the user
+            scope: Settings the answer depends on
+            answer: Final assistant answer
+            transcript: Tool calls made during the turn (name, arguments, result)
+        """
+        canonical = canonicalize_ingredients(ingredients)
+        if not canonical:
+            return
+
+        with self._lock:
+            key = (scope, canonical)
+            self._entries[key] = {
+                "answer": answer,
+                "transcript": transcript,
+                "expires": time.time() + self.ttl
+            }
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _evict_expired(self, now: float) -> None:
+        """Drop expired entries (caller holds the lock)"""
+        expired = [k for k, e in self._entries.items() if e["expires"] <= now]
+        for key in expired:
+            del self._entries[key]
+
+    def _find_near_match(self, canonical: Tuple[str, ...], keys: List[Tuple]) -> Optional[Tuple]:
+        """Find a stored key whose ingredient set equals this one up to spelling"""
+        for key in keys:
+            if same_ingredients(canonical, key[1]):
+                return key
+        return None
+
+
+def same_ingredients(a: Tuple[str, ...], b: Tuple[str, ...]) -> bool:
+    """
+    Whether two ingredient sets are equal when near-identical spellings count as equal
+
+    Args:
+        a: First canonical ingredient set
+        b: Second canonical ingredient set
+
+    Returns:
+        True if every item of each set pairs up with a spelling of an item of the other
+    """
+    if len(a) != len(b):
+        return False
+
+    unmatched = list(b)
+
+    for item in a:
+        for i, other in enumerate(unmatched):
+            if item == other or \
+               SequenceMatcher(None, item, other).ratio() >= INGREDIENT_SPELLING_SIMILARITY:
+                del unmatched[i]
+                break
+        else:
+            return False
+
+    return True
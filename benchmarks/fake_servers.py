@@ -0,0 +1,361 @@
+"""
+Local stand-ins for every upstream ChefBot talks to
+
+One threaded HTTP server answers, under path prefixes:
+    /openai/v1/chat/completions      OpenAI-compatible chat API (stream + tools)
+    /spoonacular/recipes/...         Spoonacular findByIngredients
+    /usda/fdc/v1/foods/search        USDA FoodData Central search
+    /serper/search                   Serper
+    /tavily/search                   Tavily
+
+Latency and failure rates per upstream come from a profile, so the benchmark
+can simulate normal and degraded providers without network access.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse, parse_qs
+
+# Per-upstream latency (ms), jitter (ms) and failure rate (0..1).
+# For "openai", latency is time to first token and token_ms the delay
+# between streamed chunks.
+PROFILES = {
+    "fast": {
+        "openai": {"latency": 20, "jitter": 5, "token_ms": 1, "failure": 0.0},
+        "spoonacular": {"latency": 10, "jitter": 2, "failure": 0.0},
+        "usda": {"latency": 10, "jitter": 2, "failure": 0.0},
+        "serper": {"latency": 10, "jitter": 2, "failure": 0.0},
+        "tavily": {"latency": 10, "jitter": 2, "failure": 0.0},
+    },
+    "realistic": {
+        "openai": {"latency": 350, "jitter": 120, "token_ms": 15, "failure": 0.0},
+        "spoonacular": {"latency": 450, "jitter": 150, "failure": 0.0},
+        "usda": {"latency": 300, "jitter": 100, "failure": 0.0},
+        "serper": {"latency": 500, "jitter": 200, "failure": 0.0},
+        "tavily": {"latency": 800, "jitter": 300, "failure": 0.0},
+    },
+    "degraded": {
+        "openai": {"latency": 900, "jitter": 600, "token_ms": 25, "failure": 0.05},
+        "spoonacular": {"latency": 2000, "jitter": 1000, "failure": 0.2},
+        "usda": {"latency": 600, "jitter": 300, "failure": 0.1},
+        "serper": {"latency": 3000, "jitter": 2000, "failure": 0.5},
+        "tavily": {"latency": 900, "jitter": 300, "failure": 0.0},
+    },
+}
+
+FINAL_ANSWER = (
+    "จากวัตถุดิบที่คุณมี ผมแนะนำเมนูต่อไปนี้ครับ: "
+    "1. ผัดกะเพราไก่ 2. ไก่ผัดกระเทียม 3. ต้มยำไก่ "
+    "ต้องซื้อเพิ่มเล็กน้อย เช่น ใบกะเพรา น้ำปลา และมะนาว"
+)
+
+INGREDIENT_PREFIX = re.compile(r"วัตถุดิบคือ:\s*(.+)")
+
+
+class FakeUpstreams:
+    """Threaded HTTP server emulating all upstream APIs"""
+
+    def __init__(self, profile: str = "fast", seed: int = 0):
+        """
+        Initialize fake upstreams
+
+        Args:
+            profile: Name of a latency/failure profile in PROFILES
+            seed: Random seed for jitter and failure injection
+        """
+        self.profile = PROFILES[profile]
+        self.random = random.Random(seed)
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def env(self) -> Dict[str, str]:
+        """Environment variables that point ChefBot at these servers"""
+        return {
+            "OPENAI_API_KEY": "bench-openai",
+            "OPENAI_API_BASE": f"{self.base_url}/openai/v1",
+            "SPOONACULAR_API": "bench-spoonacular",
+            "SPOONACULAR_API_BASE": f"{self.base_url}/spoonacular",
+            "USDA_API_KEY": "bench-usda",
+            "USDA_API_BASE": f"{self.base_url}/usda/fdc/v1",
+            "SERPER_API_KEY": "bench-serper",
+            "SERPER_API_URL": f"{self.base_url}/serper/search",
+            "TAVILY_API_KEY": "bench-tavily",
+            "TAVILY_API_URL": f"{self.base_url}/tavily/search",
+        }
+
+    def start(self) -> "FakeUpstreams":
+        """Start serving on a free localhost port"""
+        upstreams = self
+
+        class Handler(_Handler):
+            fake = upstreams
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the server"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Copy of per-upstream counters (requests, failures, bytes)"""
+        with self._lock:
+            return {k: dict(v) for k, v in self.counters.items()}
+
+    def record(self, upstream: str, bytes_in: int, bytes_out: int, failed: bool) -> None:
+        """Update counters for one request"""
+        with self._lock:
+            c = self.counters.setdefault(
+                upstream, {"requests": 0, "failures": 0, "bytes_in": 0, "bytes_out": 0}
+            )
+            c["requests"] += 1
+            c["failures"] += int(failed)
+            c["bytes_in"] += bytes_in
+            c["bytes_out"] += bytes_out
+
+    def delay(self, upstream: str) -> float:
+        """Sample a response delay in seconds"""
+        settings = self.profile[upstream]
+        with self._lock:
+            jitter = self.random.uniform(-settings["jitter"], settings["jitter"])
+        return max(0.0, settings["latency"] + jitter) / 1000
+
+    def should_fail(self, upstream: str) -> bool:
+        """Sample failure injection"""
+        with self._lock:
+            return self.random.random() < self.profile[upstream]["failure"]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Routes requests to the emulated upstreams"""
+
+    fake: FakeUpstreams = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch(b"")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self._dispatch(self.rfile.read(length))
+
+    def _dispatch(self, body: bytes):
+        parsed = urlparse(self.path)
+        upstream = parsed.path.strip("/").split("/")[0]
+
+        if upstream not in self.fake.profile:
+            self.send_error(404)
+            return
+
+        bytes_in = len(body) + len(self.path)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        payload = json.loads(body) if body else {}
+
+        if self.fake.should_fail(upstream):
+            time.sleep(self.fake.delay(upstream))
+            self._send_json(503, {"error": "injected failure"}, upstream, bytes_in, failed=True)
+            return
+
+        if upstream == "openai":
+            self._chat_completion(payload, bytes_in)
+            return
+
+        time.sleep(self.fake.delay(upstream))
+
+        if upstream == "spoonacular":
+            data = _recipes(query.get("ingredients", "").split(","))
+        elif upstream == "usda":
+            data = _foods(query.get("query", "food"))
+        elif upstream == "serper":
+            data = {"organic": _web_results(payload.get("q", ""), payload.get("num", 5), "serper")}
+        else:
+            data = {"results": _web_results(payload.get("query", ""), payload.get("max_results", 5), "tavily")}
+
+        self._send_json(200, data, upstream, bytes_in)
+
+    def _send_json(self, status: int, data: Any, upstream: str, bytes_in: int, failed: bool = False):
+        out = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+        self.fake.record(upstream, bytes_in, len(out), failed)
+
+    def _chat_completion(self, payload: Dict[str, Any], bytes_in: int):
+        """Scripted assistant: call search_recipes once, then answer"""
+        messages = payload.get("messages", [])
+        content, tool_call = _script_reply(messages, bool(payload.get("tools")))
+        settings = self.fake.profile["openai"]
+
+        time.sleep(self.fake.delay("openai"))
+
+        if not payload.get("stream"):
+            message = {"role": "assistant", "content": content}
+            if tool_call:
+                message["tool_calls"] = [tool_call]
+            self._send_json(200, _completion(payload, message), "openai", bytes_in)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        bytes_out = 0
+        for delta in _stream_deltas(content, tool_call):
+            line = f"data: {json.dumps(_chunk(payload, delta), ensure_ascii=False)}\n\n".encode("utf-8")
+            self.wfile.write(line)
+            self.wfile.flush()
+            bytes_out += len(line)
+            time.sleep(settings["token_ms"] / 1000)
+
+        done = _chunk(payload, {}, finish_reason="tool_calls" if tool_call else "stop")
+        tail = f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8")
+        self.wfile.write(tail)
+        self.wfile.flush()
+        self.fake.record("openai", bytes_in, bytes_out + len(tail), False)
+
+
+def _script_reply(messages, has_tools: bool):
+    """Decide the scripted reply: (content, tool_call or None)"""
+    last = messages[-1] if messages else {}
+    text = last.get("content") or ""
+
+    if isinstance(text, list):
+        # Vision request
+        return json.dumps({"ingredients": [
+            {"name": "chicken", "confidence": 0.95},
+            {"name": "garlic", "confidence": 0.9},
+            {"name": "chili", "confidence": 0.85},
+        ]}), None
+
+    if not has_tools:
+        if "Translate" in text:
+            listed = text.split(":", 1)[-1].split("\n\n")[0]
+            count = max(1, len([i for i in listed.split(",") if i.strip()]))
+            return ", ".join(f"ingredient{i}" for i in range(count)), None
+        return "Summary of the conversation so far.", None
+
+    if last.get("role") == "tool":
+        return FINAL_ANSWER, None
+
+    match = INGREDIENT_PREFIX.search(text)
+    ingredients = [i.strip() for i in (match.group(1) if match else text).split("\n")[0].split(",") if i.strip()]
+
+    return None, {
+        "id": f"call_{abs(hash(text)) % 10 ** 8}",
+        "type": "function",
+        "function": {
+            "name": "search_recipes",
+            "arguments": json.dumps({"ingredients": ingredients}, ensure_ascii=False)
+        }
+    }
+
+
+def _stream_deltas(content: Optional[str], tool_call: Optional[Dict[str, Any]]):
+    """Split a reply into streaming deltas"""
+    if tool_call:
+        arguments = tool_call["function"]["arguments"]
+        yield {"role": "assistant", "tool_calls": [{
+            "index": 0,
+            "id": tool_call["id"],
+            "type": "function",
+            "function": {"name": tool_call["function"]["name"], "arguments": ""}
+        }]}
+        for i in range(0, len(arguments), 16):
+            yield {"tool_calls": [{"index": 0, "function": {"arguments": arguments[i:i + 16]}}]}
+        return
+
+    words = (content or "").split(" ")
+    yield {"role": "assistant", "content": words[0]}
+    for word in words[1:]:
+        yield {"content": " " + word}
+
+
+def _chunk(payload, delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": payload.get("model", "bench"),
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+
+
+def _completion(payload, message):
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "bench"),
+        "choices": [{
+            "index": 0,
+            "message": message,
+            "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"
+        }],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150}
+    }
+
+
+def _recipes(ingredients):
+    ingredients = [i.strip() for i in ingredients if i.strip()] or ["chicken"]
+    recipes = []
+    for n in range(5):
+        used = ingredients[: max(1, len(ingredients) - n)]
+        recipes.append({
+            "id": 1000 + n,
+            "title": f"Bench Recipe {n + 1}",
+            "image": f"https://img.example/{1000 + n}.jpg",
+            "usedIngredientCount": len(used),
+            "missedIngredientCount": n + 1,
+            "usedIngredients": [
+                {"name": name, "amount": 1.0, "unit": "cup", "aisle": "Produce"} for name in used
+            ],
+            "missedIngredients": [
+                {"name": f"extra{m}", "amount": 2.0, "unit": "tbsp", "aisle": "Spices"}
+                for m in range(n + 1)
+            ],
+            "unusedIngredients": [],
+        })
+    return recipes
+
+
+def _foods(query):
+    return {"foods": [{
+        "description": query.upper(),
+        "foodNutrients": [
+            {"nutrientName": "Energy", "value": 120.0, "unitName": "KCAL"},
+            {"nutrientName": "Protein", "value": 22.5, "unitName": "G"},
+            {"nutrientName": "Total lipid (fat)", "value": 2.6, "unitName": "G"},
+            {"nutrientName": "Carbohydrate, by difference", "value": 0.0, "unitName": "G"},
+        ]
+    }]}
+
+
+def _web_results(query, num, source):
+    return [{
+        "title": f"{query} result {i + 1}",
+        ("link" if source == "serper" else "url"): f"https://example.com/{source}/{i}",
+        ("snippet" if source == "serper" else "content"): f"Snippet {i + 1} for {query}",
+    } for i in range(int(num or 5))]
@@ -0,0 +1,299 @@
+"""
+Offline end-to-end benchmark for ChefBot
+
+Runs the chat turn pipeline (ConversationContext + ChatEngine, the same
+objects generate_response drives), every tool through run_tool and image
+ingredient detection against local fake upstreams, then reports latency
+percentiles, LLM calls per turn and bytes sent.
+
+Usage:
+    python -m benchmarks.run_benchmark                      # fast profile
+    python -m benchmarks.run_benchmark --profile realistic --turns 30
+    python -m benchmarks.run_benchmark --save-baseline      # record baseline
+    python -m benchmarks.run_benchmark --compare            # fail on regression
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+from typing import Any, Callable, Dict, List
+
+from benchmarks.fake_servers import FakeUpstreams, PROFILES
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+PANTRIES = [
+    ["ไก่", "กระเทียม", "พริก"],
+    ["chicken", "garlic", "chili"],
+    ["หมู", "หอมใหญ่", "กระเทียม", "พริก"],
+    ["egg", "rice", "soy sauce", "green onion"],
+    ["กุ้ง", "ตะไคร้", "ข่า", "ใบมะกรูด", "มะนาว"],
+]
+
+TOOL_CALLS = [
+    ("search_recipes", {"ingredients": ["chicken", "garlic", "chili"]}),
+    ("search_recipes", {"ingredients": ["ไก่", "กระเทียม"]}),
+    ("get_nutrition", {"ingredient": "chicken breast"}),
+    ("get_nutrition", {"ingredient": "กระเทียม"}),
+    ("get_nutrition_batch", {"ingredients": ["หมู", "กระเทียม", "พริก", "ไข่", "ข้าว", "มะนาว"]}),
+    ("search_web", {"query": "วิธีทำต้มยำกุ้ง", "num_results": 5}),
+]
+
+# 1x1 transparent PNG
+TINY_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+
+# Provider keys the fakes do not stand in for; blanked so nothing (such as
+# the Groq tool planner or hedge backups) reaches a real upstream
+UNFAKED_API_KEYS = [
+    "GROQ_API_KEY",
+    "ANTHROPIC_API_KEY",
+    "GEMINI_API_KEY",
+    "MISTRAL_API_KEY",
+    "COHERE_API_KEY",
+    "AZURE_API_KEY",
+]
+
+# Relative increase tolerated before --compare reports a regression
+LATENCY_TOLERANCE = 0.20
+COUNT_TOLERANCE = 0.05
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Recorder:
+    """Collects per-operation latency and upstream usage"""
+
+    def __init__(self, fake: FakeUpstreams):
+        self.fake = fake
+        self.samples = []
+
+    def measure(self, run: Callable[[], Dict[str, Any]]) -> None:
+        """Run one operation serially and record its deltas"""
+        before = self.fake.snapshot()
+        start = time.perf_counter()
+        extra = run() or {}
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        after = self.fake.snapshot()
+
+        llm_calls = _delta(before, after, "openai", "requests")
+        bytes_sent = sum(_delta(before, after, u, "bytes_in") for u in after)
+        self.samples.append({"ms": elapsed_ms, "llm_calls": llm_calls, "bytes_sent": bytes_sent, **extra})
+
+    def summary(self) -> Dict[str, float]:
+        """Aggregate recorded samples"""
+        n = len(self.samples)
+        latencies = [s["ms"] for s in self.samples]
+        result = {
+            "n": n,
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "llm_calls_per_op": round(sum(s["llm_calls"] for s in self.samples) / max(n, 1), 2),
+            "bytes_sent_per_op": round(sum(s["bytes_sent"] for s in self.samples) / max(n, 1)),
+        }
+        ttft = [s["ttft_ms"] for s in self.samples if s.get("ttft_ms") is not None]
+        if ttft:
+            result["ttft_p50_ms"] = round(percentile(ttft, 50), 1)
+            result["ttft_p95_ms"] = round(percentile(ttft, 95), 1)
+        return result
+
+
+def _delta(before, after, upstream, field) -> int:
+    return after.get(upstream, {}).get(field, 0) - before.get(upstream, {}).get(field, 0)
+
+
+def bench_chat_turns(fake: FakeUpstreams, turns: int) -> Dict[str, float]:
+    """First-turn chat from a home page pantry, as generate_response runs it"""
+    from chat_engine import ChatEngine
+    from conversation_context import ConversationContext, new_context_state
+    from prompts import get_prompt, searches_on_first_turn
+    from config import DEFAULT_MODEL, DEFAULT_TEMPERATURE, PREFETCH_RECIPE_SEARCH, TOOL_PLANNING_MODEL
+
+    recorder = Recorder(fake)
+    loop = asyncio.new_event_loop()
+
+    async def one_turn(pantry):
+        prompt = f"ฉันมีวัตถุดิบคือ: {', '.join(pantry)}\n\nช่วยแนะนำเมนูอาหารที่เหมาะสมหน่อยครับ"
+        history = [{"role": "user", "content": prompt}]
+        context = ConversationContext(model=DEFAULT_MODEL)
+        engine = ChatEngine(
+            model=DEFAULT_MODEL,
+            temperature=DEFAULT_TEMPERATURE,
+            planner_model=TOOL_PLANNING_MODEL
+        )
+        prefetch = []
+        if PREFETCH_RECIPE_SEARCH and searches_on_first_turn("cooking"):
+            prefetch.append(("search_recipes", {"ingredients": pantry}))
+
+        start = time.perf_counter()
+        ttft = None
+        messages = await context.build(get_prompt("cooking"), history, new_context_state())
+        async for event in engine.run(messages, stream=True, prefetch=prefetch):
+            if event["type"] == "token" and ttft is None:
+                ttft = (time.perf_counter() - start) * 1000
+        return {"ttft_ms": ttft}
+
+    try:
+        for i in range(turns):
+            pantry = PANTRIES[i % len(PANTRIES)]
+            recorder.measure(lambda: loop.run_until_complete(one_turn(pantry)))
+    finally:
+        # As asyncio.run does: finalize SDK stream generators before closing
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+    return recorder.summary()
+
+
+def bench_tools(fake: FakeUpstreams, rounds: int) -> Dict[str, Dict[str, float]]:
+    """Every tool through run_tool (translation included)"""
+    from tools_executor import run_tool
+
+    recorders = {}
+    for _ in range(rounds):
+        for name, arguments in TOOL_CALLS:
+            recorder = recorders.setdefault(name, Recorder(fake))
+            recorder.measure(lambda: run_tool(name, arguments) and None)
+
+    return {name: recorder.summary() for name, recorder in recorders.items()}
+
+
+def bench_vision(fake: FakeUpstreams, rounds: int) -> Dict[str, float]:
+    """Ingredient detection from an uploaded image"""
+    from utils.vision import detect_ingredients_from_image
+
+    recorder = Recorder(fake)
+    for _ in range(rounds):
+        recorder.measure(lambda: detect_ingredients_from_image(BytesIO(TINY_PNG)) and None)
+
+    return recorder.summary()
+
+
+def run(profile: str, turns: int, seed: int) -> Dict[str, Any]:
+    """Start fake upstreams, point ChefBot at them and run every scenario"""
+    fake = FakeUpstreams(profile, seed).start()
+
+    # Must happen before ChefBot modules read their configuration
+    os.environ.update(fake.env())
+    os.environ.update({key: "" for key in UNFAKED_API_KEYS})
+    os.environ["CHEFBOT_TRACE_FILE"] = ""
+    os.environ["CHEFBOT_TRANSLATION_CACHE"] = ""
+    # Fresh disk cache per run so results do not depend on earlier runs
+    os.environ["CHEFBOT_CACHE_DB"] = os.path.join(tempfile.mkdtemp(prefix="chefbot-bench-"), "cache.sqlite")
+    os.environ["CHEFBOT_RECIPE_INDEX"] = ""
+    os.environ["CHEFBOT_RATE_LIMITS"] = "off"
+
+    try:
+        results = {"chat_turn": bench_chat_turns(fake, turns)}
+        for name, summary in bench_tools(fake, max(1, turns // 2)).items():
+            results[f"tool.{name}"] = summary
+        results["vision"] = bench_vision(fake, max(1, turns // 4))
+        return {"profile": profile, "turns": turns, "results": results}
+    finally:
+        fake.stop()
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Compare results against a baseline
+
+    Returns:
+        List of regression descriptions (empty if none)
+    """
+    regressions = []
+    checks = [
+        ("p95_ms", LATENCY_TOLERANCE),
+        ("ttft_p95_ms", LATENCY_TOLERANCE),
+        ("llm_calls_per_op", COUNT_TOLERANCE),
+        ("bytes_sent_per_op", COUNT_TOLERANCE),
+    ]
+
+    for scenario, base in baseline["results"].items():
+        now = current["results"].get(scenario)
+        if now is None:
+            continue
+        for metric, tolerance in checks:
+            if metric not in base or metric not in now:
+                continue
+            limit = base[metric] * (1 + tolerance)
+            if now[metric] > limit and now[metric] - base[metric] > 1:
+                regressions.append(
+                    f"{scenario}.{metric}: {now[metric]} > baseline {base[metric]} (+{tolerance:.0%})"
+                )
+
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print results as a table"""
+    print(f"\nChefBot benchmark — profile '{report['profile']}', {report['turns']} turns\n")
+    header = f"{'scenario':<24}{'n':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'ttft50':>9}{'llm/op':>8}{'bytes/op':>10}"
+    print(header)
+    print("─" * len(header))
+    for scenario, r in report["results"].items():
+        ttft = f"{r['ttft_p50_ms']:.0f}" if "ttft_p50_ms" in r else "-"
+        print(
+            f"{scenario:<24}{r['n']:>5}{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}{r['p99_ms']:>9.0f}"
+            f"{ttft:>9}{r['llm_calls_per_op']:>8}{r['bytes_sent_per_op']:>10}"
+        )
+    print("\n(latencies in ms)")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline ChefBot benchmark")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="fast")
+    parser.add_argument("--turns", type=int, default=20, help="Chat turns to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write results to this file")
+    parser.add_argument("--save-baseline", action="store_true", help="Save results as the profile baseline")
+    parser.add_argument("--compare", action="store_true", help="Exit 1 if results regress from the baseline")
+    args = parser.parse_args(argv)
+
+    report = run(args.profile, args.turns, args.seed)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    baseline_path = os.path.join(BASELINE_DIR, f"{args.profile}.json")
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {baseline_path}")
+
+    if args.compare:
+        if not os.path.exists(baseline_path):
+            print(f"\nNo baseline at {baseline_path}; run with --save-baseline first")
+            return 1
+        with open(baseline_path, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f))
+        if regressions:
+            print("\n❌ Regressions:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\n✅ No regressions against baseline")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
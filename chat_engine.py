@@ -0,0 +1,446 @@
+"""
+Async orchestration core for the tool calling loop
+
+The engine is independent of Streamlit: callers pass in the message history
+and settings, then consume events from ChatEngine.run(). Cancelling the task
+that iterates run() stops the in-flight completion and abandons pending tools.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from utils.llm_router import acompletion
+import tracing
+from tools_executor import available_tools, run_tool, tool_call_key, warm_translations
+from config import (
+    MAX_TOOL_ITERATIONS,
+    MAX_TOKENS,
+    MAX_TOOL_WORKERS,
+    PLANNER_MAX_TOKENS
+)
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_RESPONSE = "ขออภัยครับ ไม่สามารถสร้างคำตอบได้"
+TIMEOUT_RESPONSE = "⚠️ ระบบใช้เวลานานเกินไป กรุณาลองใหม่อีกครั้ง"
+
+
+class ChatEngine:
+    """
+    Tool calling loop built on litellm acompletion
+
+    run() yields event dictionaries:
+        {"type": "token", "text": str}
+        {"type": "tool_start", "id": str, "name": str, "arguments": dict}
+        {"type": "tool_end", "id": str, "name": str, "result": str}
+        {"type": "final", "content": str, "streamed": bool}
+
+    The tool executor may return a plain string or a dictionary with
+    "content" (sent back to the model) and "display" (shown to the user);
+    tool_end events carry the display rendering.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        temperature: float,
+        max_tokens: int = MAX_TOKENS,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_executor: Callable[[str, dict], Any] = run_tool,
+        max_iterations: int = MAX_TOOL_ITERATIONS,
+        max_tool_workers: int = MAX_TOOL_WORKERS,
+        planner_model: Optional[str] = None,
+        tool_preparer: Optional[Callable[[List[Tuple[str, dict]]], None]] = warm_translations
+    ):
+        """
+        Initialize chat engine
+
+        Args:
+            model: Model name
+            temperature: Temperature for generation
+            max_tokens: Maximum tokens to generate per completion
+            tools: Tool definitions offered to the model (default: available_tools())
+            tool_executor: Synchronous function (name, arguments) -> result
+                string or {"content": ..., "display": ...}
+            max_iterations: Maximum completion calls per turn
+            max_tool_workers: Maximum tool calls running at once
+            planner_model: Low-latency model that decides on tool calls;
+                the main model is then only used to write the answer (turns
+                without tool calls pay the planner's time to first token too)
+            tool_preparer: Synchronous function given every (name, arguments)
+                of an assistant turn before the tools run (e.g. to batch
+                shared lookups)
+        """
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.tools = tools if tools is not None else available_tools()
+        self.tool_executor = tool_executor
+        self.max_iterations = max_iterations
+        self.max_tool_workers = max(1, max_tool_workers)
+        self.planner_model = planner_model if planner_model != model else None
+        self.tool_preparer = tool_preparer
+        self._prefetched = {}
+
+    async def run(
+        self,
+        messages: List[Dict[str, Any]],
+        stream: bool = True,
+        prefetch: Optional[List[Tuple[str, dict]]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run the tool calling loop for one user turn
+
+        Args:
+            messages: Full message history including the system prompt
+            stream: Stream content tokens as they arrive
+            prefetch: Tool calls (name, arguments) the model is expected to
+                make in this turn; they start alongside the first completion
+                and are used when a matching tool call arrives. Only pass
+                calls the prompt allows right away: an unused prefetch still
+                spends its upstream request
+
+        Yields:
+            Event dictionaries (see class docstring)
+        """
+        messages = list(messages)
+
+        self._prefetched = {
+            tool_call_key(name, arguments): asyncio.create_task(
+                self._prefetch_tool(name, arguments)
+            )
+            for name, arguments in (prefetch or [])
+        }
+
+        try:
+            async for event in self._run_loop(messages, stream):
+                yield event
+        finally:
+            # Prefetches the model never asked for are abandoned; this stops
+            # waiting for them, but a request already sent by the worker
+            # thread still completes (and fills the tool caches)
+            for task in self._prefetched.values():
+                task.cancel()
+
+    async def _run_loop(
+        self,
+        messages: List[Dict[str, Any]],
+        stream: bool
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Completion/tool iterations of one turn
+
+        With a planner model, each iteration first asks the planner for tool
+        calls. As soon as the planner starts answering in text instead, its
+        stream is closed and the main model writes the response (and may
+        still call tools itself). An iteration that ends without tools so
+        pays the planner's time to first token on top of the main model's;
+        the planner is skipped when no tools are offered and on the last
+        iteration, whose tool calls could not be answered anyway.
+        """
+        for iteration in range(self.max_iterations):
+            with tracing.span("iteration", index=iteration):
+                tool_calls = []
+                plan = self.planner_model and self.tools and iteration < self.max_iterations - 1
+
+                if plan:
+                    tool_calls = await self._plan(messages)
+                    content = ""
+
+                if not tool_calls:
+                    role = "final" if plan else "single"
+                    async for event in self._complete(messages, stream, self.model, role):
+                        if event["type"] == "token":
+                            yield event
+                        else:
+                            content, tool_calls = event["content"], event["tool_calls"]
+
+                # No more tool calls - this is the final response
+                if not tool_calls:
+                    yield {
+                        "type": "final",
+                        "content": content or FALLBACK_RESPONSE,
+                        "streamed": bool(stream and content)
+                    }
+                    return
+
+                messages.append({
+                    "role": "assistant",
+                    "content": content or "",
+                    "tool_calls": tool_calls
+                })
+
+                async for event in self._execute_tool_calls(tool_calls, messages):
+                    yield event
+
+        # Max iterations reached
+        yield {"type": "final", "content": TIMEOUT_RESPONSE, "streamed": False}
+
+    async def _plan(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Ask the planner model for tool calls
+
+        Returns:
+            Tool calls, or an empty list when the planner would answer in
+            text (or fails) and the main model should take over
+        """
+        try:
+            async for event in self._complete(
+                messages, True, self.planner_model, "planner", abort_on_content=True
+            ):
+                if event["type"] == "completion":
+                    return event["tool_calls"]
+
+        except Exception as e:
+            logger.warning(f"Planner {self.planner_model} failed, using {self.model}: {str(e)}")
+
+        return []
+
+    async def _complete(
+        self,
+        messages: List[Dict[str, Any]],
+        stream: bool,
+        model: str,
+        role: str,
+        abort_on_content: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Make one completion call
+
+        Yields token events while streaming, then a single
+        {"type": "completion", "content": str, "tool_calls": list} event.
+
+        Args:
+            messages: Message history
+            stream: Stream the response
+            model: Model to call
+            role: Routing role recorded in telemetry ("planner", "final", "single")
+            abort_on_content: Stop reading (and yield no tokens) once text
+                arrives before any tool call; used for planner calls
+        """
+        logger.info(f"Completion with {model} as {role}")
+
+        with tracing.span("llm.completion", model=model, role=role, stream=stream) as llm_span:
+            response = await acompletion(
+                model=model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=PLANNER_MAX_TOKENS if abort_on_content else self.max_tokens,
+                tools=self.tools,
+                tool_choice="auto",
+                stream=stream
+            )
+
+            if stream:
+                content_parts = []
+                tool_calls = {}
+
+                try:
+                    async for chunk in response:
+                        if not getattr(chunk, 'choices', None):
+                            continue
+
+                        if "ttft_ms" not in llm_span.attributes:
+                            llm_span.set("ttft_ms", round((time.time() - llm_span.start) * 1000))
+
+                        delta = chunk.choices[0].delta
+
+                        text = _get(delta, 'content')
+                        if text and abort_on_content:
+                            if not tool_calls:
+                                llm_span.set("aborted", True)
+                                break
+                        elif text:
+                            content_parts.append(text)
+                            yield {"type": "token", "text": text}
+
+                        merge_tool_call_deltas(tool_calls, _get(delta, 'tool_calls'))
+                finally:
+                    # Release the connection of a stream left unfinished
+                    if hasattr(response, "aclose"):
+                        await response.aclose()
+
+                content = "".join(content_parts)
+                tool_calls = [tool_calls[i] for i in sorted(tool_calls)]
+
+            else:
+                message = response.choices[0].message
+                content = message.content
+                tool_calls = [
+                    tool_call_to_dict(tc)
+                    for tc in (getattr(message, 'tool_calls', None) or [])
+                ]
+
+            llm_span.set("tool_calls", len(tool_calls))
+
+        yield {"type": "completion", "content": content, "tool_calls": tool_calls}
+
+    async def _execute_tool_calls(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        messages: List[Dict[str, Any]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute tool calls concurrently and append results to messages
+
+        Results are appended in tool call order once every call has finished.
+        """
+        semaphore = asyncio.Semaphore(self.max_tool_workers)
+        calls = [(tc["function"]["name"], parse_arguments(tc)) for tc in tool_calls]
+
+        for tool_call, (name, arguments) in zip(tool_calls, calls):
+            yield {
+                "type": "tool_start",
+                "id": tool_call["id"],
+                "name": name,
+                "arguments": arguments
+            }
+
+        if self.tool_preparer is not None:
+            with tracing.span("tool.prepare", calls=len(calls)):
+                try:
+                    await asyncio.to_thread(
+                        self.tool_preparer,
+                        [(name, arguments) for name, arguments in calls if arguments is not None]
+                    )
+                except Exception as e:
+                    logger.warning(f"Tool preparation failed: {str(e)}")
+
+        tasks = {
+            asyncio.create_task(self._run_tool(semaphore, name, arguments)): tool_call
+            for tool_call, (name, arguments) in zip(tool_calls, calls)
+        }
+
+        results = {}
+        pending = set(tasks)
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    tool_call = tasks[task]
+                    result = task.result()
+                    if isinstance(result, str):
+                        result = {"content": result, "display": result}
+                    results[tool_call["id"]] = result
+
+                    yield {
+                        "type": "tool_end",
+                        "id": tool_call["id"],
+                        "name": tool_call["function"]["name"],
+                        "result": result["display"]
+                    }
+        finally:
+            # Abandon unfinished tools when the turn is cancelled
+            for task in pending:
+                task.cancel()
+
+        for tool_call in tool_calls:
+            messages.append({
+                "role": "tool",
+                "content": results[tool_call["id"]]["content"],
+                "tool_call_id": tool_call["id"]
+            })
+
+    async def _prefetch_tool(self, name: str, arguments: dict):
+        """Run a speculative tool call on a worker thread"""
+        with tracing.span(f"prefetch.{name}"):
+            return await asyncio.to_thread(self.tool_executor, name, arguments)
+
+    async def _run_tool(
+        self,
+        semaphore: asyncio.Semaphore,
+        name: str,
+        arguments: Optional[dict]
+    ):
+        """Run a synchronous tool executor on a worker thread"""
+        if arguments is None:
+            return "❌ พารามิเตอร์ของเครื่องมือไม่ถูกต้อง"
+
+        with tracing.span(f"tool.{name}") as tool_span:
+            prefetched = self._prefetched.pop(tool_call_key(name, arguments), None)
+            if prefetched is not None:
+                logger.info(f"Using prefetched result for {name}")
+                tool_span.set("prefetched", True)
+                return await prefetched
+
+            async with semaphore:
+                return await asyncio.to_thread(self.tool_executor, name, arguments)
+
+
+def merge_tool_call_deltas(tool_calls: dict, deltas) -> None:
+    """
+    Merge streamed tool call fragments into tool_calls (keyed by index)
+
+    The first fragment of a call carries its id and function name, later
+    fragments only append to the JSON arguments string.
+    """
+    for delta in deltas or []:
+        index = _get(delta, 'index')
+        call_id = _get(delta, 'id')
+
+        if index is None:
+            # Some providers omit the index: a new id starts a new call
+            if call_id or not tool_calls:
+                index = len(tool_calls)
+            else:
+                index = max(tool_calls)
+
+        entry = tool_calls.setdefault(index, {
+            "id": "",
+            "type": "function",
+            "function": {"name": "", "arguments": ""}
+        })
+
+        if call_id:
+            entry["id"] = call_id
+
+        function = _get(delta, 'function')
+        if function is None:
+            continue
+
+        name = _get(function, 'name')
+        if name and not entry["function"]["name"]:
+            entry["function"]["name"] = name
+
+        arguments = _get(function, 'arguments')
+        if arguments:
+            entry["function"]["arguments"] += arguments
+
+
+def tool_call_to_dict(tool_call) -> Dict[str, Any]:
+    """Convert a tool call object into a message dictionary"""
+    return {
+        "id": tool_call.id,
+        "type": "function",
+        "function": {
+            "name": tool_call.function.name,
+            "arguments": tool_call.function.arguments
+        }
+    }
+
+
+def parse_arguments(tool_call: Dict[str, Any]) -> Optional[dict]:
+    """
+    Parse the JSON arguments of a tool call
+
+    Returns:
+        Arguments dictionary, or None if the JSON is invalid
+    """
+    func_name = tool_call["function"]["name"]
+    try:
+        return json.loads(tool_call["function"]["arguments"] or "{}")
+    except json.JSONDecodeError as e:
+        logger.error(f"Invalid tool arguments for {func_name}: {str(e)}")
+        return None
+
+
+def _get(obj, name: str):
+    """Read a field from a response object or dictionary"""
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
@@ -0,0 +1,205 @@
+"""
+Per-provider circuit breakers
+
+Each upstream gets a breaker that watches its recent calls. When too many
+of them fail or are too slow, the breaker opens and calls fail immediately
+(so callers fall back or report an error at once) instead of each waiting
+out a timeout. After a cool-down one probe call is let through: if it
+succeeds the breaker closes again, otherwise it stays open.
+
+    closed --(bad-call rate over threshold)--> open
+    open --(cool-down elapsed)--> half-open (one probe)
+    half-open --(probe ok)--> closed,  --(probe bad)--> open
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+from config import (
+    BREAKER_WINDOW,
+    BREAKER_MIN_CALLS,
+    BREAKER_FAILURE_RATE,
+    BREAKER_SLOW_CALL_SECONDS,
+    BREAKER_OPEN_SECONDS
+)
+from rate_limiter import PROVIDER_NAMES
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpen(Exception):
+    """A call was not sent because the provider's breaker is open"""
+
+    def __init__(self, provider: str, retry_in: float):
+        """
+        Args:
+            provider: Provider key (e.g. "serper")
+            retry_in: Seconds until the breaker lets a probe through
+        """
+        self.provider = provider
+        self.retry_in = retry_in
+        super().__init__(f"{provider} circuit open")
+
+    @property
+    def user_message(self) -> str:
+        """Message shown to the user"""
+        name = PROVIDER_NAMES.get(self.provider, self.provider)
+        return f"⚠️ {name} ไม่พร้อมใช้งานชั่วคราว กรุณาลองใหม่ในอีก {max(1, round(self.retry_in))} วินาที"
+
+
+class CircuitBreaker:
+    """Thread-safe breaker over a sliding window of recent calls"""
+
+    def __init__(
+        self,
+        provider: str,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        slow_call: float = BREAKER_SLOW_CALL_SECONDS,
+        open_seconds: float = BREAKER_OPEN_SECONDS
+    ):
+        """
+        Initialize breaker
+
+        Args:
+            provider: Provider key (for errors and logs)
+            window: Recent calls considered
+            min_calls: Calls needed in the window before the breaker can open
+            failure_rate: Share of bad calls (failed or slow) that opens it
+            slow_call: Calls slower than this many seconds count as bad
+            open_seconds: Cool-down before a probe is let through
+        """
+        self.provider = provider
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+
+        self.state = CLOSED
+        self._calls = deque(maxlen=window)
+        self._opened = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def allow(self) -> None:
+        """
+        Ask to send one call; every allowed call must be followed by record() or cancel()
+
+        Raises:
+            CircuitOpen: If the breaker is open (or its probe is already out)
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+
+            retry_in = self._opened + self.open_seconds - time.monotonic()
+            if self.state == OPEN and retry_in <= 0:
+                self.state = HALF_OPEN
+
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+
+            self.rejected += 1
+            raise CircuitOpen(self.provider, max(retry_in, 0.0))
+
+    def cancel(self) -> None:
+        """Withdraw an allowed call that was never sent"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+
+    def record(self, ok: bool, elapsed: float) -> None:
+        """
+        Report the outcome of an allowed call
+
+        Args:
+            ok: Whether the call succeeded (client errors such as 404 count as ok)
+            elapsed: Call duration in seconds
+        """
+        bad = not ok or elapsed > self.slow_call
+
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if bad:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self._calls.clear()
+                    logger.info(f"{self.provider} circuit closed")
+                return
+
+            if self.state == OPEN:
+                # A call allowed before the breaker opened; it no longer matters
+                return
+
+            self._calls.append(bad)
+            if len(self._calls) >= self.min_calls and self._bad_rate() >= self.failure_rate:
+                self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened = time.monotonic()
+        logger.warning(
+            f"{self.provider} circuit open for {self.open_seconds:.0f}s "
+            f"({self._bad_rate():.0%} of the last {len(self._calls)} calls failed or were slow)"
+        )
+
+    def _bad_rate(self) -> float:
+        return sum(self._calls) / len(self._calls) if self._calls else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """State, bad-call rate over the window, calls in the window and rejections"""
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = round(max(self._opened + self.open_seconds - time.monotonic(), 0.0), 1)
+            return {
+                "state": self.state,
+                "bad_rate": self._bad_rate(),
+                "calls": len(self._calls),
+                "rejected": self.rejected,
+                "retry_in": retry_in
+            }
+
+
+class CircuitBreakers:
+    """One breaker per provider, created on first use"""
+
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(provider)
+            if breaker is None:
+                breaker = self._breakers[provider] = CircuitBreaker(provider)
+            return breaker
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per provider breaker stats"""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {provider: breaker.stats() for provider, breaker in breakers.items()}
+
+
+_breakers = None
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breakers() -> CircuitBreakers:
+    """Shared breakers used by the HTTP client"""
+    global _breakers
+    with _breakers_lock:
+        if _breakers is None:
+            _breakers = CircuitBreakers()
+        return _breakers
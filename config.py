@@ -16,6 +16,14 @@ TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 USDA_API_KEY = os.getenv("USDA_API_KEY")
 SPOONACULAR_API_KEY = os.getenv("SPOONACULAR_API")
 
+# ══════════════════════════════════════════════════════════════════════════════
+# API ENDPOINTS (overridable, e.g. to point at local stand-ins for benchmarks)
+# ══════════════════════════════════════════════════════════════════════════════
+USDA_API_BASE = os.getenv("USDA_API_BASE", "https://api.nal.usda.gov/fdc/v1")
+SPOONACULAR_API_BASE = os.getenv("SPOONACULAR_API_BASE", "https://api.spoonacular.com")
+SERPER_API_URL = os.getenv("SERPER_API_URL", "https://google.serper.dev/search")
+TAVILY_API_URL = os.getenv("TAVILY_API_URL", "https://api.tavily.com/search")
+
 # ══════════════════════════════════════════════════════════════════════════════
 # MODEL CONFIGURATIONS
 # ══════════════════════════════════════════════════════════════════════════════
@@ -36,6 +44,121 @@ DEFAULT_MODEL = "gpt-4o-mini"  # Changed to GPT-4o Mini
 DEFAULT_TEMPERATURE = 0.7
 MAX_TOKENS = 2048
 MAX_TOOL_ITERATIONS = 5
+MAX_TOOL_WORKERS = 4  # Concurrent tool calls per assistant turn
+NUTRITION_MAX_WORKERS = 4  # Concurrent USDA requests per get_nutrition_batch call
+
+# Shared HTTP client for tool traffic (http_client.py)
+HTTP_POOL_HOSTS = 10  # Hosts with their own keep-alive pool
+HTTP_POOL_SIZE = 8  # Keep-alive connections per host (>= concurrent tool calls)
+HTTP_CONNECT_TIMEOUT = 3.05  # Seconds
+HTTP_READ_TIMEOUT = 10  # Seconds
+HTTP_MAX_RETRIES = 2  # Retries for idempotent calls on connection errors / 429 / 5xx
+HTTP_BACKOFF = 0.3  # Base retry delay in seconds (full jitter, doubles per attempt)
+HTTP_BACKOFF_MAX = 4  # Longest single retry delay in seconds
+
+# Per-provider token buckets (rate_limiter.py): requests per second and burst size;
+# CHEFBOT_RATE_LIMITS=off disables them (e.g. for benchmarks against local fakes)
+RATE_LIMITS = {
+    "spoonacular": {"rate": 1.0, "burst": 5},  # Free plan: 60 requests/minute
+    # api.data.gov: 1,000 requests/hour, usable in bursts; the bucket holds the
+    # hour's allowance and X-RateLimit-Remaining tracks what the key has left
+    "usda": {"rate": 1000 / 3600, "burst": 1000},
+    "serper": {"rate": 5.0, "burst": 10},
+    "tavily": {"rate": 1.5, "burst": 10},  # 100 requests/minute
+}
+if os.getenv("CHEFBOT_RATE_LIMITS") == "off":
+    RATE_LIMITS = {}
+RATE_LIMIT_MAX_WAIT = 2.0  # Seconds a call may queue for a token before failing
+QUOTA_RECHECK_SECONDS = 300  # After a provider reports no quota left, probe again this often
+
+# Per-provider circuit breakers (circuit_breaker.py)
+BREAKER_WINDOW = 20  # Recent calls considered
+BREAKER_MIN_CALLS = 5  # Calls in the window before the breaker can open
+BREAKER_FAILURE_RATE = 0.5  # Share of failed (5xx/timeout) or slow calls that opens it
+BREAKER_SLOW_CALL_SECONDS = 5.0  # Slower calls count as failed
+BREAKER_OPEN_SECONDS = 30  # Seconds calls fail fast before one probe is let through
+
+# Web search: "serper" or "tavily" tries that provider first and falls back to
+# the other; "fanout" (opt-in) queries both concurrently and merges their results,
+# paying for both calls on every search
+SEARCH_POLICY = os.getenv("CHEFBOT_SEARCH_POLICY", "serper")
+SEARCH_DEADLINE = 5.0  # Seconds a fan-out search waits for its providers (and each call's timeout)
+
+# Web search result cache (normalized queries, in the disk cache)
+SEARCH_CACHE_TTL = 6 * 60 * 60  # Seconds results are fresh
+SEARCH_CACHE_STALE = 24 * 60 * 60  # Further seconds stale results are served while refreshing
+SEARCH_CACHE_MAX_ENTRIES = 2000
+SEARCH_RESULT_BUCKETS = (5, 10, 20)  # num_results is rounded up to one of these
+
+# Local USDA FoodData Central index (python -m usda_index import ...);
+# nutrition lookups use it first and call the USDA API only on a miss
+USDA_INDEX_FILE = os.getenv("CHEFBOT_USDA_INDEX", "data/usda/fdc.sqlite")
+# Foods x nutrients matrix built from that index (python -m nutrient_matrix build)
+NUTRIENT_MATRIX_FILE = os.getenv("CHEFBOT_NUTRIENT_MATRIX", "data/usda/nutrients.npy")
+
+# Model routing: a low-latency model decides on tool calls, the user's
+# chosen model only writes the final answer (None disables routing)
+TOOL_PLANNING_MODEL = "groq/llama-3.3-70b-versatile" if GROQ_API_KEY else None
+PLANNER_MAX_TOKENS = 512
+
+# Hedged requests: if a model has not answered within its rolling p95
+# latency, race a duplicate request on an equivalent backup model
+# (only used when the backup provider's API key is configured). Only models of
+# the same tier are paired; gpt-4o and gpt-4-turbo have no equivalent here
+HEDGE_BACKUP_MODELS = {
+    "gpt-4o-mini": "groq/llama-3.3-70b-versatile",
+    "gpt-3.5-turbo": "groq/llama-3.3-70b-versatile",
+    "groq/llama-3.3-70b-versatile": "gpt-4o-mini",
+    "groq/llama-3.1-70b-versatile": "gpt-4o-mini",
+    "groq/mixtral-8x7b-32768": "gpt-4o-mini",
+}
+HEDGE_DEFAULT_DELAY = 2.0  # Seconds, until enough samples exist for a p95
+HEDGE_MIN_DELAY = 0.3  # Never hedge sooner than this
+HEDGE_MIN_SAMPLES = 20  # Samples needed before the p95 is trusted
+LATENCY_WINDOW = 200  # Recent samples kept per model
+
+# Conversation context (rolling summary of older turns)
+CONTEXT_TOKEN_BUDGET = 3000  # Tokens for summary + verbatim recent turns
+CONTEXT_KEEP_TURNS = 4  # Most recent user turns kept verbatim
+SUMMARY_MODEL = "gpt-4o-mini"
+SUMMARY_MAX_TOKENS = 400
+
+# Answer cache for templated home page prompts
+ANSWER_CACHE_TTL = 6 * 60 * 60  # Seconds
+ANSWER_CACHE_MAX_ENTRIES = 500
+INGREDIENT_SPELLING_SIMILARITY = 0.85  # Names this similar count as equal
+
+# Thai -> English ingredient translation (dictionary, learned cache, LLM)
+TRANSLATION_DICTIONARY_FILE = os.path.join(os.path.dirname(__file__), "data", "thai_ingredients.json")
+TRANSLATION_CACHE_FILE = os.getenv("CHEFBOT_TRANSLATION_CACHE", "cache/translations.json")
+TRANSLATION_MODEL = "gpt-4o-mini"
+
+# Persistent cache shared by all server processes ("" disables it)
+DISK_CACHE_FILE = os.getenv("CHEFBOT_CACHE_DB", "cache/chefbot.sqlite")
+RECIPE_CACHE_TTL = 24 * 60 * 60  # Seconds a findByIngredients response is reused
+RECIPE_CACHE_MAX_ENTRIES = 5000
+
+# Reuse cached recipes of a near-identical pantry (MinHash LSH over ingredient sets)
+PANTRY_SIMILARITY = 0.75  # Minimum Jaccard similarity of the ingredient sets
+PANTRY_LSH_PERMUTATIONS = 64
+PANTRY_LSH_BANDS = 16
+
+# Local recipe index (python -m recipe_index import ...); searched before Spoonacular
+RECIPE_INDEX_FILE = os.getenv("CHEFBOT_RECIPE_INDEX", "data/recipes/index.json")
+LOCAL_RECIPE_MIN_MATCH = 50  # Percent of a local recipe's ingredients on hand to skip Spoonacular
+
+# Start search_recipes for a known pantry alongside the first completion, only
+# with prompts that search in their first reply (prompts.FIRST_TURN_SEARCH_PROMPTS).
+# The default "cooking" prompt asks questions first, so the home page flow never
+# prefetches.
+PREFETCH_RECIPE_SEARCH = True
+
+# Tracing (JSONL sink with OTLP-style span fields)
+TRACING_ENABLED = True
+TRACE_FILE = os.getenv("CHEFBOT_TRACE_FILE", "traces/spans.jsonl")
+TRACE_FILE_MAX_BYTES = 10 * 1024 * 1024  # Rotate the sink beyond this size
+TRACE_FILE_BACKUPS = 3  # Rotated files kept (spans.jsonl.1 is the newest)
+MAX_SESSION_TRACES = 5  # Recent traces kept for the sidebar debug panel
 
 # Vision settings
 VISION_TEMPERATURE = 0.7
@@ -79,7 +202,7 @@ TOOL_DEFINITIONS = [
         "type": "function",
         "function": {
             "name": "search_recipes",
-            "description": "ค้นหาสูตรอาหารจากวัตถุดิบที่มี (Spoonacular API)",
+            "description": "ค้นหาสูตรอาหารจากวัตถุดิบที่มี (คลังสูตรในเครื่อง แล้วจึง Spoonacular API)",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -87,7 +210,13 @@ TOOL_DEFINITIONS = [
                         "type": "array",
                         "items": {"type": "string"},
                         "description": "รายการวัตถุดิบ"
-                    }
+                    },
+                    "include_nutrition": {
+                        "type": "boolean",
+                        "description": "คำนวณโภชนาการรวมของแต่ละสูตร (ไม่ต้องเรียก get_nutrition ทีละวัตถุดิบ)",
+                        "default": False
+                    },
+                    "servings": {"type": "number", "description": "จำนวนที่ที่ต้องการแบ่ง (สำหรับโภชนาการต่อที่)"}
                 },
                 "required": ["ingredients"]
             }
@@ -106,5 +235,57 @@ TOOL_DEFINITIONS = [
                 "required": ["ingredient"]
             }
         }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_nutrition_batch",
+            "description": "ดูข้อมูลโภชนาการของวัตถุดิบหลายอย่างพร้อมกันในตารางเดียว (USDA Database)",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "ingredients": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "รายการวัตถุดิบ"
+                    }
+                },
+                "required": ["ingredients"]
+            }
+        }
     }
-]
\ No newline at end of file
+]
+
+# Offered only once the nutrient matrix is built (tools_executor.available_tools)
+FIND_FOODS_BY_NUTRIENTS_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "find_foods_by_nutrients",
+        "description": "ค้นหาวัตถุดิบจากเงื่อนไขโภชนาการ เช่น โปรตีนสูง ไขมันต่ำ (ค่าต่อ 100g จาก USDA ทั้งฐานข้อมูล)",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "filters": {
+                    "type": "array",
+                    "description": "เงื่อนไข เช่น {\"nutrient\": \"protein\", \"min\": 20} หรือ {\"nutrient\": \"fat\", \"max\": 5}",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "nutrient": {
+                                "type": "string",
+                                "description": "kcal, protein, fat, carbs, fiber, sugar, sodium, potassium, calcium, iron, vitamin_c, cholesterol, saturated_fat หรืออัตราส่วนเช่น protein/kcal"
+                            },
+                            "min": {"type": "number"},
+                            "max": {"type": "number"}
+                        },
+                        "required": ["nutrient"]
+                    }
+                },
+                "sort_by": {"type": "string", "description": "สารอาหารหรืออัตราส่วนที่ใช้จัดอันดับ"},
+                "order": {"type": "string", "enum": ["desc", "asc"], "default": "desc"},
+                "contains": {"type": "string", "description": "คำในชื่ออาหาร (ภาษาอังกฤษ) เช่น chicken"},
+                "limit": {"type": "integer", "description": "จำนวนผลลัพธ์", "default": 10}
+            }
+        }
+    }
+}
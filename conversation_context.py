@@ -0,0 +1,188 @@
+"""
+Token-budgeted conversation context with rolling summarization
+
+Keeps the last few turns verbatim and folds older turns into a summary that
+is updated incrementally, so the prompt sent on every completion stays
+roughly the same size however long the chat gets.
+"""
+import logging
+from typing import Any, Dict, List
+from litellm import token_counter
+from utils.llm_router import acompletion
+from config import (
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_KEEP_TURNS,
+    SUMMARY_MODEL,
+    SUMMARY_MAX_TOKENS
+)
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """You maintain a running summary of a cooking assistant conversation.
+Update the summary with the new messages below. Keep every fact the assistant
+needs later: ingredients the user has, allergies, dietary restrictions,
+preferences, recipes already suggested and open questions. Be concise and
+write in the same language as the conversation.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+
+def count_tokens(model: str, messages: List[Dict[str, Any]]) -> int:
+    """
+    Count prompt tokens for messages using the model's tokenizer
+
+    Args:
+        model: Model name
+        messages: List of message dictionaries
+
+    Returns:
+        Number of tokens
+    """
+    try:
+        return token_counter(model=model, messages=messages)
+    except Exception as e:
+        logger.warning(f"Token counting failed for {model}: {str(e)}")
+        # Rough fallback: ~4 characters per token
+        return sum(len(str(m.get("content") or "")) for m in messages) // 4
+
+
+def new_context_state() -> Dict[str, Any]:
+    """Create empty summary state for a conversation"""
+    return {"summary": "", "covered": 0}
+
+
+class ConversationContext:
+    """Builds the per-call message list within a token budget"""
+
+    def __init__(
+        self,
+        model: str,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        keep_turns: int = CONTEXT_KEEP_TURNS,
+        summary_model: str = SUMMARY_MODEL
+    ):
+        """
+        Initialize conversation context
+
+        Args:
+            model: Model the prompt is built for (used for token counting)
+            token_budget: Token budget for summary plus verbatim history
+            keep_turns: Number of most recent user turns kept verbatim
+            summary_model: Model used to update the rolling summary
+        """
+        self.model = model
+        self.token_budget = token_budget
+        self.keep_turns = max(1, keep_turns)
+        self.summary_model = summary_model
+
+    async def build(
+        self,
+        system_prompt: str,
+        history: List[Dict[str, Any]],
+        state: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Build messages for a completion call
+
+        Turns older than the verbatim window are folded into state["summary"].
+        state["covered"] records how many history messages the summary
+        already includes, so each message is summarized only once.
+
+        Args:
+            system_prompt: System prompt text
+            history: Full conversation history (user/assistant messages)
+            state: Mutable summary state from new_context_state()
+
+        Returns:
+            List of messages: system prompt, summary, recent turns
+        """
+        # Archived chats may be shorter than what the state covers
+        if state["covered"] > len(history):
+            state.update(new_context_state())
+
+        split = self._split_index(history, state["covered"])
+
+        if split > state["covered"]:
+            await self._fold(history[state["covered"]:split], state)
+            state["covered"] = split
+
+        messages = [{"role": "system", "content": system_prompt}]
+        if state["summary"]:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{state['summary']}"
+            })
+
+        return messages + history[split:]
+
+    def _split_index(self, history: List[Dict[str, Any]], covered: int) -> int:
+        """
+        Find where the verbatim window starts
+
+        The window may grow to twice keep_turns while it fits the token
+        budget, so the summary is updated once every few turns rather than
+        on every call. Once exceeded, it restarts from the last keep_turns
+        user turns and shrinks (never below one turn) until it fits.
+        """
+        turn_starts = [
+            i for i, m in enumerate(history)
+            if m["role"] == "user" and i >= covered
+        ]
+        if not turn_starts:
+            return covered
+
+        if (len(turn_starts) <= 2 * self.keep_turns and
+                count_tokens(self.model, history[covered:]) <= self.token_budget):
+            return covered
+
+        turn_starts = turn_starts[-self.keep_turns:]
+
+        for start in turn_starts[:-1]:
+            if count_tokens(self.model, history[start:]) <= self.token_budget:
+                return start
+
+        return turn_starts[-1]
+
+    async def _fold(self, new_messages: List[Dict[str, Any]], state: Dict[str, Any]) -> None:
+        """Fold messages into the rolling summary, one bounded chunk at a time"""
+        chunk = []
+
+        for message in new_messages:
+            chunk.append(message)
+            if count_tokens(self.summary_model, chunk) >= self.token_budget:
+                state["summary"] = await self._summarize(state["summary"], chunk)
+                chunk = []
+
+        if chunk:
+            state["summary"] = await self._summarize(state["summary"], chunk)
+
+    async def _summarize(self, summary: str, messages: List[Dict[str, Any]]) -> str:
+        """Ask the summary model for an updated summary"""
+        transcript = "\n".join(
+            f"{m['role']}: {m.get('content') or ''}" for m in messages
+        )
+        prompt = SUMMARY_PROMPT.format(
+            summary=summary or "(empty)",
+            messages=transcript
+        )
+
+        try:
+            response = await acompletion(
+                model=self.summary_model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.2,
+                max_tokens=SUMMARY_MAX_TOKENS
+            )
+            return response.choices[0].message.content.strip()
+
+        except Exception as e:
+            logger.error(f"Summary update error: {str(e)}")
+            # Keep a truncated transcript rather than dropping the turns
+            fallback = f"{summary}\n{transcript}".strip()
+            return fallback[-SUMMARY_MAX_TOKENS * 4:]
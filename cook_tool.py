@@ -1,29 +1,198 @@
 """
 Cooking and recipe tools using Spoonacular and USDA APIs
 """
+import contextvars
+import json
 import os
-import requests
-from typing import List, Dict, Any
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 import logging
+import tracing
+from ingredient_translator import get_translator, is_thai
+from usda_index import get_usda_index
+from recipe_nutrition import compute_totals, per_serving, recipe_ingredients
+from disk_cache import DiskCache
+from pantry_lsh import PantryLSH
+from http_client import get_http_client
+from rate_limiter import RateLimited
+from circuit_breaker import CircuitOpen
+from config import (
+    USDA_API_BASE,
+    SPOONACULAR_API_BASE,
+    NUTRITION_MAX_WORKERS,
+    DISK_CACHE_FILE,
+    RECIPE_CACHE_TTL,
+    RECIPE_CACHE_MAX_ENTRIES,
+    LOCAL_RECIPE_MIN_MATCH
+)
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 
+def parse_ingredient_list(text: str) -> List[str]:
+    """
+    Split user-typed ingredients ("หมู, กระเทียม และ พริก") into a list
+    
+    Args:
+        text: Comma/newline separated ingredient text
+    
+    Returns:
+        List of non-empty ingredient names
+    """
+    parts = re.split(r"[,，、;\n]|\s+และ\s+|\s+and\s+", text)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def normalize_ingredient(name: str) -> str:
+    """
+    Normalize an ingredient name for matching
+    
+    Lowercases, collapses whitespace, strips punctuation and a simple
+    English plural ("tomatoes" -> "tomato", "chilis" -> "chili").
+    """
+    name = re.sub(r"\s+", " ", name.strip().lower())
+    name = name.strip(" .,-*•")
+    
+    if name.endswith("oes") and len(name) > 4:
+        name = name[:-2]
+    elif name.endswith("s") and not name.endswith("ss") and len(name) > 3:
+        name = name[:-1]
+    
+    return name
+
+
+def canonicalize_ingredients(ingredients: List[str]) -> Tuple[str, ...]:
+    """
+    Canonical form of an ingredient set: normalized, deduplicated, sorted
+    
+    Args:
+        ingredients: List of ingredient names in any order or casing
+    
+    Returns:
+        Sorted tuple of normalized names
+    """
+    return tuple(sorted({normalize_ingredient(i) for i in ingredients if i.strip()} - {""}))
+
+
+def recipe_match_percent(recipe: Dict[str, Any]) -> float:
+    """
+    Share of a recipe's ingredients the user already has
+    
+    Args:
+        recipe: Recipe with usedIngredients and missedIngredients
+        
+    Returns:
+        Percentage between 0 and 100
+    """
+    used = len(recipe.get('usedIngredients', []))
+    total_needed = used + len(recipe.get('missedIngredients', []))
+    return (used / total_needed * 100) if total_needed > 0 else 0
+
+
+def recipe_link(recipe: Dict[str, Any]) -> Optional[str]:
+    """
+    Link to the full recipe
+    
+    Local corpus recipes carry their own sourceUrl; Spoonacular results
+    (which have no sourceUrl) link to their page on spoonacular.com.
+    
+    Args:
+        recipe: Recipe dictionary
+        
+    Returns:
+        URL, or None if the recipe has neither
+    """
+    if recipe.get('sourceUrl'):
+        return recipe['sourceUrl']
+    if 'id' in recipe:
+        return f"https://spoonacular.com/recipes/-{recipe['id']}"
+    return None
+
+
+def rerank_recipes(recipes: List[Dict[str, Any]], pantry: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """
+    Recompute used/missed/unused ingredients of recipes for another pantry
+    
+    Re-sorts like Spoonacular's ranking=2: highest match percentage first,
+    then fewest missing ingredients.
+    
+    Args:
+        recipes: Recipes returned for a similar pantry
+        pantry: Canonical English ingredient names of this pantry
+        
+    Returns:
+        New recipe list in the findByIngredients shape
+    """
+    reranked = []
+    
+    for recipe in recipes:
+        ingredients = recipe.get('usedIngredients', []) + recipe.get('missedIngredients', [])
+        used, missed, matched = [], [], set()
+        
+        for ing in ingredients:
+            owned = [p for p in pantry if _pantry_item_matches(p, ing.get('name', ''))]
+            (used if owned else missed).append(ing)
+            matched.update(owned)
+        
+        reranked.append({
+            **recipe,
+            "usedIngredients": used,
+            "missedIngredients": missed,
+            "unusedIngredients": [{"name": p} for p in pantry if p not in matched],
+            "usedIngredientCount": len(used),
+            "missedIngredientCount": len(missed)
+        })
+    
+    reranked.sort(key=lambda r: (-recipe_match_percent(r), len(r["missedIngredients"])))
+    return reranked
+
+
+def _pantry_item_matches(pantry_item: str, ingredient_name: str) -> bool:
+    """Whether every word of a pantry item appears in a recipe ingredient name"""
+    words = {normalize_ingredient(w) for w in ingredient_name.split()}
+    return all(normalize_ingredient(w) in words for w in pantry_item.split())
+
+
 class CookTool:
     """Cooking and recipe suggestion tool with Thai language support"""
 
-    def __init__(self, usda_api_key=None, spoonacular_api_key=None):
+    def __init__(
+        self,
+        usda_api_key=None,
+        spoonacular_api_key=None,
+        translator=None,
+        usda_index=None,
+        recipe_cache=None,
+        recipe_index=None,
+        http=None
+    ):
         self.usda_api_key = usda_api_key or os.getenv("USDA_API_KEY")
         self.spoonacular_api_key = spoonacular_api_key or os.getenv("SPOONACULAR_API")
-        self.usda_base = "https://api.nal.usda.gov/fdc/v1/foods/search"
-        self.spoon_base = "https://api.spoonacular.com/recipes"
+        self.usda_base = f"{USDA_API_BASE}/foods/search"
+        self.spoon_base = f"{SPOONACULAR_API_BASE}/recipes"
+        self.http = http or get_http_client()
+        self.translator = translator or get_translator()
+        self.usda_index = usda_index or get_usda_index()
+        self.recipe_cache = recipe_cache or _open_recipe_cache()
+        self.pantry_index = _build_pantry_index(self.recipe_cache)
+        
+        if recipe_index is None:
+            # Imported here: recipe_index reuses this module's name normalization
+            from recipe_index import get_recipe_index
+            recipe_index = get_recipe_index()
+        self.recipe_index = recipe_index
 
     def _translate_thai_to_english(self, ingredients: List[str]) -> List[str]:
         """
-        Translate Thai ingredient names to English using LLM
+        Translate Thai ingredient names to English
+        
+        Uses the bundled dictionary and learned cache first; only unknown
+        names go to the LLM, in a single batched call.
         
         Args:
             ingredients: List of ingredient names (may be Thai or English)
@@ -31,52 +200,15 @@ class CookTool:
         Returns:
             List of English ingredient names
         """
-        # Check if ingredients contain Thai characters
-        has_thai = any(self._is_thai(ing) for ing in ingredients)
-        
-        if not has_thai:
-            return ingredients  # Already in English
-        
-        try:
-            from litellm import completion
-            
-            ingredients_str = ", ".join(ingredients)
-            
-            prompt = f"""Translate these Thai food ingredient names to English. 
-Only return the English names, comma-separated, nothing else.
-
-Thai ingredients: {ingredients_str}
-
-English translation:"""
-
-            response = completion(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=200
-            )
-            
-            english_text = response.choices[0].message.content.strip()
-            
-            # Clean up and split
-            english_ingredients = [ing.strip() for ing in english_text.split(",")]
-            
-            logger.info(f"Translated {ingredients} → {english_ingredients}")
-            return english_ingredients
-        
-        except Exception as e:
-            logger.error(f"Translation error: {str(e)}")
-            # Fallback: return original
-            return ingredients
+        return self.translator.translate(ingredients)
     
     def _is_thai(self, text: str) -> bool:
         """Check if text contains Thai characters"""
-        thai_range = range(0x0E00, 0x0E7F)
-        return any(ord(char) in thai_range for char in text)
+        return is_thai(text)
 
     def get_nutrition(self, ingredient: str) -> Dict[str, Any]:
         """
-        Get nutrition info from USDA API
+        Get nutrition info from the local USDA index, or the USDA API on a miss
         
         Args:
             ingredient: Name of ingredient (Thai or English)
@@ -84,17 +216,81 @@ English translation:"""
         Returns:
             Dictionary with nutrition data or error
         """
-        if not self.usda_api_key:
-            return {"error": "Missing USDA API key"}
-
         # Translate if Thai
         if self._is_thai(ingredient):
             english_ingredients = self._translate_thai_to_english([ingredient])
             ingredient = english_ingredients[0] if english_ingredients else ingredient
 
-        params = {"query": ingredient, "api_key": self.usda_api_key}
+        return self._fetch_nutrition(ingredient)
+
+    def get_nutrition_batch(self, ingredients: List[str]) -> List[Dict[str, Any]]:
+        """
+        Get nutrition info for several ingredients at once
+        
+        Translates all Thai names together, answers what it can from the
+        local index, then queries USDA for the rest concurrently on a
+        bounded pool.
+        
+        Args:
+            ingredients: Ingredient names (Thai or English)
+            
+        Returns:
+            One dictionary per ingredient, in input order, with "ingredient"
+            (name as given) plus nutrition data or "error"
+        """
+        english_ingredients = self._translate_thai_to_english(ingredients)
+        results = [self._lookup_local(query) for query in english_ingredients]
+        misses = [i for i, result in enumerate(results) if result is None]
+
+        if misses:
+            workers = max(1, min(NUTRITION_MAX_WORKERS, len(misses)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="usda") as pool:
+                fetched = pool.map(
+                    lambda query: contextvars.copy_context().run(self._fetch_nutrition_api, query),
+                    [english_ingredients[i] for i in misses]
+                )
+                for i, result in zip(misses, fetched):
+                    results[i] = result
+
+        return [
+            {"ingredient": ingredient, **result}
+            for ingredient, result in zip(ingredients, results)
+        ]
+
+    def _fetch_nutrition(self, query: str) -> Dict[str, Any]:
+        """Best USDA match for an English ingredient name, local index first"""
+        return self._lookup_local(query) or self._fetch_nutrition_api(query)
+
+    def _lookup_local(self, query: str) -> Optional[Dict[str, Any]]:
+        """Look a food up in the local FDC index (None if missing or no match)"""
+        if self.usda_index is None:
+            return None
+
+        with tracing.span("usda.index", query=query) as index_span:
+            try:
+                result = self.usda_index.lookup(query)
+            except sqlite3.Error as e:
+                logger.warning(f"USDA index lookup failed: {str(e)}")
+                result = None
+            index_span.set("hit", result is not None)
+
+        return result
+
+    def _fetch_nutrition_api(self, query: str) -> Dict[str, Any]:
+        """Fetch the best match for an English ingredient name from the USDA API"""
+        if not self.usda_api_key:
+            return {"error": "Missing USDA API key"}
+
+        # Only the first match is used, so don't download a full page
+        params = {"query": query, "pageSize": 1, "api_key": self.usda_api_key}
         try:
-            r = requests.get(self.usda_base, params=params, timeout=10)
+            r = self.http.get(
+                self.usda_base,
+                params=params,
+                span="http.usda",
+                attributes={"query": query},
+                provider="usda"
+            )
             r.raise_for_status()
             data = r.json()
             
@@ -109,12 +305,69 @@ English translation:"""
                     for n in first.get("foodNutrients", [])
                 }
             }
+        except (RateLimited, CircuitOpen) as e:
+            return {"error": str(e), "user_message": e.user_message}
         except Exception as e:
             return {"error": str(e)}
 
+    def lookup_nutrition_profiles(self, names: List[str]) -> Dict[str, Optional[Dict[str, float]]]:
+        """
+        Nutrients per 100g for many ingredient names at once
+        
+        Args:
+            names: Ingredient names (Thai or English)
+            
+        Returns:
+            Name -> nutrient dictionary, or None where no data was found
+        """
+        rows = self.get_nutrition_batch(names) if names else []
+        return {row["ingredient"]: row.get("nutrients") for row in rows}
+
+    def add_recipe_nutrition(
+        self,
+        recipes: List[Dict[str, Any]],
+        servings: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Attach locally computed nutrition totals to copies of the recipes
+        
+        Amounts are converted to grams and totalled in one matrix product;
+        ingredient nutrition comes from one batched lookup for all recipes.
+        The given recipes may be shared (disk cache, near-pantry hits, the
+        recipe index) and are left unchanged.
+        
+        Args:
+            recipes: Recipes from search_recipes
+            servings: Portions each recipe is split into
+            
+        Returns:
+            Recipe copies with recipe["nutrition"] = {"total", "per_serving"
+            (if servings), "servings", "skipped"}
+        """
+        ingredient_lists = [recipe_ingredients(r) for r in recipes]
+        names = sorted({name for items in ingredient_lists for name, _, _ in items if name})
+        profiles = self.lookup_nutrition_profiles(names)
+        
+        nutrients = list(KEY_NUTRIENTS)
+        totals, skipped = compute_totals(ingredient_lists, profiles, nutrients)
+        scaled = per_serving(totals, [servings or 1] * len(recipes)) if servings else None
+        
+        return [
+            {
+                **recipe,
+                "nutrition": {
+                    "total": dict(zip(nutrients, totals[i].tolist())),
+                    "per_serving": dict(zip(nutrients, scaled[i].tolist())) if scaled is not None else None,
+                    "servings": servings,
+                    "skipped": skipped[i]
+                }
+            }
+            for i, recipe in enumerate(recipes)
+        ]
+
     def search_recipes(self, ingredients: List[str]) -> List[Dict[str, Any]]:
         """
-        Search for recipes using Spoonacular API
+        Search for recipes in the local recipe index, then Spoonacular
         
         Args:
             ingredients: List of ingredient names (Thai or English)
@@ -122,9 +375,6 @@ English translation:"""
         Returns:
             List of recipe dictionaries or error dict
         """
-        if not self.spoonacular_api_key:
-            return {"error": "Missing Spoonacular API key"}
-
         # Translate Thai ingredients to English
         english_ingredients = self._translate_thai_to_english(ingredients)
 
@@ -133,22 +383,99 @@ English translation:"""
             "ingredients": ",".join(english_ingredients), 
             "number": 5, 
             "apiKey": self.spoonacular_api_key,
-            "ranking": 2,  # Maximize used ingredients
+            "ranking": 2,  # Minimize missing ingredients
             "ignorePantry": False
         }
         
+        local = []
+        if self.recipe_index is not None:
+            with tracing.span("recipes.local", ingredients=len(english_ingredients)) as local_span:
+                local = self.recipe_index.search(
+                    english_ingredients, params["number"], params["ranking"]
+                )
+                # Weak matches (mostly missing ingredients) still go to Spoonacular
+                good = [r for r in local if recipe_match_percent(r) >= LOCAL_RECIPE_MIN_MATCH]
+                local_span.set("results", len(local))
+                local_span.set("good", len(good))
+            
+            if good:
+                return good
+        
+        if not self.spoonacular_api_key:
+            return local or {"error": "Missing Spoonacular API key"}
+        
+        # Same ingredient set in any order, casing or language -> same key
+        canonical = canonicalize_ingredients(english_ingredients)
+        search_options = {k: params[k] for k in ("number", "ranking", "ignorePantry")}
+        cache_key = json.dumps({"ingredients": canonical, **search_options}, sort_keys=True)
+        
+        if self.recipe_cache is not None:
+            with tracing.span("cache.recipes") as cache_span:
+                cached = self.recipe_cache.get(cache_key)
+                cache_span.set("hit", cached is not None)
+                
+                if cached is None:
+                    cached = self._find_similar_pantry(canonical, search_options)
+                    cache_span.set("near_hit", cached is not None)
+            
+            if cached is not None:
+                return cached
+        
         try:
-            r = requests.get(url, params=params, timeout=10)
+            r = self.http.get(
+                url,
+                params=params,
+                span="http.spoonacular",
+                attributes={"ingredients": len(english_ingredients)},
+                provider="spoonacular"
+            )
             r.raise_for_status()
             data = r.json()
             
             if not data:
-                return []
+                data = []
+            
+            if self.recipe_cache is not None:
+                self.recipe_cache.set(cache_key, data)
+                self.pantry_index.add(canonical, cache_key)
             
             return data
+        except (RateLimited, CircuitOpen) as e:
+            return {"error": str(e), "user_message": e.user_message}
         except Exception as e:
             return {"error": str(e)}
 
+    def _find_similar_pantry(
+        self,
+        canonical: Tuple[str, ...],
+        search_options: Dict[str, Any]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Reuse recipes cached for a near-identical pantry, re-ranked for this one
+        
+        Args:
+            canonical: Canonical English ingredient set being searched
+            search_options: findByIngredients options the result must share
+            
+        Returns:
+            Re-ranked recipes, or None if no similar pantry is cached
+        """
+        match = self.pantry_index.query(canonical)
+        if match is None:
+            return None
+        
+        cache_key, similarity = match
+        stored = json.loads(cache_key)
+        if any(stored.get(k) != v for k, v in search_options.items()):
+            return None
+        
+        recipes = self.recipe_cache.get(cache_key)
+        if recipes is None:
+            return None
+        
+        logger.info(f"Reusing recipes for {stored['ingredients']} (Jaccard {similarity:.2f})")
+        return rerank_recipes(recipes, canonical)
+
     def format_recipes(self, recipes: List[Dict[str, Any]]) -> str:
         """
         Format recipe list into Markdown text with detailed missing ingredients
@@ -178,7 +505,7 @@ English translation:"""
             
             # Calculate match percentage
             total_needed = len(used) + len(missed)
-            match_percent = (len(used) / total_needed * 100) if total_needed > 0 else 0
+            match_percent = recipe_match_percent(r)
             
             # Show match score
             text += f"**📊 ความเหมาะสม: {match_percent:.0f}%** "
@@ -224,15 +551,62 @@ English translation:"""
                     text += f"  - {name}\n"
                 text += "\n"
             
-            # Add recipe ID and link
-            if 'id' in r:
-                recipe_id = r['id']
-                text += f"🔗 [ดูสูตรเต็ม](https://spoonacular.com/recipes/-{recipe_id})\n"
+            # Show locally computed nutrition totals
+            if r.get('nutrition'):
+                text += _format_recipe_nutrition(r['nutrition']) + "\n"
+            
+            # Add recipe link
+            link = recipe_link(r)
+            if link:
+                text += f"🔗 [ดูสูตรเต็ม]({link})\n"
             
             text += "\n" + "─" * 50 + "\n\n"
         
         return text
     
+    def format_recipes_compact(self, recipes: List[Dict[str, Any]]) -> str:
+        """
+        Format recipe list as a dense, token-minimal text for the LLM
+        
+        One line per recipe: title, used/total count, match percentage, the
+        pantry ingredients it uses, the missing ingredients with amounts
+        (needed for shopping lists) and a link to the full recipe.
+        
+        Args:
+            recipes: List of recipe dictionaries
+            
+        Returns:
+            Compact recipe string
+        """
+        if not recipes or (isinstance(recipes, dict) and "error" in recipes):
+            return "no recipes found"
+        
+        lines = ["recipes (title|used/total|match|have|missing|link):"]
+        
+        for r in recipes:
+            used = r.get('usedIngredients', [])
+            missed = r.get('missedIngredients', [])
+            total_needed = len(used) + len(missed)
+            match_percent = recipe_match_percent(r)
+            
+            have = ",".join(ing.get('name', 'Unknown') for ing in used) or "-"
+            missing = ",".join(_compact_ingredient(ing) for ing in missed) or "-"
+            link = recipe_link(r) or "-"
+            lines.append(
+                f"{r.get('title', '')}|{len(used)}/{total_needed}"
+                f"|{match_percent:.0f}%|{have}|{missing}|{link}"
+            )
+            
+            if r.get('nutrition'):
+                nutrition = r['nutrition']
+                values = nutrition['per_serving'] or nutrition['total']
+                scope = f"per serving of {nutrition['servings']:g}" if nutrition['per_serving'] else "total"
+                lines.append(f"  nutrition {scope}: " + ", ".join(
+                    _compact_nutrient(name, f"{value:.0f}") for name, value in values.items()
+                ))
+        
+        return "\n".join(lines)
+    
     def format_nutrition(self, nutrition: Dict[str, Any]) -> str:
         """
         Format nutrition data into readable text
@@ -272,4 +646,164 @@ English translation:"""
         if len(other_nutrients) > 10:
             text += f"\n*...และอื่นๆ อีก {len(other_nutrients) - 10} รายการ*\n"
         
-        return text
\ No newline at end of file
+        return text
+    
+    def format_nutrition_compact(self, nutrition: Dict[str, Any]) -> str:
+        """
+        Format key nutrients as a single dense line for the LLM
+        
+        Args:
+            nutrition: Nutrition dictionary from get_nutrition
+            
+        Returns:
+            Compact nutrition string
+        """
+        if "error" in nutrition:
+            return f"error: {nutrition['error']}"
+        
+        description = nutrition.get("description", "Unknown food")
+        nutrients = nutrition.get("nutrients", {})
+        
+        values = [
+            _compact_nutrient(name, _short_number(nutrients[name]))
+            for name in KEY_NUTRIENTS
+            if name in nutrients
+        ]
+        
+        return f"{description} per100g: " + (", ".join(values) or "no data")
+
+    def format_nutrition_table(self, rows: List[Dict[str, Any]]) -> str:
+        """
+        Format batch nutrition results as one markdown table
+        
+        Args:
+            rows: Results from get_nutrition_batch
+            
+        Returns:
+            Markdown table of key nutrients per 100g
+        """
+        columns = ["kcal", "protein_g", "fat_g", "carbs_g", "fiber_g", "sodium_mg"]
+        headers = ["พลังงาน (kcal)", "โปรตีน (g)", "ไขมัน (g)", "คาร์บ (g)", "ใยอาหาร (g)", "โซเดียม (mg)"]
+        labels = {label: name for name, label in KEY_NUTRIENTS.items()}
+        
+        text = "📊 **ข้อมูลโภชนาการ (ต่อ 100g)**\n\n"
+        text += "| วัตถุดิบ | " + " | ".join(headers) + " |\n"
+        text += "|---" * (len(columns) + 1) + "|\n"
+        
+        missing = []
+        for row in rows:
+            if "error" in row:
+                missing.append(row["ingredient"])
+                continue
+            
+            nutrients = row.get("nutrients", {})
+            values = [
+                _short_number(nutrients[labels[c]]) if labels[c] in nutrients else "-"
+                for c in columns
+            ]
+            name = f"{row['ingredient']} ({row.get('description', '')})"
+            text += f"| {name} | " + " | ".join(values) + " |\n"
+        
+        if missing:
+            text += f"\n⚠️ ไม่พบข้อมูลของ: {', '.join(missing)}\n"
+        
+        return text
+    
+    def format_nutrition_table_compact(self, rows: List[Dict[str, Any]]) -> str:
+        """
+        Format batch nutrition results as one dense line per ingredient
+        
+        Args:
+            rows: Results from get_nutrition_batch
+            
+        Returns:
+            Compact nutrition text for the LLM
+        """
+        return "\n".join(
+            f"{row['ingredient']}: {self.format_nutrition_compact(row)}"
+            for row in rows
+        )
+
+
+def _open_recipe_cache():
+    """Shared findByIngredients cache, or None if disabled or unavailable"""
+    if not DISK_CACHE_FILE:
+        return None
+    try:
+        return DiskCache("spoonacular.findByIngredients", RECIPE_CACHE_TTL, RECIPE_CACHE_MAX_ENTRIES)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Recipe cache disabled: {str(e)}")
+        return None
+
+
+def _build_pantry_index(recipe_cache) -> PantryLSH:
+    """Pantry LSH index seeded with the ingredient sets already in the recipe cache"""
+    index = PantryLSH()
+    if recipe_cache is None:
+        return index
+    
+    for key in recipe_cache.keys():
+        try:
+            index.add(json.loads(key)["ingredients"], key)
+        except (ValueError, KeyError, TypeError):
+            continue
+    
+    logger.info(f"Pantry index loaded with {len(index)} ingredient sets")
+    return index
+
+
+# Nutrients sent to the LLM in compact results (USDA name -> short label)
+KEY_NUTRIENTS = {
+    "Energy": "kcal",
+    "Protein": "protein_g",
+    "Total lipid (fat)": "fat_g",
+    "Carbohydrate, by difference": "carbs_g",
+    "Fiber, total dietary": "fiber_g",
+    "Sugars, total including NLEA": "sugar_g",
+    "Sodium, Na": "sodium_mg",
+}
+
+
+def _format_recipe_nutrition(nutrition: Dict[str, Any]) -> str:
+    """Render recipe nutrition totals as a markdown line"""
+    labels = {
+        "Energy": "พลังงาน {:.0f} kcal",
+        "Protein": "โปรตีน {:.0f} g",
+        "Total lipid (fat)": "ไขมัน {:.0f} g",
+        "Carbohydrate, by difference": "คาร์บ {:.0f} g",
+        "Sodium, Na": "โซเดียม {:.0f} mg",
+    }
+    
+    def render(values):
+        return ", ".join(labels[k].format(values[k]) for k in labels if k in values)
+    
+    text = f"**🔥 โภชนาการรวมทั้งสูตร:** {render(nutrition['total'])}\n"
+    if nutrition.get("per_serving"):
+        text += f"**🍽️ ต่อที่ (แบ่ง {nutrition['servings']:g} ที่):** {render(nutrition['per_serving'])}\n"
+    if nutrition.get("skipped"):
+        text += f"*ไม่ได้รวม: {', '.join(nutrition['skipped'])}*\n"
+    return text
+
+
+def _compact_ingredient(ingredient: Dict[str, Any]) -> str:
+    """Render an ingredient as 'name amount unit' without extra detail"""
+    name = ingredient.get('name', 'Unknown')
+    amount = ingredient.get('amount', 0)
+    unit = ingredient.get('unit', '')
+    
+    if amount and unit:
+        return f"{name} {_short_number(amount)} {unit}"
+    return name
+
+
+def _compact_nutrient(name: str, value: str) -> str:
+    """Render a key nutrient with its unit ('protein 3 g', '52 kcal')"""
+    label, _, unit = KEY_NUTRIENTS[name].rpartition("_")
+    return f"{label} {value} {unit}" if label else f"{value} {unit}"
+
+
+def _short_number(value) -> str:
+    """Render numbers without trailing zeros (2.0 -> 2, 0.333333 -> 0.333333)"""
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
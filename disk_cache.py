@@ -0,0 +1,185 @@
+"""
+Persistent TTL + LRU cache in SQLite
+
+Safe to share between threads and between Streamlit server processes: each
+thread has its own connection, the database runs in WAL mode so readers do
+not block the writer, and writers wait on a busy timeout instead of failing.
+Values are stored as JSON.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from config import DISK_CACHE_FILE
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (namespace, accessed);
+"""
+
+# Hits refresh the LRU timestamp at most this often (avoids a write per read)
+TOUCH_INTERVAL = 60
+
+
+class DiskCache:
+    """Namespaced, size-bounded TTL cache backed by a shared SQLite file"""
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float,
+        max_entries: int,
+        path: str = DISK_CACHE_FILE
+    ):
+        """
+        Initialize disk cache
+
+        Args:
+            namespace: Separates caches that share one database file
+            ttl: Seconds an entry stays valid
+            max_entries: Entries kept in this namespace before LRU eviction
+            path: SQLite database file
+        """
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 objects are not shared)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a value
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Stored value, or None on a miss or expired entry
+        """
+        now = time.time()
+
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires, accessed FROM entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+
+            fresh = row is not None and row[1] > now
+
+            if fresh and now - row[2] > TOUCH_INTERVAL:
+                self._connection().execute(
+                    "UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key)
+                )
+
+        except sqlite3.Error as e:
+            logger.warning(f"Disk cache read failed: {str(e)}")
+            fresh = False
+
+        with self._lock:
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        return json.loads(row[0]) if fresh else None
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store a value and evict expired and least recently used entries
+
+        Args:
+            key: Cache key
+            value: JSON-serializable value
+        """
+        now = time.time()
+
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, json.dumps(value, ensure_ascii=False), now + self.ttl, now)
+                )
+                conn.execute(
+                    "DELETE FROM entries WHERE namespace = ? AND expires <= ?",
+                    (self.namespace, now)
+                )
+                conn.execute(
+                    """
+                    DELETE FROM entries WHERE namespace = ? AND key IN (
+                        SELECT key FROM entries WHERE namespace = ?
+                        ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.namespace, self.namespace, self.max_entries)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        except sqlite3.Error as e:
+            logger.warning(f"Disk cache write failed: {str(e)}")
+
+    def keys(self) -> List[str]:
+        """Keys of all unexpired entries in this namespace"""
+        try:
+            rows = self._connection().execute(
+                "SELECT key FROM entries WHERE namespace = ? AND expires > ?",
+                (self.namespace, time.time())
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Disk cache read failed: {str(e)}")
+            return []
+        return [row[0] for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of this process and entries stored by all processes"""
+        try:
+            entries = self._connection().execute(
+                "SELECT COUNT(*) FROM entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -1,4 +1,5 @@
 import streamlit as st
+from conversation_context import new_context_state
 from config import DEFAULT_MODEL, DEFAULT_TEMPERATURE, MAX_INPUT_LENGTH, MAX_CHAT_HISTORY
 
 
@@ -11,6 +12,9 @@ def init_session_state():
         "model": DEFAULT_MODEL,
         "temperature": DEFAULT_TEMPERATURE,
         "prompt_type": "cooking",
+        "context_state": new_context_state(),
+        "traces": [],
+        "debug": False,
         "user_info": {
             "ingredients": [],
             "allergies": None,
@@ -49,6 +53,7 @@ def archive_current_chat():
 def reset_chat():
     archive_current_chat()
     st.session_state.messages = []
+    st.session_state.context_state = new_context_state()
     st.session_state.page = "home"
     st.session_state.user_info = {
         "ingredients": [],
@@ -67,6 +72,7 @@ def load_chat(index: int):
     """
     archive_current_chat()
     st.session_state.messages = st.session_state.chat_history[index].copy()
+    st.session_state.context_state = new_context_state()
     st.session_state.page = "chat"
 
 
@@ -0,0 +1,233 @@
+"""
+Shared pooled HTTP client for outbound tool traffic
+
+One requests.Session for every tool, so connections (and their TLS
+sessions) are kept alive and reused across tool calls instead of being
+opened per request. Adds default connect/read timeouts, jittered
+exponential-backoff retries for idempotent calls (on connection errors, 429
+and 5xx; a read timeout is not retried), per-provider rate limiting
+(rate_limiter.py) and circuit breakers (circuit_breaker.py), and counters
+showing how often pooled connections were reused.
+"""
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+import tracing
+from rate_limiter import RateLimited, get_rate_limiter
+from circuit_breaker import get_circuit_breakers
+from config import (
+    HTTP_POOL_HOSTS,
+    HTTP_POOL_SIZE,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF,
+    HTTP_BACKOFF_MAX
+)
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HTTPClient:
+    """Thread-safe keep-alive HTTP client with timeouts and retries"""
+
+    def __init__(
+        self,
+        pool_hosts: int = HTTP_POOL_HOSTS,
+        pool_size: int = HTTP_POOL_SIZE,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = HTTP_READ_TIMEOUT,
+        max_retries: int = HTTP_MAX_RETRIES,
+        backoff: float = HTTP_BACKOFF,
+        backoff_max: float = HTTP_BACKOFF_MAX,
+        limiter=None,
+        breakers=None
+    ):
+        """
+        Initialize client
+
+        Args:
+            pool_hosts: Hosts with their own connection pool
+            pool_size: Connections kept alive per host
+            connect_timeout: Seconds to establish a connection
+            read_timeout: Seconds to wait for response data
+            max_retries: Retries after the first attempt (idempotent calls
+                only; connection errors, 429 and 5xx responses)
+            backoff: Base delay; attempt n waits up to backoff * 2^n seconds
+            backoff_max: Upper bound for a single retry delay
+            limiter: RateLimiter for calls that name a provider
+            breakers: CircuitBreakers for calls that name a provider
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.limiter = limiter or get_rate_limiter()
+        self.breakers = breakers or get_circuit_breakers()
+
+        self.session = requests.Session()
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        self._adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size)
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.errors = 0
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        span: str = "http.request",
+        attributes: Optional[Dict[str, Any]] = None,
+        idempotent: Optional[bool] = None,
+        provider: Optional[str] = None,
+        **kwargs
+    ) -> requests.Response:
+        """
+        Send a request through the shared pool
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            span: Trace span name (e.g. "http.usda")
+            attributes: Extra span attributes
+            idempotent: Whether the call may be retried; defaults to True for
+                GET/HEAD/OPTIONS/PUT/DELETE (pass True for read-only POSTs)
+            provider: Upstream name (e.g. "spoonacular"); each attempt passes
+                its circuit breaker and takes a rate-limit token, and responses
+                update its quota gauge and breaker
+            **kwargs: Passed to requests (params, json, headers, timeout...)
+
+        Returns:
+            The last response (callers still check raise_for_status)
+
+        Raises:
+            CircuitOpen: If the provider's circuit breaker is open
+            RateLimited: If the provider's limits were hit (locally, or HTTP 402/429)
+            requests.RequestException: If every attempt failed to connect, or
+                the server did not answer within the read timeout
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        retries = self.max_retries if idempotent else 0
+        kwargs.setdefault("timeout", self.timeout)
+        breaker = self.breakers.get(provider) if provider else None
+
+        with tracing.span(span, method=method, **(attributes or {})) as request_span:
+            for attempt in range(retries + 1):
+                if provider:
+                    breaker.allow()
+                    try:
+                        queued = self.limiter.acquire(provider)
+                    except RateLimited:
+                        breaker.cancel()
+                        raise
+                    if queued:
+                        request_span.set("queued_ms", round(queued * 1000, 1))
+
+                start = time.monotonic()
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if breaker:
+                        breaker.record(False, time.monotonic() - start)
+                    # A read timeout already waited the full read timeout; retrying
+                    # would multiply it. Connect timeouts are ConnectionErrors.
+                    if attempt == retries or not isinstance(e, requests.ConnectionError):
+                        with self._lock:
+                            self.errors += 1
+                        request_span.set("attempts", attempt + 1)
+                        raise
+                    delay = self._delay(attempt)
+                    logger.info(f"{method} {url} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                except BaseException:
+                    if breaker:
+                        breaker.cancel()
+                    raise
+                else:
+                    if provider:
+                        breaker.record(response.status_code < 500, time.monotonic() - start)
+                        self.limiter.record(provider, response.status_code, response.headers)
+
+                    if response.status_code not in RETRY_STATUSES or attempt == retries:
+                        request_span.set("status", response.status_code)
+                        request_span.set("attempts", attempt + 1)
+                        if provider and response.status_code in (402, 429):
+                            raise RateLimited.from_response(provider, response.status_code, response.headers)
+                        return response
+                    if provider and response.status_code == 429:
+                        delay = 0.0  # The limiter queues the retry until Retry-After
+                    else:
+                        delay = self._delay(attempt, response.headers.get("Retry-After"))
+                    logger.info(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s")
+                    response.close()
+
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+
+    def _delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Full-jitter exponential backoff, or the server's Retry-After if shorter than the cap"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Connection reuse counters
+
+        Returns:
+            Requests sent, connections opened, requests served on a reused
+            connection, reuse rate, retries and failed requests
+        """
+        requests_sent = connections = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_sent += pool.num_requests
+            connections += pool.num_connections
+
+        reused = max(requests_sent - connections, 0)
+        with self._lock:
+            return {
+                "requests": requests_sent,
+                "connections": connections,
+                "reused": reused,
+                "reuse_rate": reused / requests_sent if requests_sent else 0.0,
+                "retries": self.retries,
+                "errors": self.errors
+            }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HTTPClient:
+    """Shared client used by all tools"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HTTPClient()
+        return _client
@@ -0,0 +1,256 @@
+"""
+Thai to English ingredient translation
+
+Three tiers, cheapest first:
+1. Bundled dictionary of common ingredients (data/thai_ingredients.json)
+2. Learned cache of earlier LLM translations, persisted to disk
+3. One batched LLM call for everything still missing
+
+Names are normalized before lookup, so spacing, zero-width characters and
+common variants ("เนื้อไก่", "พริก สด") share an entry.
+"""
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+import tracing
+from config import (
+    TRANSLATION_DICTIONARY_FILE,
+    TRANSLATION_CACHE_FILE,
+    TRANSLATION_MODEL
+)
+
+logger = logging.getLogger(__name__)
+
+_ZERO_WIDTH = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u2060\ufeff"))
+
+# Qualifiers stripped when the full name is not known ("เนื้อปลา" -> "ปลา")
+VARIANT_PREFIXES = ("เนื้อ",)
+VARIANT_SUFFIXES = ("สด", "หั่น", "ซอย")
+
+
+def is_thai(text: str) -> bool:
+    """Check if text contains Thai characters"""
+    return any(0x0E00 <= ord(char) <= 0x0E7F for char in text)
+
+
+def normalize_thai(text: str) -> str:
+    """
+    Normalize a Thai ingredient name for lookup
+
+    Applies NFC, drops zero-width characters, fixes sara am typed as
+    nikhahit + sara aa, lowercases, and removes spaces between Thai
+    characters ("กระ เทียม" -> "กระเทียม").
+    """
+    text = unicodedata.normalize("NFC", text).translate(_ZERO_WIDTH)
+    text = text.replace("\u0e4d\u0e32", "\u0e33")
+    text = re.sub(r"\s+", " ", text.strip().lower()).strip(" .,-*•")
+    return re.sub(r"(?<=[\u0e00-\u0e7f]) (?=[\u0e00-\u0e7f])", "", text)
+
+
+class IngredientTranslator:
+    """Thread-safe dictionary -> learned cache -> LLM translator"""
+
+    def __init__(
+        self,
+        dictionary_file: str = TRANSLATION_DICTIONARY_FILE,
+        cache_file: Optional[str] = TRANSLATION_CACHE_FILE,
+        model: str = TRANSLATION_MODEL
+    ):
+        """
+        Initialize translator
+
+        Args:
+            dictionary_file: Bundled Thai -> English JSON dictionary
+            cache_file: JSON file for learned translations (None or "" keeps
+                them in memory only)
+            model: Model used for dictionary and cache misses
+        """
+        self.cache_file = cache_file
+        self.model = model
+        self.dictionary = _load_json(dictionary_file)
+        self.learned = _load_json(cache_file) if cache_file else {}
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+        logger.info(
+            f"Translator ready: {len(self.dictionary)} dictionary entries, "
+            f"{len(self.learned)} learned"
+        )
+
+    def translate(self, ingredients: List[str]) -> List[str]:
+        """
+        Translate ingredient names to English
+
+        Args:
+            ingredients: Ingredient names (Thai or English)
+
+        Returns:
+            English names in the same order; names that cannot be translated
+            are returned unchanged
+        """
+        if not any(is_thai(i) for i in ingredients):
+            return list(ingredients)
+
+        self.warm(ingredients)
+
+        with self._lock:
+            return [
+                (self._lookup(normalize_thai(i)) or i) if is_thai(i) else i
+                for i in ingredients
+            ]
+
+    def warm(self, ingredients: Iterable[str]) -> None:
+        """
+        Make sure every Thai name is known, translating all misses with one
+        LLM call. Names another thread is already translating are waited
+        for instead of being sent again.
+        """
+        names = {normalize_thai(i) for i in ingredients if is_thai(i)}
+
+        with self._lock:
+            missing = [n for n in sorted(names) if self._lookup(n) is None]
+            waiting = [self._in_flight[n] for n in missing if n in self._in_flight]
+            claimed = [n for n in missing if n not in self._in_flight]
+            done = threading.Event()
+            for name in claimed:
+                self._in_flight[name] = done
+
+        try:
+            if claimed:
+                self._learn(self._translate_with_llm(claimed))
+        finally:
+            with self._lock:
+                for name in claimed:
+                    self._in_flight.pop(name, None)
+            done.set()
+
+        for event in waiting:
+            event.wait()
+
+    def _lookup(self, name: str) -> Optional[str]:
+        """Dictionary, learned cache, then variant lookup (caller holds the lock)"""
+        for candidate in _variants(name):
+            english = self.dictionary.get(candidate) or self.learned.get(candidate)
+            if english:
+                return english
+        return None
+
+    def _translate_with_llm(self, names: List[str]) -> Dict[str, str]:
+        """Translate names with one LLM call; returns what could be parsed"""
+        from utils.llm_router import completion
+
+        prompt = f"""Translate these Thai food ingredient names to English.
+Return only a JSON object mapping each Thai name exactly as given to its
+common English ingredient name, nothing else.
+
+Thai ingredients: {json.dumps(names, ensure_ascii=False)}"""
+
+        try:
+            with tracing.span("llm.translate", model=self.model, items=len(names)):
+                response = completion(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.0,
+                    max_tokens=40 + 20 * len(names)
+                )
+
+            text = response.choices[0].message.content or ""
+            match = re.search(r"\{.*\}", text, re.DOTALL)
+            translated = json.loads(match.group(0)) if match else {}
+
+        except Exception as e:
+            logger.error(f"Translation error: {str(e)}")
+            return {}
+
+        result = {
+            normalize_thai(thai): english.strip().lower()
+            for thai, english in translated.items()
+            if isinstance(english, str) and english.strip() and not is_thai(english)
+        }
+        logger.info(f"Translated {names} → {result}")
+        return result
+
+    def _learn(self, translations: Dict[str, str]) -> None:
+        """Add translations to the learned cache and persist it"""
+        if not translations:
+            return
+
+        with self._lock:
+            self.learned.update(translations)
+            snapshot = dict(self.learned)
+
+        if self.cache_file:
+            _save_json(self.cache_file, snapshot)
+
+
+def _variants(name: str) -> List[str]:
+    """name followed by forms with common qualifiers removed"""
+    variants = [name]
+    for prefix in VARIANT_PREFIXES:
+        if name.startswith(prefix) and len(name) > len(prefix):
+            variants.append(name[len(prefix):])
+    for suffix in VARIANT_SUFFIXES:
+        for variant in list(variants):
+            if variant.endswith(suffix) and len(variant) > len(suffix):
+                variants.append(variant[:-len(suffix)].strip())
+    return variants
+
+
+def _load_json(path: str) -> Dict[str, str]:
+    """Load a Thai -> English map, normalizing its keys"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return {normalize_thai(k): v for k, v in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not load translations from {path}: {str(e)}")
+        return {}
+
+
+_save_lock = threading.Lock()
+
+
+def _save_json(path: str, data: Dict[str, str]) -> None:
+    """
+    Merge data into the JSON file at path and write it atomically
+
+    Other processes share the file, so entries already on disk are kept and
+    each write goes through its own temp file before the rename.
+    """
+    try:
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+
+        with _save_lock:
+            merged = {**_load_json(path), **data}
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=directory, suffix=".tmp", delete=False
+            ) as f:
+                json.dump(merged, f, ensure_ascii=False, indent=0, sort_keys=True)
+            try:
+                os.replace(f.name, path)
+            except OSError:
+                os.unlink(f.name)
+                raise
+
+    except OSError as e:
+        logger.warning(f"Could not save translations: {str(e)}")
+
+
+_translator = None
+_translator_lock = threading.Lock()
+
+
+def get_translator() -> IngredientTranslator:
+    """Process-wide translator shared by all sessions"""
+    global _translator
+    with _translator_lock:
+        if _translator is None:
+            _translator = IngredientTranslator()
+        return _translator
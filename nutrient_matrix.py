@@ -0,0 +1,368 @@
+"""
+Memory-mapped foods x nutrients matrix for vectorized nutrient queries
+
+Built once from the local USDA index (usda_index.py) into a .npy file that
+every process opens read-only with mmap, so all Streamlit workers share one
+copy through the OS page cache. find_foods_by_nutrients filters and ranks
+the whole table with NumPy in milliseconds instead of calling get_nutrition
+per food.
+
+Usage:
+    python -m nutrient_matrix build               # after python -m usda_index import ...
+    python -m nutrient_matrix build --include-branded
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from config import USDA_INDEX_FILE, NUTRIENT_MATRIX_FILE
+
+logger = logging.getLogger(__name__)
+
+# Short names accepted by the tool -> USDA nutrient name
+NUTRIENT_ALIASES = {
+    "kcal": "Energy",
+    "energy": "Energy",
+    "calories": "Energy",
+    "protein": "Protein",
+    "fat": "Total lipid (fat)",
+    "carbs": "Carbohydrate, by difference",
+    "carbohydrate": "Carbohydrate, by difference",
+    "fiber": "Fiber, total dietary",
+    "sugar": "Sugars, total including NLEA",
+    "sodium": "Sodium, Na",
+    "potassium": "Potassium, K",
+    "calcium": "Calcium, Ca",
+    "iron": "Iron, Fe",
+    "vitamin_c": "Vitamin C, total ascorbic acid",
+    "cholesterol": "Cholesterol",
+    "saturated_fat": "Fatty acids, total saturated",
+    "water": "Water",
+}
+
+# Data types kept unless branded foods are requested (see usda_index priorities)
+GENERIC_PRIORITY = 2
+
+MAX_RESULTS = 25
+
+
+class NutrientMatrix:
+    """Read-only foods x nutrients matrix (values per 100g, NaN = unknown)"""
+
+    def __init__(self, path: str = NUTRIENT_MATRIX_FILE):
+        """
+        Open a matrix built by build_matrix()
+
+        Args:
+            path: .npy matrix file; metadata is read from the .json beside it
+        """
+        self.values = np.load(path, mmap_mode="r")
+
+        with open(_meta_path(path), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        self.descriptions = meta["descriptions"]
+        self.nutrients = meta["nutrients"]
+        self.units = meta["units"]
+        self._columns = {}
+        for i, name in enumerate(self.nutrients):
+            # Duplicate nutrient names (rare in FDC) keep the first column
+            self._columns.setdefault(name.lower(), i)
+        self._lower_descriptions = None
+
+    def column(self, name: str) -> int:
+        """
+        Column index for a nutrient alias, short label or USDA name
+
+        Raises:
+            KeyError: If the nutrient is unknown
+        """
+        key = name.strip().lower()
+        key = re.sub(r"_(g|mg|ug|mcg)$", "", key)
+        usda_name = NUTRIENT_ALIASES.get(key, name.strip())
+
+        index = self._columns.get(usda_name.lower())
+        if index is None:
+            raise KeyError(name)
+        return index
+
+    def query(
+        self,
+        filters: Optional[List[Dict[str, Any]]] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = True,
+        contains: Optional[str] = None,
+        limit: int = 10
+    ) -> Dict[str, Any]:
+        """
+        Filter and rank every food at once
+
+        Args:
+            filters: [{"nutrient": "protein", "min": 20, "max": None}, ...];
+                "nutrient" may be a ratio such as "protein/kcal"
+            sort_by: Nutrient or ratio to rank by (defaults to the first filter)
+            descending: Highest values first
+            contains: Only foods whose description contains this text
+            limit: Maximum foods returned
+
+        Returns:
+            {"columns": [names], "foods": [{"description", "values"}], "matched": int}
+
+        Raises:
+            KeyError: If a nutrient name is unknown
+        """
+        filters = filters or []
+        mask = np.ones(len(self.descriptions), dtype=bool)
+        columns = []
+
+        for f in filters:
+            values = self._expression(f["nutrient"])
+            columns.append(f["nutrient"])
+            # NaN compares False, so foods missing the nutrient drop out
+            if f.get("min") is not None:
+                mask &= values >= float(f["min"])
+            if f.get("max") is not None:
+                mask &= values <= float(f["max"])
+
+        if contains:
+            mask &= self._description_mask(contains)
+
+        sort_by = sort_by or (filters[0]["nutrient"] if filters else None)
+        candidates = np.flatnonzero(mask)
+        limit = max(1, min(limit, MAX_RESULTS))
+
+        if sort_by is not None:
+            if sort_by not in columns:
+                columns.append(sort_by)
+            score = self._expression(sort_by)[candidates]
+            score = np.where(np.isnan(score), -np.inf if descending else np.inf, score)
+            if descending:
+                score = -score
+
+            if len(candidates) > limit:
+                top = np.argpartition(score, limit - 1)[:limit]
+                candidates = candidates[top[np.argsort(score[top], kind="stable")]]
+            else:
+                candidates = candidates[np.argsort(score, kind="stable")]
+        else:
+            candidates = candidates[:limit]
+
+        selected = [self._expression(c)[candidates] for c in columns]
+
+        return {
+            "columns": columns,
+            "matched": int(mask.sum()),
+            "foods": [
+                {
+                    "description": self.descriptions[row],
+                    "values": [None if np.isnan(v[i]) else float(v[i]) for v in selected]
+                }
+                for i, row in enumerate(candidates)
+            ]
+        }
+
+    def _expression(self, expression: str) -> np.ndarray:
+        """Column values for "nutrient" or "nutrient/nutrient" (per unit of the divisor)"""
+        if "/" in expression:
+            numerator, denominator = expression.split("/", 1)
+            top = self.values[:, self.column(numerator)]
+            bottom = self.values[:, self.column(denominator)]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.where(bottom > 0, top / bottom, np.nan)
+        return np.asarray(self.values[:, self.column(expression)])
+
+    def _description_mask(self, text: str) -> np.ndarray:
+        """Foods whose description contains every word of text"""
+        if self._lower_descriptions is None:
+            self._lower_descriptions = np.array([d.lower() for d in self.descriptions])
+
+        mask = np.ones(len(self.descriptions), dtype=bool)
+        for word in re.findall(r"\w+", text.lower()):
+            mask &= np.char.find(self._lower_descriptions, word) >= 0
+        return mask
+
+    def format_results(self, result: Dict[str, Any]) -> str:
+        """
+        Format query results as a markdown table
+
+        Args:
+            result: Result from query()
+
+        Returns:
+            Markdown table (values per 100g)
+        """
+        if not result["foods"]:
+            return "❌ ไม่พบวัตถุดิบที่ตรงเงื่อนไข"
+
+        headers = [self._header(c) for c in result["columns"]]
+        text = f"🥗 **วัตถุดิบที่ตรงเงื่อนไข** ({len(result['foods'])} จาก {result['matched']} รายการ, ต่อ 100g)\n\n"
+        text += "| วัตถุดิบ | " + " | ".join(headers) + " |\n"
+        text += "|---" * (len(headers) + 1) + "|\n"
+
+        for food in result["foods"]:
+            values = ["-" if v is None else f"{v:.4g}" for v in food["values"]]
+            text += f"| {food['description']} | " + " | ".join(values) + " |\n"
+
+        return text
+
+    def format_results_compact(self, result: Dict[str, Any]) -> str:
+        """
+        Format query results as one dense line per food for the LLM
+
+        Args:
+            result: Result from query()
+
+        Returns:
+            Compact result text
+        """
+        if not result["foods"]:
+            return "no foods match"
+
+        lines = [f"{len(result['foods'])}/{result['matched']} matches, per100g"]
+        for food in result["foods"]:
+            values = ", ".join(
+                f"{c} {'-' if v is None else f'{v:.4g}'}"
+                for c, v in zip(result["columns"], food["values"])
+            )
+            lines.append(f"{food['description']}: {values}")
+        return "\n".join(lines)
+
+    def _header(self, expression: str) -> str:
+        """Column header with unit, e.g. "Protein (G)" or "protein/kcal" """
+        if "/" in expression:
+            return expression
+        index = self.column(expression)
+        unit = self.units[index]
+        return f"{self.nutrients[index]} ({unit})" if unit else self.nutrients[index]
+
+
+def build_matrix(
+    db_path: str = USDA_INDEX_FILE,
+    out_path: str = NUTRIENT_MATRIX_FILE,
+    include_branded: bool = False
+) -> Tuple[int, int]:
+    """
+    Build the matrix file from the local USDA index
+
+    Args:
+        db_path: Database created by python -m usda_index import
+        out_path: .npy file to write (metadata goes to a .json beside it)
+        include_branded: Also include branded products
+
+    Returns:
+        (foods, nutrients) shape of the matrix
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+    try:
+        max_priority = 99 if include_branded else GENERIC_PRIORITY
+        foods = conn.execute(
+            "SELECT fdc_id, description FROM foods WHERE priority <= ? ORDER BY fdc_id",
+            (max_priority,)
+        ).fetchall()
+        nutrients = conn.execute(
+            """
+            SELECT n.id, n.name, n.unit FROM nutrients n
+            WHERE EXISTS (SELECT 1 FROM food_nutrients fn WHERE fn.nutrient_id = n.id)
+            ORDER BY n.id
+            """
+        ).fetchall()
+
+        rows = {fdc_id: i for i, (fdc_id, _) in enumerate(foods)}
+        columns = {nutrient_id: j for j, (nutrient_id, _, _) in enumerate(nutrients)}
+
+        directory = os.path.dirname(out_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Fill a writable memmap so large (branded) tables never sit in RAM twice
+        tmp_path = f"{out_path}.tmp.npy"
+        matrix = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=np.float32, shape=(len(foods), len(nutrients))
+        )
+        matrix[:] = np.nan
+
+        cursor = conn.execute(
+            "SELECT fdc_id, nutrient_id, amount FROM food_nutrients ORDER BY fdc_id"
+        )
+        while True:
+            batch = cursor.fetchmany(100000)
+            if not batch:
+                break
+            kept = [(rows[f], columns[n], a) for f, n, a in batch if f in rows and n in columns]
+            if kept:
+                r, c, a = zip(*kept)
+                matrix[np.array(r), np.array(c)] = np.array(a, dtype=np.float32)
+
+        matrix.flush()
+        del matrix
+
+    finally:
+        conn.close()
+
+    meta = {
+        "descriptions": [description for _, description in foods],
+        "nutrients": [name for _, name, _ in nutrients],
+        "units": [unit or "" for _, _, unit in nutrients],
+        "built": time.time()
+    }
+
+    with open(f"{_meta_path(out_path)}.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    os.replace(tmp_path, out_path)
+    os.replace(f"{_meta_path(out_path)}.tmp", _meta_path(out_path))
+
+    return len(foods), len(nutrients)
+
+
+def _meta_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+_matrix = None
+_matrix_lock = threading.Lock()
+
+
+def get_nutrient_matrix() -> Optional[NutrientMatrix]:
+    """Shared read-only matrix, or None if it has not been built"""
+    global _matrix
+    with _matrix_lock:
+        if _matrix is None and NUTRIENT_MATRIX_FILE and os.path.exists(NUTRIENT_MATRIX_FILE):
+            try:
+                _matrix = NutrientMatrix(NUTRIENT_MATRIX_FILE)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Could not open nutrient matrix: {str(e)}")
+        return _matrix
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Foods x nutrients matrix")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build the matrix from the local USDA index")
+    build.add_argument("--db", default=USDA_INDEX_FILE, help="USDA index database")
+    build.add_argument("--out", default=NUTRIENT_MATRIX_FILE, help="Matrix file (.npy)")
+    build.add_argument("--include-branded", action="store_true", help="Include branded products")
+
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No USDA index at {args.db}; run python -m usda_index import first")
+        return 1
+
+    start = time.time()
+    foods, nutrients = build_matrix(args.db, args.out, args.include_branded)
+    print(f"Built {foods} x {nutrients} matrix at {args.out} in {time.time() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -60,11 +60,17 @@ def _handle_chat_input():
         with st.chat_message("user", avatar=USER_AVATAR):
             st.write(prompt)
         
-        # Generate and display assistant response
+        # Stream assistant response into the bubble as tokens arrive
         with st.chat_message("assistant", avatar=BOT_AVATAR):
-            with st.spinner("กำลังคิด..."):
-                response = generate_response(prompt)
-                st.write(response)
+            placeholder = st.empty()
+            placeholder.markdown("กำลังคิด...")
+            
+            response = ""
+            for chunk in generate_response(prompt, stream=True):
+                response += chunk
+                placeholder.markdown(response + "▌")
+            
+            placeholder.markdown(response)
         
         # Rerun to update chat history
         st.rerun()
\ No newline at end of file
@@ -5,7 +5,10 @@ import streamlit as st
 from io import BytesIO
 from PIL import Image
 from helpers import validate_input, archive_current_chat
-from ai_handler import generate_response
+from conversation_context import new_context_state
+from cook_tool import parse_ingredient_list
+from ai_handler import generate_response, record_trace
+import tracing
 
 # Try to import vision handler
 try:
@@ -84,11 +87,14 @@ def _process_image(uploaded_file):
         uploaded_file.seek(0)
         
         # Detect ingredients
-        ingredients = detect_ingredients(
-            uploaded_file,
-            temperature=0.7,
-            max_tokens=1000
-        )
+        with tracing.span("image_upload") as root:
+            ingredients = detect_ingredients(
+                uploaded_file,
+                temperature=0.7,
+                max_tokens=1000
+            )
+    
+    record_trace(tracing.trace_to_dicts(root))
     
     if ingredients:
         ingredients_text = ", ".join(ingredients)
@@ -134,10 +140,11 @@ def _start_new_chat_with_ingredients(ingredients: str):
     archive_current_chat()
     first_prompt = f"ฉันมีวัตถุดิบคือ: {ingredients}\n\nช่วยแนะนำเมนูอาหารที่เหมาะสมหน่อยครับ"
     st.session_state.messages = []
+    st.session_state.context_state = new_context_state()
     st.session_state.page = "chat"
     
     # Generate first response
     with st.spinner("กำลังค้นหาสูตร..."):
-        generate_response(first_prompt)
+        generate_response(first_prompt, ingredients=parse_ingredient_list(ingredients))
     
     st.rerun()
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+MinHash LSH index of pantries (ingredient sets)
+
+Finds a previously searched ingredient set whose Jaccard similarity to a new
+one is above a threshold, in time independent of how many sets are stored.
+Signatures are split into bands; sets sharing any band bucket are
+candidates, and candidates are confirmed with their exact Jaccard similarity.
+"""
+import hashlib
+import random
+import threading
+from typing import Any, Iterable, List, Optional, Tuple
+from config import PANTRY_LSH_PERMUTATIONS, PANTRY_LSH_BANDS, PANTRY_SIMILARITY
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _hash(item: str) -> int:
+    """Stable 32-bit hash (Python's hash() is salted per process)"""
+    return int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=4).digest(), "big")
+
+
+def jaccard(a: Iterable[str], b: Iterable[str]) -> float:
+    """Exact Jaccard similarity of two sets"""
+    a, b = set(a), set(b)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class PantryLSH:
+    """Thread-safe MinHash LSH index mapping ingredient sets to values"""
+
+    def __init__(
+        self,
+        permutations: int = PANTRY_LSH_PERMUTATIONS,
+        bands: int = PANTRY_LSH_BANDS,
+        threshold: float = PANTRY_SIMILARITY,
+        seed: int = 1
+    ):
+        """
+        Initialize index
+
+        With b bands of r rows, sets with Jaccard similarity s become
+        candidates with probability 1 - (1 - s^r)^b; the defaults (16 x 4)
+        catch s >= 0.75 over 99% of the time.
+
+        Args:
+            permutations: MinHash signature length (multiple of bands)
+            bands: LSH bands
+            threshold: Minimum exact Jaccard similarity for a match
+            seed: Seed for the hash permutations
+        """
+        if permutations % bands:
+            raise ValueError("permutations must be a multiple of bands")
+
+        rng = random.Random(seed)
+        self._coefficients = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME))
+            for _ in range(permutations)
+        ]
+        self.bands = bands
+        self.rows = permutations // bands
+        self.threshold = threshold
+        self._buckets = [dict() for _ in range(bands)]
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def signature(self, items: Iterable[str]) -> Tuple[int, ...]:
+        """MinHash signature of a set"""
+        hashes = [_hash(item) for item in set(items)]
+        if not hashes:
+            return tuple([_MAX_HASH] * len(self._coefficients))
+        return tuple(
+            min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH
+            for a, b in self._coefficients
+        )
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, ...]]:
+        return [
+            signature[i * self.rows:(i + 1) * self.rows]
+            for i in range(self.bands)
+        ]
+
+    def add(self, items: Iterable[str], value: Any) -> None:
+        """
+        Index an ingredient set
+
+        Args:
+            items: Canonical ingredient names
+            value: Value returned by query() (e.g. a cache key)
+        """
+        items = frozenset(items)
+        if not items:
+            return
+
+        bands = self._band_keys(self.signature(items))
+
+        with self._lock:
+            self._entries[items] = value
+            for band, key in zip(self._buckets, bands):
+                band.setdefault(key, set()).add(items)
+
+    def query(self, items: Iterable[str]) -> Optional[Tuple[Any, float]]:
+        """
+        Most similar indexed set at or above the threshold
+
+        Args:
+            items: Canonical ingredient names
+
+        Returns:
+            (value, similarity) of the best match, or None
+        """
+        items = frozenset(items)
+        if not items:
+            return None
+
+        bands = self._band_keys(self.signature(items))
+
+        with self._lock:
+            candidates = set()
+            for band, key in zip(self._buckets, bands):
+                candidates |= band.get(key, set())
+
+            scored = [(jaccard(items, c), c) for c in candidates]
+            scored = [(s, c) for s, c in scored if s >= self.threshold]
+            if not scored:
+                return None
+
+            similarity, best = max(scored, key=lambda sc: sc[0])
+            return self._entries[best], similarity
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -13,6 +13,9 @@ COOKING_ASSISTANT_PROMPT = """You are a helpful AI cooking assistant with access
 **When to Use Tools:**
 - Use `search_recipes` when users mention ingredients or ask for recipe ideas
 - Use `get_nutrition` when users ask about nutritional content of specific foods
+- Use `get_nutrition_batch` (one call) when users ask about several ingredients at once
+- Use `find_foods_by_nutrients` to find ingredients matching nutrient targets (e.g. high protein, low fat)
+- For nutrition of whole recipes, call `search_recipes` with `include_nutrition: true` instead of `get_nutrition` per ingredient
 - Use `search_web` for general questions, current events, or non-cooking topics
 
 **Multi-Turn Conversation Flow:**
@@ -90,7 +93,8 @@ COOKING_ASSISTANT_PROMPT_SHORT = """You are a friendly AI cooking assistant with
 
 **Tool Rules:**
 - search_recipes: Use ONLY after gathering all 3 answers above
-- get_nutrition: Can use anytime
+- get_nutrition / get_nutrition_batch: Can use anytime (batch for 2+ ingredients)
+- find_foods_by_nutrients: Can use anytime for nutrient targets (high protein, low fat...)
 - search_web: Can use anytime
 
 **Missing Ingredients - CRITICAL:**
@@ -110,6 +114,8 @@ Use tools when needed:
 - `search_web` for current events and general questions
 - `search_recipes` for cooking ideas based on ingredients
 - `get_nutrition` for food nutritional information
+- `get_nutrition_batch` for several foods at once
+- `find_foods_by_nutrients` for foods matching nutrient targets
 
 When presenting recipes, always clearly indicate:
 - What ingredients the user already has (✅)
@@ -132,6 +138,10 @@ PROMPTS = {
     "debug": DEBUG_PROMPT
 }
 
+# Prompts that let the model search recipes in reply to the first message
+# (the cooking prompts ask about allergies, diet and preferences first)
+FIRST_TURN_SEARCH_PROMPTS = {"general", "debug"}
+
 
 def get_prompt(prompt_type: str = "cooking") -> str:
     """
@@ -143,4 +153,17 @@ def get_prompt(prompt_type: str = "cooking") -> str:
     Returns:
         System prompt string
     """
-    return PROMPTS.get(prompt_type, COOKING_ASSISTANT_PROMPT)
\ No newline at end of file
+    return PROMPTS.get(prompt_type, COOKING_ASSISTANT_PROMPT)
+
+
+def searches_on_first_turn(prompt_type: str) -> bool:
+    """
+    Whether a prompt may call search_recipes in its first reply
+    
+    Args:
+        prompt_type: One of "cooking", "cooking_short", "general", "debug"
+    
+    Returns:
+        True if a recipe search is worth starting before the first completion
+    """
+    return prompt_type in FIRST_TURN_SEARCH_PROMPTS
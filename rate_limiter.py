@@ -0,0 +1,233 @@
+"""
+Per-provider token-bucket rate limiting with live quota tracking
+
+Every outbound call to a rate-limited upstream (Spoonacular, USDA, Serper,
+Tavily) takes a token from that provider's bucket. When the bucket is empty
+the call queues briefly instead of failing, up to a deadline. Remaining
+quota is read from each response's headers; once a provider reports its
+quota used up (or answers 402/429), calls fail fast with a specific message
+instead of burning more requests.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional
+from config import RATE_LIMITS, RATE_LIMIT_MAX_WAIT, QUOTA_RECHECK_SECONDS
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_NAMES = {
+    "spoonacular": "Spoonacular",
+    "usda": "USDA",
+    "serper": "Serper",
+    "tavily": "Tavily",
+}
+
+# (remaining, limit) header pairs, most specific first; Spoonacular counts points
+QUOTA_HEADERS = [
+    ("X-API-Quota-Left", None),
+    ("X-RateLimit-Remaining", "X-RateLimit-Limit"),
+    ("X-RateLimit-Remaining-Requests", "X-RateLimit-Limit-Requests"),
+]
+
+
+class RateLimited(Exception):
+    """A call was not sent (or was refused) because of a provider's limits"""
+
+    def __init__(self, provider: str, reason: str, retry_after: Optional[float] = None):
+        """
+        Args:
+            provider: Provider key (e.g. "spoonacular")
+            reason: "quota" (quota used up / HTTP 402) or "rate" (too many
+                requests right now / HTTP 429)
+            retry_after: Seconds until a retry may succeed, if known
+        """
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"{provider} {reason} limit reached")
+
+    @classmethod
+    def from_response(cls, provider: str, status: int, headers: Mapping[str, str]) -> "RateLimited":
+        """Error for an HTTP 402 (quota used up) or 429 (too many requests) response"""
+        return cls(provider, "quota" if status == 402 else "rate", _number(headers.get("Retry-After")))
+
+    @property
+    def user_message(self) -> str:
+        """Message shown to the user"""
+        name = PROVIDER_NAMES.get(self.provider, self.provider)
+        if self.reason == "quota":
+            return f"⚠️ โควตาการใช้งาน {name} หมดแล้ว กรุณาลองใหม่ภายหลัง"
+        if self.retry_after:
+            return f"⚠️ มีการใช้งาน {name} จำนวนมากในขณะนี้ กรุณาลองใหม่ในอีก {max(1, round(self.retry_after))} วินาที"
+        return f"⚠️ มีการใช้งาน {name} จำนวนมากในขณะนี้ กรุณาลองใหม่อีกครั้ง"
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate tokens per second"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """
+        Take a token, possibly from the future
+
+        Not thread-safe; the limiter holds its lock around this.
+
+        Args:
+            max_wait: Longest acceptable wait in seconds
+
+        Returns:
+            Seconds to wait before sending, or None if that exceeds max_wait
+            (no token is taken then)
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        # Tokens go negative while callers are queued; each waits its turn
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if wait > max_wait:
+            return None
+
+        self.tokens -= 1
+        return wait
+
+
+class RateLimiter:
+    """Thread-safe limiter with one token bucket and quota gauge per provider"""
+
+    def __init__(
+        self,
+        limits: Mapping[str, Mapping[str, float]] = RATE_LIMITS,
+        max_wait: float = RATE_LIMIT_MAX_WAIT
+    ):
+        """
+        Initialize limiter
+
+        Args:
+            limits: Provider -> {"rate": requests per second, "burst": bucket size}
+            max_wait: Longest a call queues for a token before failing
+        """
+        self.max_wait = max_wait
+        self._buckets = {
+            provider: TokenBucket(limit["rate"], int(limit["burst"]))
+            for provider, limit in limits.items()
+        }
+        self._quota = {}
+        self._blocked_until = {}
+        self._counters = {provider: {"sent": 0, "queued": 0, "rejected": 0} for provider in limits}
+        self._lock = threading.Lock()
+
+    def acquire(self, provider: str) -> float:
+        """
+        Wait for permission to send one request
+
+        Args:
+            provider: Provider key; unknown providers are not limited
+
+        Returns:
+            Seconds spent queued
+
+        Raises:
+            RateLimited: If the quota is used up or the wait would exceed max_wait
+        """
+        bucket = self._buckets.get(provider)
+        if bucket is None:
+            return 0.0
+
+        with self._lock:
+            counters = self._counters[provider]
+            now = time.monotonic()
+
+            quota = self._quota.get(provider)
+            if quota and quota["remaining"] is not None and quota["remaining"] <= 0:
+                if now - quota["checked"] < QUOTA_RECHECK_SECONDS:
+                    counters["rejected"] += 1
+                    raise RateLimited(provider, "quota")
+                # Let one request through to see whether the quota has reset
+                quota["checked"] = now
+
+            blocked = max(0.0, self._blocked_until.get(provider, 0.0) - now)
+            wait = bucket.reserve(self.max_wait - blocked) if blocked <= self.max_wait else None
+            if wait is None:
+                counters["rejected"] += 1
+                raise RateLimited(provider, "rate", blocked or 1 / bucket.rate)
+
+            wait += blocked
+            counters["sent"] += 1
+            if wait > 0:
+                counters["queued"] += 1
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def record(self, provider: str, status: int, headers: Mapping[str, str]) -> None:
+        """
+        Update the quota gauge from a response
+
+        Args:
+            provider: Provider key
+            status: HTTP status code
+            headers: Response headers (case-insensitive mapping)
+        """
+        if provider not in self._buckets:
+            return
+
+        remaining = limit = None
+        for remaining_header, limit_header in QUOTA_HEADERS:
+            if headers.get(remaining_header) is not None:
+                remaining = _number(headers.get(remaining_header))
+                limit = _number(headers.get(limit_header)) if limit_header else None
+                break
+
+        now = time.monotonic()
+        with self._lock:
+            if status == 402:
+                remaining = 0
+            if remaining is not None:
+                self._quota[provider] = {"remaining": remaining, "limit": limit, "checked": now}
+
+            if status == 429:
+                retry_after = _number(headers.get("Retry-After")) or 1.0
+                self._blocked_until[provider] = now + retry_after
+                logger.warning(f"{provider} rate limited, pausing {retry_after:.1f}s")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per provider: quota remaining/limit (if reported), tokens and call counters"""
+        with self._lock:
+            result = {}
+            for provider, bucket in self._buckets.items():
+                quota = self._quota.get(provider, {})
+                result[provider] = {
+                    "quota_left": quota.get("remaining"),
+                    "quota_limit": quota.get("limit"),
+                    "tokens": round(max(bucket.tokens, 0.0), 2),
+                    **self._counters[provider]
+                }
+            return result
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Shared limiter used by the HTTP client"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
@@ -0,0 +1,389 @@
+"""
+Local recipe search engine
+
+An ingredient -> recipes inverted index over an imported recipe corpus,
+answering search_recipes in the same shape as Spoonacular's
+findByIngredients (usedIngredients, missedIngredients, unusedIngredients).
+
+Each ingredient's recipes are a bitset (a Python int, bit i = recipe i).
+How many pantry ingredients each recipe uses is counted for all recipes at
+once with bit-sliced counters, so ranking touches only a handful of big-int
+operations however large the corpus is.
+
+Usage:
+    python -m recipe_index import recipes.json        # or a .csv
+    python -m recipe_index search chicken garlic chili
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from fractions import Fraction
+from typing import Any, Dict, List, Optional
+from cook_tool import normalize_ingredient
+from recipe_nutrition import normalize_unit, MASS_UNITS, VOLUME_UNITS, PIECE_UNITS
+from config import RECIPE_INDEX_FILE
+
+logger = logging.getLogger(__name__)
+
+_QUANTITY = re.compile(r"^\s*(\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?)\s*")
+
+
+def _words(name: str) -> List[str]:
+    return [normalize_ingredient(w) for w in re.findall(r"[^\W\d_]+", name.lower())]
+
+
+class RecipeIndex:
+    """In-memory inverted index of recipes by ingredient"""
+
+    def __init__(self, recipes: List[Dict[str, Any]]):
+        """
+        Build the index
+
+        Args:
+            recipes: Normalized recipes ({"title", "ingredients": [{"name",
+                "amount", "unit"}], optional "sourceUrl", "image"})
+        """
+        self.recipes = recipes
+        self.all_mask = (1 << len(recipes)) - 1
+
+        self._names = []                 # ingredient id -> name
+        self._name_ids = {}              # name -> ingredient id
+        self._word_names = {}            # word -> set of ingredient ids
+        self._name_recipes = []          # ingredient id -> recipe bitset
+        self._recipe_names = []          # recipe -> ingredient ids (parallel to ingredients)
+        self._size_masks = {}            # ingredient count -> recipe bitset
+
+        for i, recipe in enumerate(recipes):
+            ids = []
+            for ingredient in recipe["ingredients"]:
+                name = ingredient["name"].lower().strip()
+                name_id = self._name_ids.get(name)
+                if name_id is None:
+                    name_id = len(self._names)
+                    self._name_ids[name] = name_id
+                    self._names.append(name)
+                    self._name_recipes.append(0)
+                    for word in _words(name):
+                        self._word_names.setdefault(word, set()).add(name_id)
+                self._name_recipes[name_id] |= 1 << i
+                ids.append(name_id)
+
+            self._recipe_names.append(ids)
+            size = len(set(ids))
+            self._size_masks[size] = self._size_masks.get(size, 0) | (1 << i)
+
+    def _matching_names(self, item: str) -> set:
+        """Ingredient ids whose name contains every word of a pantry item"""
+        words = _words(item)
+        if not words:
+            return set()
+        matches = set(self._word_names.get(words[0], ()))
+        for word in words[1:]:
+            matches &= self._word_names.get(word, set())
+        return matches
+
+    def search(self, pantry: List[str], number: int = 5, ranking: int = 2) -> List[Dict[str, Any]]:
+        """
+        Find recipes using the pantry's ingredients
+
+        Args:
+            pantry: English ingredient names
+            number: Maximum recipes returned
+            ranking: 1 = maximize used ingredients first,
+                2 = minimize missing ingredients first (Spoonacular semantics)
+
+        Returns:
+            Recipes in the findByIngredients result shape
+        """
+        pantry = [p for p in pantry if p.strip()]
+        item_matches = [self._matching_names(p) for p in pantry]
+        matched = set().union(*item_matches) if item_matches else set()
+        if not matched:
+            return []
+
+        # Bit-sliced counter: planes[k] holds bit k of every recipe's used count
+        planes = []
+        candidates = 0
+        for name_id in matched:
+            carry = self._name_recipes[name_id]
+            candidates |= carry
+            for k in range(len(planes)):
+                planes[k], carry = planes[k] ^ carry, planes[k] & carry
+                if not carry:
+                    break
+            if carry:
+                planes.append(carry)
+
+        def used_equals(count: int) -> int:
+            if count < 0 or count >= 1 << len(planes):
+                return 0
+            mask = candidates
+            for k, plane in enumerate(planes):
+                mask &= plane if count >> k & 1 else ~plane & self.all_mask
+            return mask
+
+        max_used = (1 << len(planes)) - 1
+        sizes = sorted(self._size_masks)
+        chosen = []
+
+        if ranking == 1:
+            # Most used first, then fewest missing
+            tiers = (
+                [self._size_masks[s] & used_equals(u) for s in sizes]
+                for u in range(max_used, 0, -1)
+            )
+        else:
+            # Fewest missing first, then most used
+            tiers = (
+                [self._size_masks[s] & used_equals(s - m) for s in reversed(sizes)]
+                for m in range(0, max(sizes) + 1)
+            )
+
+        for tier in tiers:
+            for mask in tier:
+                while mask and len(chosen) < number:
+                    low = mask & -mask
+                    chosen.append(low.bit_length() - 1)
+                    mask ^= low
+            if len(chosen) >= number:
+                break
+
+        return [self._result(r, pantry, item_matches, matched) for r in chosen]
+
+    def _result(
+        self,
+        index: int,
+        pantry: List[str],
+        item_matches: List[set],
+        matched: set
+    ) -> Dict[str, Any]:
+        """One recipe in the findByIngredients shape"""
+        recipe = self.recipes[index]
+        used, missed, seen = [], [], set()
+
+        for ingredient, name_id in zip(recipe["ingredients"], self._recipe_names[index]):
+            if name_id in seen:
+                continue
+            seen.add(name_id)
+            entry = {
+                "name": ingredient["name"],
+                "amount": ingredient.get("amount", 0),
+                "unit": ingredient.get("unit", ""),
+                "original": ingredient.get("original", ingredient["name"]),
+                "aisle": ingredient.get("aisle", "")
+            }
+            (used if name_id in matched else missed).append(entry)
+
+        recipe_names = set(self._recipe_names[index])
+        unused = [
+            {"name": item}
+            for item, names in zip(pantry, item_matches)
+            if not names & recipe_names
+        ]
+
+        result = {
+            "title": recipe["title"],
+            "usedIngredientCount": len(used),
+            "missedIngredientCount": len(missed),
+            "usedIngredients": used,
+            "missedIngredients": missed,
+            "unusedIngredients": unused,
+            "likes": recipe.get("likes", 0)
+        }
+        # Corpus ids are not Spoonacular ids, so links come from sourceUrl only
+        for key in ("sourceUrl", "image"):
+            if recipe.get(key):
+                result[key] = recipe[key]
+        return result
+
+
+# ---------------------------------------------------------------------------
+# Corpus import
+# ---------------------------------------------------------------------------
+
+def parse_ingredient_line(text: str) -> Dict[str, Any]:
+    """
+    Split "2 1/2 cups flour" into amount, unit and name
+
+    Returns:
+        {"name", "amount", "unit", "original"}
+    """
+    original = text.strip()
+    amount = 0.0
+    match = _QUANTITY.match(original)
+    rest = original
+
+    if match:
+        amount = float(sum(Fraction(part) for part in match.group(1).split()))
+        rest = original[match.end():]
+
+    unit = ""
+    parts = rest.split(None, 1)
+    if match and len(parts) == 2:
+        candidate = normalize_unit(parts[0])
+        if candidate in MASS_UNITS or candidate in VOLUME_UNITS or (candidate and candidate in PIECE_UNITS):
+            unit, rest = parts[0], parts[1]
+
+    name = re.sub(r"\s*[,(].*$", "", rest).strip() or rest.strip()
+    return {"name": name, "amount": amount, "unit": unit, "original": original}
+
+
+def _normalize_recipe(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Normalize a corpus recipe (plain, Spoonacular or ingredient-line style)"""
+    title = raw.get("title") or raw.get("name")
+    items = raw.get("ingredients") or raw.get("extendedIngredients") or []
+    if not title or not items:
+        return None
+
+    ingredients = []
+    for item in items:
+        if isinstance(item, str):
+            ingredient = parse_ingredient_line(item)
+        elif isinstance(item, dict) and item.get("name"):
+            ingredient = {
+                "name": item["name"],
+                "amount": item.get("amount") or 0,
+                "unit": item.get("unit", ""),
+                "original": item.get("original", item["name"]),
+                "aisle": item.get("aisle", "")
+            }
+        else:
+            continue
+        if ingredient["name"]:
+            ingredients.append(ingredient)
+
+    if not ingredients:
+        return None
+
+    recipe = {"title": title, "ingredients": ingredients}
+    source_url = raw.get("sourceUrl") or raw.get("spoonacularSourceUrl") or raw.get("url")
+    if source_url:
+        recipe["sourceUrl"] = source_url
+    for key in ("image", "likes"):
+        if raw.get(key):
+            recipe[key] = raw[key]
+    return recipe
+
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    """
+    Read recipes from a JSON or CSV corpus
+
+    JSON: a list of recipes (or {"recipes": [...]}) with "title" and
+    "ingredients" as strings ("2 cups flour") or {"name", "amount", "unit"},
+    and optionally "sourceUrl" (or "url") linking to the full recipe.
+    CSV: one row per ingredient with recipe,ingredient,amount,unit and
+    optional url,image columns.
+    """
+    if path.lower().endswith(".csv"):
+        grouped = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                title = row["recipe"].strip()
+                recipe = grouped.setdefault(title, {
+                    "title": title,
+                    "url": row.get("url") or None,
+                    "image": row.get("image") or None,
+                    "ingredients": []
+                })
+                try:
+                    amount = float(row.get("amount") or 0)
+                except ValueError:
+                    amount = 0.0
+                recipe["ingredients"].append(
+                    {"name": row["ingredient"].strip(), "amount": amount, "unit": row.get("unit", "")}
+                )
+        raw_recipes = list(grouped.values())
+    else:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        raw_recipes = data.get("recipes", []) if isinstance(data, dict) else data
+
+    recipes = [_normalize_recipe(r) for r in raw_recipes if isinstance(r, dict)]
+    return [r for r in recipes if r]
+
+
+def import_corpus(sources: List[str], out_path: str = RECIPE_INDEX_FILE) -> int:
+    """
+    Normalize corpora into the index file (replacing it)
+
+    Returns:
+        Number of recipes stored
+    """
+    recipes = [recipe for source in sources for recipe in load_corpus(source)]
+
+    directory = os.path.dirname(out_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(recipes, f, ensure_ascii=False)
+    os.replace(tmp_path, out_path)
+
+    return len(recipes)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_recipe_index() -> Optional[RecipeIndex]:
+    """Shared index, or None if no corpus has been imported"""
+    global _index
+    with _index_lock:
+        if _index is None and RECIPE_INDEX_FILE and os.path.exists(RECIPE_INDEX_FILE):
+            start = time.time()
+            with open(RECIPE_INDEX_FILE, encoding="utf-8") as f:
+                _index = RecipeIndex(json.load(f))
+            logger.info(
+                f"Recipe index loaded: {len(_index.recipes)} recipes in {time.time() - start:.2f}s"
+            )
+        return _index
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Local recipe index")
+    parser.add_argument("--index", default=RECIPE_INDEX_FILE, help="Index file path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="Import JSON/CSV recipe corpora")
+    importer.add_argument("sources", nargs="+")
+
+    search = commands.add_parser("search", help="Search by ingredients")
+    search.add_argument("ingredients", nargs="+")
+    search.add_argument("--number", type=int, default=5)
+    search.add_argument("--ranking", type=int, choices=[1, 2], default=2)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        count = import_corpus(args.sources, args.index)
+        print(f"Imported {count} recipes into {args.index}")
+        return 0
+
+    if not os.path.exists(args.index):
+        print(f"No recipe index at {args.index}; run the import command first")
+        return 1
+
+    with open(args.index, encoding="utf-8") as f:
+        index = RecipeIndex(json.load(f))
+
+    start = time.perf_counter()
+    results = index.search(args.ingredients, args.number, args.ranking)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    for r in results:
+        print(f"{r['title']}: used {r['usedIngredientCount']}, missed {r['missedIngredientCount']}")
+    print(f"({len(results)} recipes in {elapsed_ms:.2f} ms over {len(index.recipes)})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
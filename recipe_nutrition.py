@@ -0,0 +1,299 @@
+"""
+Whole-recipe nutrition computed locally
+
+Converts recipe ingredient amounts (cups, tbsp, g, oz, pieces...) to grams
+using volume, density and piece-weight tables, then totals nutrients for
+every recipe with one matrix product: (recipes x ingredients grams / 100)
+@ (ingredients x nutrients per 100g).
+
+Usage (bulk labelling; one row per ingredient, columns
+recipe,servings,ingredient,amount,unit):
+    python -m recipe_nutrition label recipes.csv -o labelled.csv
+    python -m recipe_nutrition label recipes.csv --servings 2
+"""
+import argparse
+import csv
+import re
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+# Grams per mass unit
+MASS_UNITS = {
+    "mg": 0.001, "g": 1.0, "kg": 1000.0,
+    "oz": 28.3495, "lb": 453.592,
+}
+
+# Millilitres per volume unit
+VOLUME_UNITS = {
+    "ml": 1.0, "cl": 10.0, "dl": 100.0, "l": 1000.0,
+    "tsp": 4.92892, "tbsp": 14.7868, "cup": 236.588, "fl oz": 29.5735,
+    "pint": 473.176, "quart": 946.353, "gallon": 3785.41,
+    "pinch": 0.31, "dash": 0.62, "drop": 0.05,
+}
+
+UNIT_ALIASES = {
+    "gram": "g", "gr": "g", "grams": "g", "kilogram": "kg", "kilo": "kg",
+    "milligram": "mg", "ounce": "oz", "pound": "lb", "lbs": "lb",
+    "milliliter": "ml", "millilitre": "ml", "liter": "l", "litre": "l",
+    "teaspoon": "tsp", "tsps": "tsp", "tablespoon": "tbsp", "tbs": "tbsp", "tbl": "tbsp",
+    "c": "cup", "fluid ounce": "fl oz", "fl. oz": "fl oz", "pt": "pint", "qt": "quart",
+    "pinches": "pinch", "dashes": "dash", "leaves": "leaf", "bunches": "bunch",
+}
+
+# Grams per millilitre, matched by ingredient keyword (default: water)
+DENSITIES = {
+    "water": 1.0, "broth": 1.0, "stock": 1.0, "milk": 1.03, "coconut milk": 0.97,
+    "cream": 1.0, "yogurt": 1.03, "oil": 0.92, "butter": 0.911, "honey": 1.42,
+    "syrup": 1.33, "soy sauce": 1.17, "fish sauce": 1.2, "oyster sauce": 1.2,
+    "vinegar": 1.01, "wine": 0.99, "juice": 1.04, "ketchup": 1.15, "mayonnaise": 0.91,
+    "flour": 0.53, "cornstarch": 0.54, "starch": 0.54, "sugar": 0.85, "brown sugar": 0.93,
+    "powdered sugar": 0.56, "salt": 1.2, "baking powder": 0.9, "baking soda": 0.9,
+    "rice": 0.85, "oats": 0.41, "breadcrumbs": 0.45, "cheese": 0.45, "parmesan": 0.42,
+    "peanut butter": 1.09, "cocoa": 0.42, "spinach": 0.13, "basil": 0.09, "cilantro": 0.07,
+    "parsley": 0.06, "mint": 0.06, "peas": 0.6, "corn": 0.6, "beans": 0.75,
+    "nuts": 0.55, "chocolate chips": 0.72, "curry paste": 1.1, "chili": 0.5, "pepper": 0.5,
+    "garlic": 0.6, "ginger": 0.6, "onion": 0.6, "shallot": 0.6, "tomato": 0.75,
+}
+
+# Grams per piece, matched by ingredient keyword
+PIECE_WEIGHTS = {
+    "egg": 44, "garlic": 3, "clove": 3, "onion": 110, "red onion": 110, "shallot": 30,
+    "green onion": 15, "scallion": 15, "spring onion": 15, "tomato": 120, "cherry tomato": 17,
+    "potato": 170, "sweet potato": 130, "carrot": 60, "celery": 40, "cucumber": 300,
+    "bell pepper": 120, "chili": 5, "jalapeno": 14, "lime": 67, "lemon": 84, "orange": 130,
+    "apple": 180, "banana": 118, "avocado": 150, "zucchini": 200, "eggplant": 450,
+    "mushroom": 18, "chicken breast": 170, "chicken thigh": 110, "chicken drumstick": 75,
+    "chicken wing": 35, "sausage": 75, "bacon": 12, "shrimp": 12, "prawn": 20,
+    "tortilla": 45, "bread": 30, "bun": 60, "lemongrass": 20, "kaffir lime leaf": 0.3,
+    "bay leaf": 0.2, "ginger": 15, "galangal": 15, "tofu": 350, "fillet": 150,
+}
+
+# Count-like units converted through PIECE_WEIGHTS
+PIECE_UNITS = {
+    "", "piece", "pc", "whole", "clove", "slice", "stalk", "sprig", "leaf", "head",
+    "bunch", "fillet", "breast", "thigh", "serving", "small", "medium", "large", "handful",
+}
+
+# Weight multipliers for size words in the unit or name
+SIZE_FACTORS = {"small": 0.75, "medium": 1.0, "large": 1.25, "extra large": 1.5, "jumbo": 1.6}
+
+# Multiples of one piece for grouping units
+GROUP_FACTORS = {"head": 12.0, "bunch": 8.0, "handful": 4.0}
+
+
+def normalize_unit(unit: str) -> str:
+    """
+    Canonical unit name
+
+    Spoonacular uses "T" for tablespoon and "t" for teaspoon, so those are
+    resolved before lowercasing.
+    """
+    unit = (unit or "").strip()
+    if unit == "T":
+        return "tbsp"
+    if unit == "t":
+        return "tsp"
+
+    unit = unit.lower().rstrip(".")
+    unit = UNIT_ALIASES.get(unit, unit)
+    if unit not in MASS_UNITS and unit not in VOLUME_UNITS and unit.endswith("s"):
+        unit = UNIT_ALIASES.get(unit[:-1], unit[:-1])
+    return unit
+
+
+def _keyword_value(name: str, table: Dict[str, float]) -> Optional[float]:
+    """Value of the longest table keyword contained in name"""
+    name = name.lower()
+    matches = [k for k in table if re.search(rf"\b{re.escape(k)}(e?s)?\b", name)]
+    return table[max(matches, key=len)] if matches else None
+
+
+def to_grams(amount: float, unit: str, name: str) -> Optional[float]:
+    """
+    Convert an ingredient amount to grams
+
+    Args:
+        amount: Quantity in unit
+        unit: Unit as written ("cups", "Tbsp", "g", "large", "")
+        name: Ingredient name, used for density and piece weight
+
+    Returns:
+        Grams, or None if the unit cannot be converted
+    """
+    if not amount or amount < 0:
+        return None
+
+    unit = normalize_unit(unit)
+
+    if unit in MASS_UNITS:
+        return amount * MASS_UNITS[unit]
+
+    if unit in VOLUME_UNITS:
+        density = _keyword_value(name, DENSITIES) or 1.0
+        return amount * VOLUME_UNITS[unit] * density
+
+    if unit in PIECE_UNITS or unit in SIZE_FACTORS:
+        # The unit can name the piece ("2 cloves garlic", "1 breast chicken")
+        piece = _keyword_value(f"{name} {unit}", PIECE_WEIGHTS)
+        if piece is None:
+            return None
+        size = SIZE_FACTORS.get(unit) or _keyword_value(name, SIZE_FACTORS) or 1.0
+        return amount * piece * size * GROUP_FACTORS.get(unit, 1.0)
+
+    return None
+
+
+def recipe_ingredients(recipe: Dict[str, Any]) -> List[Tuple[str, float, str]]:
+    """(name, amount, unit) for every ingredient a Spoonacular recipe uses"""
+    return [
+        (ing.get("name", ""), ing.get("amount") or 0, ing.get("unit", ""))
+        for ing in recipe.get("usedIngredients", []) + recipe.get("missedIngredients", [])
+    ]
+
+
+def compute_totals(
+    recipes: List[List[Tuple[str, float, str]]],
+    profiles: Dict[str, Optional[Dict[str, float]]],
+    nutrients: List[str]
+) -> Tuple[np.ndarray, List[List[str]]]:
+    """
+    Total nutrients for many recipes with one matrix product
+
+    Args:
+        recipes: Ingredients (name, amount, unit) of each recipe
+        profiles: Ingredient name -> nutrients per 100g (None if unknown)
+        nutrients: Nutrient names to total
+
+    Returns:
+        (recipes x nutrients totals, skipped ingredient names per recipe)
+    """
+    names = sorted({name for recipe in recipes for name, _, _ in recipe})
+    column = {name: j for j, name in enumerate(names)}
+
+    per_100g = np.zeros((len(names), len(nutrients)))
+    for name, j in column.items():
+        profile = profiles.get(name) or {}
+        per_100g[j] = [profile.get(n) or 0.0 for n in nutrients]
+
+    hundreds = np.zeros((len(recipes), len(names)))
+    skipped = []
+
+    for i, recipe in enumerate(recipes):
+        missing = []
+        for name, amount, unit in recipe:
+            grams = to_grams(amount, unit, name)
+            if grams is None or not profiles.get(name):
+                missing.append(name)
+                continue
+            hundreds[i, column[name]] += grams / 100
+        skipped.append(missing)
+
+    return hundreds @ per_100g, skipped
+
+
+def per_serving(totals: np.ndarray, servings: np.ndarray, target: float = 1.0) -> np.ndarray:
+    """
+    Scale recipe totals to a number of servings
+
+    Args:
+        totals: recipes x nutrients totals
+        servings: Servings each recipe makes
+        target: Servings wanted (e.g. 2 for two portions)
+
+    Returns:
+        recipes x nutrients for target servings
+    """
+    servings = np.where(np.asarray(servings, dtype=float) > 0, servings, 1.0)
+    return totals / servings[:, None] * target
+
+
+def _read_recipes_csv(path: str) -> Tuple[List[str], List[float], List[List[Tuple[str, float, str]]]]:
+    """Group a long-format CSV (one ingredient per row) into recipes"""
+    order, servings, recipes = [], {}, {}
+
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            title = row["recipe"].strip()
+            if title not in recipes:
+                order.append(title)
+                recipes[title] = []
+                servings[title] = float(row.get("servings") or 1)
+            try:
+                amount = float(row.get("amount") or 0)
+            except ValueError:
+                amount = 0.0
+            recipes[title].append((row["ingredient"].strip(), amount, row.get("unit", "")))
+
+    return order, [servings[t] for t in order], [recipes[t] for t in order]
+
+
+def label_csv(
+    in_path: str,
+    out_path: str,
+    lookup: Callable[[List[str]], Dict[str, Optional[Dict[str, float]]]],
+    nutrients: Dict[str, str],
+    target_servings: float = 1.0
+) -> int:
+    """
+    Write a nutrition label row per recipe
+
+    Args:
+        in_path: Long-format recipe CSV
+        out_path: Output CSV
+        lookup: Ingredient names -> nutrient profiles per 100g
+        nutrients: USDA nutrient name -> output column label
+        target_servings: Servings the per-serving columns describe
+
+    Returns:
+        Number of recipes labelled
+    """
+    titles, servings, recipes = _read_recipes_csv(in_path)
+    names = sorted({name for recipe in recipes for name, _, _ in recipe})
+    profiles = lookup(names)
+
+    totals, skipped = compute_totals(recipes, profiles, list(nutrients))
+    scaled = per_serving(totals, np.array(servings), target_servings)
+
+    labels = list(nutrients.values())
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ["recipe", "servings"]
+            + [f"total_{label}" for label in labels]
+            + [f"per_{target_servings:g}_serving_{label}" for label in labels]
+            + ["skipped_ingredients"]
+        )
+        for i, title in enumerate(titles):
+            writer.writerow(
+                [title, f"{servings[i]:g}"]
+                + [f"{v:.1f}" for v in totals[i]]
+                + [f"{v:.1f}" for v in scaled[i]]
+                + [";".join(skipped[i])]
+            )
+
+    return len(titles)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Local recipe nutrition")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    label = commands.add_parser("label", help="Label a CSV of recipes")
+    label.add_argument("csv", help="CSV with recipe,servings,ingredient,amount,unit columns")
+    label.add_argument("-o", "--output", help="Output CSV (default: <input>_labelled.csv)")
+    label.add_argument("--servings", type=float, default=1.0, help="Servings for per-serving columns")
+
+    args = parser.parse_args(argv)
+
+    from cook_tool import CookTool, KEY_NUTRIENTS
+
+    cook_tool = CookTool()
+    output = args.output or re.sub(r"\.csv$", "", args.csv) + "_labelled.csv"
+    count = label_csv(args.csv, output, cook_tool.lookup_nutrition_profiles, KEY_NUTRIENTS, args.servings)
+    print(f"Labelled {count} recipes → {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
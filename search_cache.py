@@ -0,0 +1,197 @@
+"""
+Shared web search result cache keyed on normalized queries
+
+Near-identical queries ("วิธีทำต้มยำกุ้ง", "ต้มยำกุ้ง วิธีทำ") share one entry:
+queries are normalized for case, whitespace and Unicode, Thai runs are
+segmented into words by longest dictionary match, and the words are
+compared as a sorted set. num_results is rounded up to a bucket so a request
+for 3 results can be served from one for 5.
+
+Entries are fresh for SEARCH_CACHE_TTL. After that they are still served
+for SEARCH_CACHE_STALE seconds while a background refresh replaces them, so
+hot queries never wait on the network.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from disk_cache import DiskCache
+from ingredient_translator import normalize_thai
+from config import (
+    TRANSLATION_DICTIONARY_FILE,
+    SEARCH_CACHE_TTL,
+    SEARCH_CACHE_STALE,
+    SEARCH_CACHE_MAX_ENTRIES,
+    SEARCH_RESULT_BUCKETS
+)
+
+logger = logging.getLogger(__name__)
+
+# Common words in cooking queries, added to the ingredient names for segmentation
+QUERY_WORDS = [
+    "วิธีทำ", "วิธี", "ทำ", "สูตร", "เมนู", "อาหาร", "ไทย", "ง่ายๆ", "อร่อย", "ที่บ้าน",
+    "ต้มยำ", "ต้มข่า", "ต้มจืด", "แกง", "แกงเขียวหวาน", "แกงเผ็ด", "แกงส้ม", "พะแนง",
+    "มัสมั่น", "ผัด", "ผัดไทย", "ผัดกะเพรา", "ข้าวผัด", "ทอด", "ต้ม", "นึ่ง", "ย่าง", "อบ",
+    "ยำ", "ส้มตำ", "ลาบ", "น้ำพริก", "น้ำจิ้ม", "ซอส", "หมัก", "ซุป", "สลัด", "ขนม",
+    "ของหวาน", "คลีน", "เจ", "มังสวิรัติ", "แคลอรี่", "โภชนาการ", "ประโยชน์", "เก็บ",
+    "รักษา", "แทน", "ใช้", "อะไร", "ได้", "ไหม", "กับ", "และ",
+]
+
+_THAI_RUN = re.compile(r"[\u0e00-\u0e7f]+")
+_TOKEN = re.compile(r"[\u0e00-\u0e7f]+|[^\W_]+")
+
+
+def _load_lexicon() -> set:
+    try:
+        with open(TRANSLATION_DICTIONARY_FILE, encoding="utf-8") as f:
+            words = set(json.load(f))
+    except (OSError, ValueError):
+        words = set()
+    return {normalize_thai(w) for w in words | set(QUERY_WORDS)}
+
+
+_lexicon = None
+_longest_word = 0
+
+
+def segment_thai(text: str) -> List[str]:
+    """
+    Split a run of Thai text into words by greedy longest dictionary match
+
+    Characters that start no known word are grouped into one token, so
+    segmentation is deterministic for any input.
+    """
+    global _lexicon, _longest_word
+    if _lexicon is None:
+        _lexicon = _load_lexicon()
+        _longest_word = max((len(w) for w in _lexicon), default=1)
+
+    words, unknown, i = [], "", 0
+    while i < len(text):
+        for length in range(min(_longest_word, len(text) - i), 0, -1):
+            if text[i:i + length] in _lexicon:
+                if unknown:
+                    words.append(unknown)
+                    unknown = ""
+                words.append(text[i:i + length])
+                i += length
+                break
+        else:
+            unknown += text[i]
+            i += 1
+
+    if unknown:
+        words.append(unknown)
+    return words
+
+
+def normalize_query(query: str) -> str:
+    """
+    Order-insensitive normal form of a search query
+
+    Examples:
+        "วิธีทำต้มยำกุ้ง" and "ต้มยำกุ้ง  วิธีทำ" -> "กุ้ง ต้มยำ วิธีทำ"
+        "Tom Yum  recipe" and "recipe tom yum" -> "recipe tom yum"
+    """
+    text = normalize_thai(query.lower())
+    tokens = set()
+    for token in _TOKEN.findall(text):
+        if _THAI_RUN.fullmatch(token):
+            tokens.update(segment_thai(token))
+        else:
+            tokens.add(token)
+    return " ".join(sorted(tokens))
+
+
+def result_bucket(num_results: int) -> int:
+    """Smallest bucket holding num_results (requests above the largest are not bucketed)"""
+    for bucket in SEARCH_RESULT_BUCKETS:
+        if num_results <= bucket:
+            return bucket
+    return num_results
+
+
+class SearchCache:
+    """Search results cache with stale-while-revalidate refresh"""
+
+    def __init__(self, cache: Optional[DiskCache] = None):
+        """
+        Initialize search cache
+
+        Args:
+            cache: Backing store (defaults to the shared disk cache); entries
+                live for the fresh TTL plus the stale window
+        """
+        self.cache = cache or DiskCache(
+            "search_web", SEARCH_CACHE_TTL + SEARCH_CACHE_STALE, SEARCH_CACHE_MAX_ENTRIES
+        )
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="search-refresh")
+        self.stale_hits = 0
+
+    def get_or_fetch(
+        self,
+        query: str,
+        num_results: int,
+        fetch: Callable[[str, int], List[Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Cached results for a query, fetching or refreshing as needed
+
+        Args:
+            query: Search query as given
+            num_results: Results wanted
+            fetch: fetch(query, num_results) -> results; error results
+                ([{"error": ...}]) and empty results are not cached
+
+        Returns:
+            Up to num_results results
+        """
+        bucket = result_bucket(num_results)
+        key = f"{bucket}:{normalize_query(query)}"
+        entry = self.cache.get(key)
+
+        if entry is None:
+            return self._fetch(key, query, bucket, fetch)[:num_results]
+
+        if time.time() - entry["fetched"] > SEARCH_CACHE_TTL:
+            with self._lock:
+                self.stale_hits += 1
+                start = key not in self._refreshing
+                self._refreshing.add(key)
+            if start:
+                # Runs outside this turn's trace: the turn does not wait for it
+                self._pool.submit(self._refresh, key, query, bucket, fetch)
+
+        return entry["results"][:num_results]
+
+    def _fetch(
+        self,
+        key: str,
+        query: str,
+        bucket: int,
+        fetch: Callable[[str, int], List[Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        results = fetch(query, bucket)
+        if results and "error" not in results[0]:
+            self.cache.set(key, {"results": results, "fetched": time.time()})
+        return results
+
+    def _refresh(self, key: str, query: str, bucket: int, fetch) -> None:
+        """Replace a stale entry in the background"""
+        try:
+            self._fetch(key, query, bucket, fetch)
+        except Exception as e:
+            logger.warning(f"Search refresh failed for '{query}': {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Disk cache counters plus stale hits served while refreshing"""
+        with self._lock:
+            return {**self.cache.stats(), "stale_hits": self.stale_hits}
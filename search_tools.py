@@ -1,27 +1,107 @@
+import contextvars
+import logging
 import os
-import requests
-from typing import List, Dict, Any
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 from dotenv import load_dotenv
+import tracing
+from http_client import get_http_client
+from rate_limiter import RateLimited
+from circuit_breaker import CircuitOpen
+from search_cache import SearchCache
+from config import SERPER_API_URL, TAVILY_API_URL, SEARCH_POLICY, SEARCH_DEADLINE, DISK_CACHE_FILE
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Fan-out provider calls run on this pool (a call the fan-out stopped waiting
+# for still holds its worker until its timeout)
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="search")
+
+# Query parameters that only track the click, not the page
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "ref", "ref_src"}
+
+
+def canonical_url(url: str) -> str:
+    """
+    Canonical form of a URL for duplicate detection
+    
+    Ignores scheme, "www.", case of the host, fragments, trailing slashes,
+    tracking parameters and query parameter order.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit(("", host, parts.path.rstrip("/"), urlencode(query), ""))
+
+
+def merge_results(rankings: List[List[Dict[str, Any]]], limit: int) -> List[Dict[str, Any]]:
+    """
+    Interleave ranked result lists, dropping duplicate URLs
+    
+    Takes the first result of each list, then the second of each, and so on;
+    a URL already taken from a higher rank is skipped.
+    
+    Args:
+        rankings: Result lists, best first, in provider priority order
+        limit: Maximum results returned
+    
+    Returns:
+        Merged results
+    """
+    merged, seen = [], set()
+    for rank in range(max((len(r) for r in rankings), default=0)):
+        for ranking in rankings:
+            if rank >= len(ranking):
+                continue
+            result = ranking[rank]
+            key = canonical_url(result.get("link", "")) or result.get("title", "")
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(result)
+            if len(merged) >= limit:
+                return merged
+    return merged
+
+
 class WebSearchTool:
     """Web search tool using Serper API or Tavily API"""
 
-    def __init__(self):
+    def __init__(self, http=None, cache=None):
+        self.http = http or get_http_client()
+        self.cache = cache or _open_search_cache()
         self.serper_api_key = os.getenv("SERPER_API_KEY")
         self.tavily_api_key = os.getenv("TAVILY_API_KEY")
+        self.serper_url = SERPER_API_URL
+        self.tavily_url = TAVILY_API_URL
 
-    def search_serper(self, query: str, num_results: int = 5) -> List[Dict[str, Any]]:
+    def search_serper(
+        self,
+        query: str,
+        num_results: int = 5,
+        timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
         if not self.serper_api_key:
             return [{"error": "Serper API key not configured"}]
 
-        url = "https://google.serper.dev/search"
+        url = self.serper_url
         headers = {"X-API-KEY": self.serper_api_key, "Content-Type": "application/json"}
         payload = {"q": query, "num": num_results}
 
         try:
-            resp = requests.post(url, json=payload, headers=headers)
+            # Search POSTs are read-only, so they may be retried (unless bounded by a deadline)
+            resp = self.http.post(url, json=payload, headers=headers, span="http.serper", provider="serper",
+                                  **_deadline_options(timeout))
             resp.raise_for_status()
             data = resp.json()
             results = []
@@ -34,19 +114,27 @@ class WebSearchTool:
                         "source": "serper"
                     })
             return results
+        except (RateLimited, CircuitOpen) as e:
+            return [{"error": f"Search failed: {str(e)}", "user_message": e.user_message}]
         except Exception as e:
             return [{"error": f"Search failed: {str(e)}"}]
 
-    def search_tavily(self, query: str, num_results: int = 5) -> List[Dict[str, Any]]:
+    def search_tavily(
+        self,
+        query: str,
+        num_results: int = 5,
+        timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
         if not self.tavily_api_key:
             return [{"error": "Tavily API key not configured"}]
 
-        url = "https://api.tavily.com/search"
+        url = self.tavily_url
         headers = {"Content-Type": "application/json"}
         payload = {"api_key": self.tavily_api_key, "query": query, "max_results": num_results, "search_depth": "basic"}
 
         try:
-            resp = requests.post(url, json=payload, headers=headers, timeout=10)
+            resp = self.http.post(url, json=payload, headers=headers, span="http.tavily", provider="tavily",
+                                  **_deadline_options(timeout))
             resp.raise_for_status()
             data = resp.json()
             results = []
@@ -59,10 +147,84 @@ class WebSearchTool:
                         "source": "tavily"
                     })
             return results
+        except (RateLimited, CircuitOpen) as e:
+            return [{"error": f"Search failed: {str(e)}", "user_message": e.user_message}]
         except Exception as e:
             return [{"error": f"Search failed: {str(e)}"}]
 
-    def search(self, query: str, num_results: int = 5, preferred_api: str = "serper"):
+    def search(self, query: str, num_results: int = 5, preferred_api: Optional[str] = None):
+        """
+        Search the web
+        
+        Args:
+            query: Search query
+            num_results: Maximum results
+            preferred_api: "serper" or "tavily" to try that provider first
+                and fall back to the other; defaults to SEARCH_POLICY
+        """
+        policy = preferred_api or SEARCH_POLICY
+        
+        with tracing.span("search_web", policy=policy):
+            if self.cache is None:
+                return self._search_with_policy(query, num_results, policy)
+            return self.cache.get_or_fetch(
+                query,
+                num_results,
+                lambda q, n: self._search_with_policy(q, n, policy)
+            )
+
+    def _search_with_policy(self, query: str, num_results: int, policy: str):
+        if policy == "fanout":
+            if self.serper_api_key and self.tavily_api_key:
+                return self._fan_out(query, num_results)
+            policy = "serper"
+        return self._search(query, num_results, policy)
+
+    def _fan_out(self, query: str, num_results: int) -> List[Dict[str, Any]]:
+        """
+        Query every provider concurrently and merge their results
+        
+        Returns once the merged results fill num_results, every provider
+        has answered, or SEARCH_DEADLINE passes, whichever comes first.
+        Provider calls run on a shared pool with the deadline as their
+        timeout and no retries, so an abandoned call frees its worker
+        within SEARCH_DEADLINE.
+        """
+        providers = [("serper", self.search_serper), ("tavily", self.search_tavily)]
+        futures = {
+            _submit(search, query, num_results, SEARCH_DEADLINE): name
+            for name, search in providers
+        }
+        rankings = {}
+        pending = set(futures)
+        
+        with tracing.span("search.fanout", providers=len(providers)) as fanout_span:
+            deadline = time.monotonic() + SEARCH_DEADLINE
+            while pending:
+                remaining = max(0.0, deadline - time.monotonic())
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    rankings[futures[future]] = future.result()
+                
+                ok = [r for r in rankings.values() if r and "error" not in r[0]]
+                if len(merge_results(ok, num_results)) >= num_results:
+                    break
+            
+            fanout_span.set("answered", len(rankings))
+            fanout_span.set("timed_out", len(pending))
+        
+        # Provider priority order, not arrival order, decides the interleaving
+        ordered = [rankings[name] for name, _ in providers if name in rankings]
+        ok = [r for r in ordered if r and "error" not in r[0]]
+        if ok:
+            return merge_results(ok, num_results)
+        
+        errors = [r[0] for r in ordered if r]
+        return errors or [{"error": "Search timed out"}]
+
+    def _search(self, query: str, num_results: int, preferred_api: str):
         # Try preferred first
         if preferred_api == "serper" and self.serper_api_key:
             results = self.search_serper(query, num_results)
@@ -88,9 +250,45 @@ class WebSearchTool:
         formatted = "Search Results:\n\n"
         for i, result in enumerate(results, 1):
             if "error" in result:
-                formatted += f"Error: {result['error']}\n"
+                formatted += f"{result.get('user_message') or 'Error: ' + result['error']}\n"
             else:
                 formatted += f"{i}. **{result['title']}**\n"
                 formatted += f"   {result['snippet']}\n"
                 formatted += f"   Source: {result['link']}\n\n"
         return formatted
+
+    def format_results_compact(self, results: List[Dict[str, Any]], snippet_chars: int = 200) -> str:
+        """Format search results as dense text for the LLM"""
+        if not results:
+            return "no results"
+        lines = []
+        for i, result in enumerate(results, 1):
+            if "error" in result:
+                lines.append(f"error: {result['error']}")
+            else:
+                snippet = result.get("snippet", "")[:snippet_chars]
+                lines.append(f"{i}. {result['title']} | {snippet} | {result['link']}")
+        return "\n".join(lines)
+
+
+def _deadline_options(timeout: Optional[float]) -> Dict[str, Any]:
+    """HTTP options for a provider call: retried by default, single attempt within a deadline"""
+    if timeout is None:
+        return {"idempotent": True}
+    return {"idempotent": False, "timeout": timeout}
+
+
+def _submit(fn, *args) -> Future:
+    """Run fn on the fan-out pool, keeping the caller's tracing context"""
+    return _executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _open_search_cache():
+    """Shared search result cache, or None if disabled or unavailable"""
+    if not DISK_CACHE_FILE:
+        return None
+    try:
+        return SearchCache()
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Search cache disabled: {str(e)}")
+        return None
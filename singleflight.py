@@ -0,0 +1,83 @@
+"""
+Single-flight coalescing of identical concurrent calls
+
+When several threads (e.g. Streamlit sessions) ask for the same key at the
+same moment, only the first one runs the call; the others wait for it and
+share its result. Calls are not cached afterwards: the next call for the
+key starts a new flight.
+"""
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+
+class _Flight:
+    """One in-progress call"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread-safe call coalescer with coalesce-rate counters"""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn, or wait for an identical in-flight call and share its result
+
+        Args:
+            key: Identifies calls that return the same result
+            fn: Call to run if no identical call is in flight
+
+        Returns:
+            (result, shared): shared is True if the result came from a call
+            already in flight
+
+        Raises:
+            Exception: Whatever fn raised, in the leader and every waiter
+        """
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = _Flight()
+                self._flights[key] = flight
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+        return flight.result, False
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls, calls that joined an in-flight one, coalesce rate and calls in flight"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "coalesce_rate": self.coalesced / self.calls if self.calls else 0.0,
+                "in_flight": len(self._flights)
+            }
@@ -1,23 +1,44 @@
 """
 Tool execution logic for ChefBot
 """
+import json
 import streamlit as st
 import logging
-from cook_tool import CookTool
+import tracing
+from typing import Dict, List, Tuple
+from cook_tool import CookTool, canonicalize_ingredients, normalize_ingredient
 from search_tools import WebSearchTool
+from http_client import get_http_client
+from singleflight import SingleFlight
+from nutrient_matrix import NutrientMatrix, get_nutrient_matrix
+from conversation_context import count_tokens
+from config import DEFAULT_MODEL, TOOL_DEFINITIONS, FIND_FOODS_BY_NUTRIENTS_TOOL
 
 logger = logging.getLogger(__name__)
 
+# Identical tool calls from concurrent sessions share one execution
+tool_flights = SingleFlight()
+
 
 @st.cache_resource
 def get_tools():
     """Initialize and cache tool instances"""
+    # One keep-alive connection pool shared by every tool
+    http = get_http_client()
     return {
-        "cook": CookTool(),
-        "search": WebSearchTool()
+        "cook": CookTool(http=http),
+        "search": WebSearchTool(http=http),
+        "http": http
     }
 
 
+def available_tools() -> List[dict]:
+    """Tool definitions to offer the model (find_foods_by_nutrients needs a built matrix)"""
+    if get_nutrient_matrix() is None:
+        return TOOL_DEFINITIONS
+    return TOOL_DEFINITIONS + [FIND_FOODS_BY_NUTRIENTS_TOOL]
+
+
 def execute_tool(tool_name: str, arguments: dict) -> str:
     """
     Execute tool and return formatted results
@@ -27,73 +48,273 @@ def execute_tool(tool_name: str, arguments: dict) -> str:
         arguments: Dictionary of arguments for the tool
     
     Returns:
-        Formatted result string
+        Formatted result string (rich markdown for display)
+    """
+    return run_tool(tool_name, arguments)["display"]
+
+
+def run_tool(tool_name: str, arguments: dict) -> Dict[str, str]:
+    """
+    Execute tool and return both renderings of its result
+    
+    Args:
+        tool_name: Name of the tool to execute
+        arguments: Dictionary of arguments for the tool
+    
+    Returns:
+        Dictionary with "content" (compact text sent back to the LLM)
+        and "display" (rich markdown shown in the UI)
     """
+    result, shared = tool_flights.do(
+        tool_call_key(tool_name, arguments),
+        lambda: _run_tool(tool_name, arguments)
+    )
+    
+    if shared:
+        logger.info(f"Joined in-flight {tool_name} call")
+        span = tracing.current_span()
+        if span is not None:
+            span.set("coalesced", True)
+    
+    return dict(result)
+
+
+def _run_tool(tool_name: str, arguments: dict) -> Dict[str, str]:
+    """Execute a tool (see run_tool)"""
     try:
         tools = get_tools()
         cook_tool = tools["cook"]
         search_tool = tools["search"]
         
         if tool_name == "search_web":
-            return _execute_search_web(search_tool, arguments)
+            result = _execute_search_web(search_tool, arguments)
         
         elif tool_name == "search_recipes":
-            return _execute_search_recipes(cook_tool, arguments)
+            result = _execute_search_recipes(cook_tool, arguments)
         
         elif tool_name == "get_nutrition":
-            return _execute_get_nutrition(cook_tool, arguments)
+            result = _execute_get_nutrition(cook_tool, arguments)
+        
+        elif tool_name == "get_nutrition_batch":
+            result = _execute_get_nutrition_batch(cook_tool, arguments)
+        
+        elif tool_name == "find_foods_by_nutrients":
+            # Not cached with the tools: the matrix may be built while running
+            result = _execute_find_foods_by_nutrients(get_nutrient_matrix(), arguments)
         
         else:
-            return f"❌ ไม่รู้จักเครื่องมือ '{tool_name}'"
+            result = _message(f"❌ ไม่รู้จักเครื่องมือ '{tool_name}'")
     
     except Exception as e:
         logger.error(f"Tool execution error: {str(e)}", exc_info=True)
-        return "⚠️ เกิดข้อผิดพลาดในการใช้เครื่องมือ กรุณาลองใหม่"
+        result = _message("⚠️ เกิดข้อผิดพลาดในการใช้เครื่องมือ กรุณาลองใหม่")
+    
+    _log_token_savings(tool_name, result)
+    return result
 
 
-def _execute_search_web(search_tool: WebSearchTool, arguments: dict) -> str:
+def warm_translations(tool_calls: List[Tuple[str, dict]]) -> None:
+    """
+    Translate every Thai ingredient named by a turn's tool calls at once
+    
+    Called before the tools run, so their own translations are cache hits
+    and the turn costs at most one translation round-trip.
+    
+    Args:
+        tool_calls: (tool name, arguments) pairs about to be executed
+    """
+    names = []
+    for _, arguments in tool_calls:
+        arguments = arguments or {}
+        if isinstance(arguments.get("ingredients"), list):
+            names.extend(i for i in arguments["ingredients"] if isinstance(i, str))
+        if isinstance(arguments.get("ingredient"), str):
+            names.append(arguments["ingredient"])
+    
+    if names:
+        get_tools()["cook"].translator.warm(names)
+
+
+def tool_metrics() -> Dict[str, Dict[str, float]]:
+    """
+    Counters of the shared tool layers for the debug panel
+    
+    Returns:
+        Section name -> counters (single-flight, HTTP pool, recipe and
+        search caches, per-provider rate limits, quota and circuit breakers)
+    """
+    tools = get_tools()
+    metrics = {
+        "single-flight": tool_flights.stats(),
+        "http": tools["http"].stats()
+    }
+    if tools["cook"].recipe_cache is not None:
+        metrics["recipe cache"] = tools["cook"].recipe_cache.stats()
+    if tools["search"].cache is not None:
+        metrics["search cache"] = tools["search"].cache.stats()
+    for provider, counters in tools["http"].limiter.stats().items():
+        metrics[f"quota {provider}"] = counters
+    for provider, counters in tools["http"].breakers.stats().items():
+        metrics[f"breaker {provider}"] = counters
+    return metrics
+
+
+def tool_call_key(tool_name: str, arguments: dict) -> str:
+    """
+    Key identifying tool calls that produce the same result
+    
+    Ingredient lists are compared as canonical sets, so order, casing and
+    duplicates do not matter; single ingredients and search queries are
+    compared normalized.
+    
+    Args:
+        tool_name: Name of the tool
+        arguments: Dictionary of arguments for the tool
+    
+    Returns:
+        Stable string key
+    """
+    arguments = dict(arguments or {})
+    
+    if isinstance(arguments.get("ingredients"), list):
+        arguments["ingredients"] = list(canonicalize_ingredients(arguments["ingredients"]))
+    if isinstance(arguments.get("ingredient"), str):
+        arguments["ingredient"] = normalize_ingredient(arguments["ingredient"])
+    if isinstance(arguments.get("query"), str):
+        arguments["query"] = " ".join(arguments["query"].lower().split())
+    
+    return f"{tool_name}:{json.dumps(arguments, sort_keys=True, ensure_ascii=False)}"
+
+
+def _message(text: str) -> Dict[str, str]:
+    """Result whose LLM and display renderings are the same text"""
+    return {"content": text, "display": text}
+
+
+def _log_token_savings(tool_name: str, result: Dict[str, str]) -> None:
+    """Log how many prompt tokens the compact rendering saves (debug logging only)"""
+    if result["content"] == result["display"] or not logger.isEnabledFor(logging.DEBUG):
+        return
+    
+    rich_tokens = count_tokens(DEFAULT_MODEL, [{"role": "tool", "content": result["display"]}])
+    compact_tokens = count_tokens(DEFAULT_MODEL, [{"role": "tool", "content": result["content"]}])
+    logger.debug(
+        f"Tool {tool_name} result: {rich_tokens} → {compact_tokens} tokens "
+        f"(saved {rich_tokens - compact_tokens})"
+    )
+
+
+def _execute_search_web(search_tool: WebSearchTool, arguments: dict) -> Dict[str, str]:
     """Execute web search tool"""
     query = arguments.get("query", "")
     num_results = arguments.get("num_results", 5)
     
     if not query:
-        return "❌ กรุณาระบุคำค้นหา"
+        return _message("❌ กรุณาระบุคำค้นหา")
     
     results = search_tool.search(query, num_results)
     formatted = search_tool.format_results(results)
-    return formatted or "ไม่พบผลการค้นหา"
+    
+    if not formatted:
+        return _message("ไม่พบผลการค้นหา")
+    
+    return {
+        "content": search_tool.format_results_compact(results),
+        "display": formatted
+    }
 
 
-def _execute_search_recipes(cook_tool: CookTool, arguments: dict) -> str:
+def _execute_search_recipes(cook_tool: CookTool, arguments: dict) -> Dict[str, str]:
     """Execute recipe search tool"""
     ingredients = arguments.get("ingredients", [])
     
     if not ingredients:
-        return "❌ กรุณาระบุวัตถุดิบ"
+        return _message("❌ กรุณาระบุวัตถุดิบ")
     
     recipes = cook_tool.search_recipes(ingredients)
     
     if isinstance(recipes, dict) and "error" in recipes:
         logger.error(f"Recipe search error: {recipes['error']}")
-        return "⚠️ ไม่สามารถค้นหาสูตรอาหารได้ กรุณาลองใหม่อีกครั้ง"
+        return _message(recipes.get("user_message") or "⚠️ ไม่สามารถค้นหาสูตรอาหารได้ กรุณาลองใหม่อีกครั้ง")
     
     if not recipes:
-        return f"❌ ไม่พบสูตรอาหารสำหรับ: {', '.join(ingredients)}"
+        return _message(f"❌ ไม่พบสูตรอาหารสำหรับ: {', '.join(ingredients)}")
+    
+    if arguments.get("include_nutrition"):
+        try:
+            recipes = cook_tool.add_recipe_nutrition(recipes, arguments.get("servings"))
+        except Exception as e:
+            logger.warning(f"Recipe nutrition failed: {str(e)}")
     
-    return cook_tool.format_recipes(recipes) or "❌ ไม่สามารถแสดงสูตรได้"
+    return {
+        "content": cook_tool.format_recipes_compact(recipes),
+        "display": cook_tool.format_recipes(recipes) or "❌ ไม่สามารถแสดงสูตรได้"
+    }
 
 
-def _execute_get_nutrition(cook_tool: CookTool, arguments: dict) -> str:
+def _execute_get_nutrition(cook_tool: CookTool, arguments: dict) -> Dict[str, str]:
     """Execute nutrition lookup tool"""
     ingredient = arguments.get("ingredient", "")
     
     if not ingredient:
-        return "❌ กรุณาระบุวัตถุดิบ"
+        return _message("❌ กรุณาระบุวัตถุดิบ")
     
     nutrition = cook_tool.get_nutrition(ingredient)
     
     if "error" in nutrition:
         logger.error(f"Nutrition error: {nutrition['error']}")
-        return f"⚠️ ไม่พบข้อมูลโภชนาการของ '{ingredient}'"
+        return _message(nutrition.get("user_message") or f"⚠️ ไม่พบข้อมูลโภชนาการของ '{ingredient}'")
     
-    return cook_tool.format_nutrition(nutrition)
\ No newline at end of file
+    return {
+        "content": cook_tool.format_nutrition_compact(nutrition),
+        "display": cook_tool.format_nutrition(nutrition)
+    }
+
+
+def _execute_get_nutrition_batch(cook_tool: CookTool, arguments: dict) -> Dict[str, str]:
+    """Execute batch nutrition lookup tool"""
+    ingredients = [i for i in arguments.get("ingredients", []) if isinstance(i, str) and i.strip()]
+    
+    if not ingredients:
+        return _message("❌ กรุณาระบุวัตถุดิบ")
+    
+    rows = cook_tool.get_nutrition_batch(ingredients)
+    
+    if all("error" in row for row in rows):
+        logger.error(f"Nutrition batch error: {rows[0]['error']}")
+        return _message(rows[0].get("user_message") or f"⚠️ ไม่พบข้อมูลโภชนาการของ '{', '.join(ingredients)}'")
+    
+    return {
+        "content": cook_tool.format_nutrition_table_compact(rows),
+        "display": cook_tool.format_nutrition_table(rows)
+    }
+
+
+def _execute_find_foods_by_nutrients(matrix: NutrientMatrix, arguments: dict) -> Dict[str, str]:
+    """Execute nutrient target query tool"""
+    if matrix is None:
+        return _message("⚠️ ยังไม่ได้สร้างตารางโภชนาการ (python -m nutrient_matrix build) กรุณาใช้ get_nutrition แทน")
+    
+    filters = [f for f in arguments.get("filters", []) if isinstance(f, dict) and f.get("nutrient")]
+    sort_by = arguments.get("sort_by")
+    
+    if not filters and not sort_by:
+        return _message("❌ กรุณาระบุเงื่อนไขโภชนาการ")
+    
+    try:
+        result = matrix.query(
+            filters=filters,
+            sort_by=sort_by,
+            descending=arguments.get("order", "desc") != "asc",
+            contains=arguments.get("contains"),
+            limit=int(arguments.get("limit", 10))
+        )
+    except KeyError as e:
+        return _message(f"❌ ไม่รู้จักสารอาหาร {e}")
+    except (TypeError, ValueError):
+        return _message("❌ เงื่อนไขโภชนาการไม่ถูกต้อง")
+    
+    return {
+        "content": matrix.format_results_compact(result),
+        "display": matrix.format_results(result)
+    }
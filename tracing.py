@@ -0,0 +1,200 @@
+"""
+Lightweight latency tracing for ChefBot
+
+Spans nest through a context variable, so they follow asyncio tasks and
+asyncio.to_thread workers automatically. When a root span ends, the whole
+trace is appended to a local JSONL file using OTLP-style field names. The
+file is rotated by size, keeping a few older files.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+from config import TRACING_ENABLED, TRACE_FILE, TRACE_FILE_MAX_BYTES, TRACE_FILE_BACKUPS
+
+logger = logging.getLogger(__name__)
+
+_current_span = contextvars.ContextVar("chefbot_current_span", default=None)
+_sink_lock = threading.Lock()
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.start = time.time()
+        self.end = None
+
+        # All spans of a trace share one list, owned by the root
+        self.spans = parent.spans if parent else []
+        self.spans.append(self)
+
+    def set(self, key: str, value: Any) -> None:
+        """Set a span attribute"""
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        """Span duration in milliseconds, or None while running"""
+        if self.end is None:
+            return None
+        return (self.end - self.start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize span with OTLP-style field names"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": int(self.start * 1e9),
+            "endTimeUnixNano": int(self.end * 1e9) if self.end else None,
+            "attributes": self.attributes
+        }
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block of code as a span
+
+    Args:
+        name: Span name (e.g. "llm.completion", "http.spoonacular")
+        **attributes: Initial span attributes
+
+    Yields:
+        Span object (use span.set() to add attributes)
+    """
+    parent = _current_span.get()
+    current = Span(name, parent, attributes)
+    token = _current_span.set(current)
+
+    try:
+        yield current
+    except BaseException as e:
+        current.set("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        current.end = time.time()
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Generator finalized from another context; nothing to restore
+            pass
+
+        if parent is None:
+            _export(current.spans)
+
+
+def current_span() -> Optional[Span]:
+    """Return the active span, if any"""
+    return _current_span.get()
+
+
+def trace_to_dicts(root: Span) -> List[Dict[str, Any]]:
+    """Serialize every span of root's trace"""
+    return [s.to_dict() for s in root.spans]
+
+
+def _export(spans: List[Span]) -> None:
+    """Append a finished trace to the JSONL sink"""
+    if not TRACING_ENABLED or not TRACE_FILE:
+        return
+
+    try:
+        directory = os.path.dirname(TRACE_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        lines = "".join(
+            json.dumps(s.to_dict(), ensure_ascii=False, default=str) + "\n"
+            for s in spans
+        )
+        with _sink_lock:
+            _rotate(len(lines.encode("utf-8")))
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+    except OSError as e:
+        logger.warning(f"Could not write trace: {str(e)}")
+
+
+def _rotate(incoming: int) -> None:
+    """Rotate the sink before a write would pass TRACE_FILE_MAX_BYTES (caller holds the lock)"""
+    try:
+        size = os.path.getsize(TRACE_FILE)
+    except OSError:
+        return
+    if size == 0 or size + incoming <= TRACE_FILE_MAX_BYTES:
+        return
+
+    if TRACE_FILE_BACKUPS <= 0:
+        os.remove(TRACE_FILE)
+        return
+
+    for i in range(TRACE_FILE_BACKUPS - 1, 0, -1):
+        older = f"{TRACE_FILE}.{i}"
+        if os.path.exists(older):
+            os.replace(older, f"{TRACE_FILE}.{i + 1}")
+    os.replace(TRACE_FILE, f"{TRACE_FILE}.1")
+
+
+def render_waterfall(spans: List[Dict[str, Any]], width: int = 40) -> str:
+    """
+    Render serialized spans as a text waterfall
+
+    Args:
+        spans: Spans from trace_to_dicts()
+        width: Width of the timeline in characters
+
+    Returns:
+        Monospace waterfall text
+    """
+    if not spans:
+        return ""
+
+    by_id = {s["spanId"]: s for s in spans}
+    trace_start = min(s["startTimeUnixNano"] for s in spans)
+    trace_end = max(s["endTimeUnixNano"] or s["startTimeUnixNano"] for s in spans)
+    total = max(trace_end - trace_start, 1)
+
+    children = {}
+    for s in sorted(spans, key=lambda s: s["startTimeUnixNano"]):
+        parent_id = s["parentSpanId"] if s["parentSpanId"] in by_id else None
+        children.setdefault(parent_id, []).append(s)
+
+    # Depth-first order so every span sits under its parent
+    ordered = []
+    stack = [(s, 0) for s in reversed(children.get(None, []))]
+    while stack:
+        s, level = stack.pop()
+        ordered.append((s, level))
+        stack.extend((c, level + 1) for c in reversed(children.get(s["spanId"], [])))
+
+    lines = []
+    for s, level in ordered:
+        end = s["endTimeUnixNano"] or trace_end
+        offset = min(int((s["startTimeUnixNano"] - trace_start) / total * width), width - 1)
+        length = max(1, int((end - s["startTimeUnixNano"]) / total * width))
+        bar = " " * offset + "█" * min(length, width - offset)
+
+        label = ("  " * level + s["name"])[:28]
+        duration = f"{(end - s['startTimeUnixNano']) / 1e6:7.0f} ms"
+        if s["endTimeUnixNano"] is None:
+            duration += " …"
+        if "error" in s["attributes"]:
+            duration += " ⚠"
+
+        lines.append(f"{label:<28} {bar:<{width}} {duration}")
+
+    return "\n".join(lines)
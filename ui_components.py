@@ -3,6 +3,7 @@ UI components and styling for ChefBot
 """
 import streamlit as st
 from config import BOT_AVATAR, USER_AVATAR, MODELS
+from tracing import render_waterfall
 
 
 def apply_custom_css():
@@ -196,10 +197,59 @@ def render_sidebar():
                 - 📊 **โภชนาการ** - USDA Database
                 """)
         
+        # Debug panel
+        st.markdown("---")
+        st.session_state.debug = st.toggle("🐞 Debug", value=st.session_state.debug)
+        if st.session_state.debug:
+            _render_debug_panel()
+        
         # Chat history
         _render_chat_history()
 
 
+def _render_debug_panel():
+    """Render latency waterfall of recent turns and shared tool counters"""
+    traces = st.session_state.traces
+    
+    if not traces:
+        st.caption("ยังไม่มีข้อมูลเวลา")
+    else:
+        with st.expander("⏱️ Latency waterfall", expanded=True):
+            index = st.selectbox(
+                "Trace",
+                range(len(traces)),
+                format_func=lambda i: "ล่าสุด" if i == 0 else f"ก่อนหน้า {i}",
+                key="debug_trace"
+            )
+            st.code(render_waterfall(traces[index]), language=None)
+    
+    from tools_executor import tool_metrics
+    
+    metrics = tool_metrics()
+    tripped = [
+        f"{section.split(' ', 1)[1]} ({counters['state']})"
+        for section, counters in metrics.items()
+        if section.startswith("breaker ") and counters["state"] != "closed"
+    ]
+    if tripped:
+        st.warning(f"🔌 Circuit breaker: {', '.join(tripped)}")
+    
+    with st.expander("📈 Tool metrics"):
+        st.code(_format_metrics(metrics), language=None)
+
+
+def _format_metrics(metrics: dict) -> str:
+    """Counters as aligned "section  name  value" lines"""
+    lines = []
+    for section, counters in metrics.items():
+        lines.append(section)
+        for name, value in counters.items():
+            if isinstance(value, float):
+                value = f"{value:.0%}" if name.endswith("rate") else f"{value:.2f}"
+            lines.append(f"  {name:<14} {value}")
+    return "\n".join(lines)
+
+
 def _render_chat_history():
     """Render chat history in sidebar"""
     st.markdown("---")
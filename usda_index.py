@@ -0,0 +1,395 @@
+"""
+Local USDA FoodData Central index
+
+Imports the public FDC bulk download (CSV or JSON, e.g. Foundation Foods or
+SR Legacy from https://fdc.nal.usda.gov/download-datasets) into SQLite with
+an FTS5 index on food descriptions. CookTool.get_nutrition answers from it
+first and only calls the USDA API on a miss.
+
+Usage:
+    python -m usda_index import FoodData_Central_sr_legacy_food_csv_2018-04.zip
+    python -m usda_index import ./FoodData_Central_foundation_food_json.json
+    python -m usda_index search "chicken breast"
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from config import USDA_INDEX_FILE
+
+logger = logging.getLogger(__name__)
+
+# Preferred data types first; generic foods beat branded products
+DATA_TYPE_PRIORITY = {
+    "foundation_food": 0, "foundation": 0,
+    "sr_legacy_food": 1, "sr legacy": 1,
+    "survey_fndds_food": 2, "survey (fndds)": 2,
+    "branded_food": 3, "branded": 3,
+}
+
+# Every food gets one "Energy" (kcal) value under the standard FDC nutrient id.
+# Foundation foods often only report the Atwater energies, and some foods only
+# kJ, so the best available source is used, converted to kcal.
+ENERGY_ID = 1008
+ENERGY_NAMES = ["Energy", "Energy (Atwater Specific Factors)", "Energy (Atwater General Factors)"]
+KJ_PER_KCAL = 4.184
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS foods (
+    fdc_id INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    data_type TEXT,
+    priority INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS nutrients (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    unit TEXT
+);
+CREATE TABLE IF NOT EXISTS food_nutrients (
+    fdc_id INTEGER NOT NULL,
+    nutrient_id INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    PRIMARY KEY (fdc_id, nutrient_id)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS foods_fts USING fts5(
+    description,
+    content='foods',
+    content_rowid='fdc_id',
+    tokenize='porter unicode61'
+);
+"""
+
+BATCH_SIZE = 10000
+
+csv.field_size_limit(sys.maxsize)
+
+
+class USDAIndex:
+    """Read-only lookups against an imported FDC database"""
+
+    def __init__(self, path: str = USDA_INDEX_FILE):
+        """
+        Initialize index
+
+        Args:
+            path: SQLite database created by the importer
+        """
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One read-only connection per thread (sqlite3 objects are not shared)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def search(self, query: str, limit: int = 1) -> List[Dict[str, Any]]:
+        """
+        Full-text search on food descriptions
+
+        Args:
+            query: English food name (e.g. "chicken breast")
+            limit: Maximum matches
+
+        Returns:
+            Matches with "fdc_id", "description" and "data_type", best first
+        """
+        match = _fts_query(query)
+        if not match:
+            return []
+
+        rows = self._connection().execute(
+            """
+            SELECT f.fdc_id, f.description, f.data_type
+            FROM foods_fts
+            JOIN foods f ON f.fdc_id = foods_fts.rowid
+            WHERE foods_fts MATCH ?
+            ORDER BY bm25(foods_fts), f.priority, length(f.description)
+            LIMIT ?
+            """,
+            (match, limit)
+        ).fetchall()
+
+        return [{"fdc_id": r[0], "description": r[1], "data_type": r[2]} for r in rows]
+
+    def nutrients(self, fdc_id: int) -> Dict[str, float]:
+        """Nutrient name -> amount per 100g for one food"""
+        rows = self._connection().execute(
+            """
+            SELECT n.name, fn.amount
+            FROM food_nutrients fn
+            JOIN nutrients n ON n.id = fn.nutrient_id
+            WHERE fn.fdc_id = ?
+            """,
+            (fdc_id,)
+        ).fetchall()
+        return dict(rows)
+
+    def lookup(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Best match in the same shape as CookTool.get_nutrition
+
+        Returns:
+            {"description", "nutrients"} or None on a miss
+        """
+        matches = self.search(query, limit=1)
+        if not matches:
+            return None
+
+        nutrients = self.nutrients(matches[0]["fdc_id"])
+        if not nutrients:
+            return None
+
+        return {"description": matches[0]["description"], "nutrients": nutrients}
+
+
+def _energy_source(name: str, unit: Optional[str]) -> Optional[Tuple[int, float]]:
+    """
+    Rank and kcal factor of an energy nutrient
+
+    Returns:
+        (rank, factor) with lower ranks preferred (kcal before kJ), or None
+        if the nutrient is not an energy value
+    """
+    if name not in ENERGY_NAMES:
+        return None
+    unit = (unit or "").lower()
+    if unit == "kcal":
+        return ENERGY_NAMES.index(name), 1.0
+    if unit == "kj":
+        return len(ENERGY_NAMES) + ENERGY_NAMES.index(name), 1 / KJ_PER_KCAL
+    return None
+
+
+def _fts_query(text: str) -> str:
+    """Quote every word so user text cannot inject FTS5 syntax; words are ANDed"""
+    words = re.findall(r"\w+", text.lower())
+    return " ".join(f'"{w}"' for w in words)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_usda_index() -> Optional[USDAIndex]:
+    """Shared index, or None if no database has been imported"""
+    global _index
+    with _index_lock:
+        if _index is None and USDA_INDEX_FILE and os.path.exists(USDA_INDEX_FILE):
+            _index = USDAIndex(USDA_INDEX_FILE)
+        return _index
+
+
+# ---------------------------------------------------------------------------
+# Importer
+# ---------------------------------------------------------------------------
+
+def import_fdc(sources: List[str], db_path: str = USDA_INDEX_FILE) -> Dict[str, int]:
+    """
+    Import FDC bulk downloads into the index database
+
+    Args:
+        sources: CSV directories, JSON files, or .zip downloads of either
+        db_path: Database to create or extend
+
+    Returns:
+        Counts of imported foods and nutrient values
+    """
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executescript(SCHEMA)
+
+    counts = {"foods": 0, "values": 0}
+
+    try:
+        for source in sources:
+            files = _open_source(source)
+            if "food.csv" in files:
+                _import_csv(conn, files, counts)
+            else:
+                for name, opener in files.items():
+                    if name.endswith(".json"):
+                        _import_json(conn, opener, counts)
+
+        conn.execute("INSERT INTO foods_fts(foods_fts) VALUES ('rebuild')")
+        conn.commit()
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+
+    return counts
+
+
+def _open_source(path: str) -> Dict[str, Any]:
+    """Map file basenames in a directory, zip or single file to openers"""
+    if os.path.isdir(path):
+        return {
+            name: (lambda p=os.path.join(path, name): open(p, "rb"))
+            for name in os.listdir(path)
+        }
+
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        return {
+            os.path.basename(info.filename): (lambda i=info: archive.open(i))
+            for info in archive.infolist()
+            if not info.is_dir()
+        }
+
+    return {os.path.basename(path): (lambda: open(path, "rb"))}
+
+
+def _read_csv(opener) -> Iterator[Dict[str, str]]:
+    with opener() as raw:
+        yield from csv.DictReader(io.TextIOWrapper(raw, encoding="utf-8", newline=""))
+
+
+def _import_csv(conn: sqlite3.Connection, files: Dict[str, Any], counts: Dict[str, int]) -> None:
+    """Import food.csv, nutrient.csv and food_nutrient.csv"""
+    nutrient_rows, energy_sources = [], {}
+    for r in _read_csv(files["nutrient.csv"]):
+        source = _energy_source(r["name"], r.get("unit_name"))
+        if source is not None:
+            energy_sources[int(r["id"])] = source
+        if r.get("unit_name", "").lower() != "kj":  # kJ values only feed Energy
+            nutrient_rows.append((int(r["id"]), r["name"], r["unit_name"]))
+    nutrient_rows.append((ENERGY_ID, "Energy", "KCAL"))
+    conn.executemany("INSERT OR REPLACE INTO nutrients VALUES (?, ?, ?)", nutrient_rows)
+    kept_nutrients = {row[0] for row in nutrient_rows}
+
+    food_ids = set()
+    batch = []
+    for r in _read_csv(files["food.csv"]):
+        priority = DATA_TYPE_PRIORITY.get(r.get("data_type", "").lower())
+        if priority is None:
+            continue  # Lab sample and acquisition records, not foods
+        food_ids.add(int(r["fdc_id"]))
+        batch.append((int(r["fdc_id"]), r["description"], r["data_type"], priority))
+        if len(batch) >= BATCH_SIZE:
+            conn.executemany("INSERT OR REPLACE INTO foods VALUES (?, ?, ?, ?)", batch)
+            batch = []
+    conn.executemany("INSERT OR REPLACE INTO foods VALUES (?, ?, ?, ?)", batch)
+    counts["foods"] += len(food_ids)
+
+    batch, energy = [], {}
+    for r in _read_csv(files["food_nutrient.csv"]):
+        fdc_id, nutrient_id = int(r["fdc_id"]), int(r["nutrient_id"])
+        if fdc_id not in food_ids or not r.get("amount"):
+            continue
+        source = energy_sources.get(nutrient_id)
+        if source is not None and (fdc_id not in energy or source[0] < energy[fdc_id][0]):
+            energy[fdc_id] = (source[0], float(r["amount"]) * source[1])
+        if nutrient_id not in kept_nutrients or nutrient_id == ENERGY_ID:
+            continue
+        batch.append((fdc_id, nutrient_id, float(r["amount"])))
+        if len(batch) >= BATCH_SIZE:
+            conn.executemany("INSERT OR REPLACE INTO food_nutrients VALUES (?, ?, ?)", batch)
+            counts["values"] += len(batch)
+            batch = []
+    batch.extend((fdc_id, ENERGY_ID, kcal) for fdc_id, (_, kcal) in energy.items())
+    conn.executemany("INSERT OR REPLACE INTO food_nutrients VALUES (?, ?, ?)", batch)
+    counts["values"] += len(batch)
+
+
+def _import_json(conn: sqlite3.Connection, opener, counts: Dict[str, int]) -> None:
+    """Import a JSON download ({"FoundationFoods": [...]}, {"SRLegacyFoods": [...]}, ...)"""
+    with opener() as raw:
+        data = json.load(raw)
+
+    foods = [food for value in data.values() if isinstance(value, list) for food in value]
+
+    for food in foods:
+        priority = DATA_TYPE_PRIORITY.get(str(food.get("dataType", "")).lower())
+        if priority is None or "fdcId" not in food:
+            continue
+
+        conn.execute(
+            "INSERT OR REPLACE INTO foods VALUES (?, ?, ?, ?)",
+            (food["fdcId"], food.get("description", ""), food.get("dataType"), priority)
+        )
+        counts["foods"] += 1
+
+        values, energy = [], None
+        for item in food.get("foodNutrients", []):
+            nutrient = item.get("nutrient") or {}
+            if "id" not in nutrient or item.get("amount") is None:
+                continue
+            source = _energy_source(nutrient.get("name", ""), nutrient.get("unitName"))
+            if source is not None and (energy is None or source[0] < energy[0]):
+                energy = (source[0], float(item["amount"]) * source[1])
+            if (source is not None and source[0] == 0) or \
+               str(nutrient.get("unitName", "")).lower() == "kj":
+                continue  # Written below as the food's single Energy value
+            conn.execute(
+                "INSERT OR REPLACE INTO nutrients VALUES (?, ?, ?)",
+                (nutrient["id"], nutrient.get("name", ""), nutrient.get("unitName"))
+            )
+            values.append((food["fdcId"], nutrient["id"], float(item["amount"])))
+
+        if energy is not None:
+            conn.execute("INSERT OR REPLACE INTO nutrients VALUES (?, ?, ?)", (ENERGY_ID, "Energy", "KCAL"))
+            values.append((food["fdcId"], ENERGY_ID, energy[1]))
+
+        conn.executemany("INSERT OR REPLACE INTO food_nutrients VALUES (?, ?, ?)", values)
+        counts["values"] += len(values)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Local USDA FoodData Central index")
+    parser.add_argument("--db", default=USDA_INDEX_FILE, help="Index database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="Import FDC CSV/JSON downloads")
+    importer.add_argument("sources", nargs="+", help="CSV directory, JSON file or .zip")
+
+    search = commands.add_parser("search", help="Look up a food")
+    search.add_argument("query")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        start = time.time()
+        counts = import_fdc(args.sources, args.db)
+        print(
+            f"Imported {counts['foods']} foods and {counts['values']} nutrient values "
+            f"into {args.db} in {time.time() - start:.1f}s"
+        )
+        return 0
+
+    if not os.path.exists(args.db):
+        print(f"No index at {args.db}; run the import command first")
+        return 1
+
+    start = time.perf_counter()
+    result = USDAIndex(args.db).lookup(args.query)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    if result is None:
+        print(f"No match ({elapsed_ms:.2f} ms)")
+        return 1
+
+    print(f"{result['description']} ({elapsed_ms:.2f} ms)")
+    for name, amount in sorted(result["nutrients"].items()):
+        print(f"  {name}: {amount}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,8 @@ import os
 from typing import List, Dict, Any, Optional
 from litellm import completion
 import logging
+import tracing
+from utils import llm_router
 
 logger = logging.getLogger(__name__)
 
@@ -81,12 +83,13 @@ class LLMClient:
             Response text
         """
         try:
-            response = completion(
-                model=self.model,
-                messages=messages,
-                temperature=kwargs.get('temperature', self.temperature),
-                max_tokens=kwargs.get('max_tokens', self.max_tokens)
-            )
+            with tracing.span("llm.completion", model=self.model):
+                response = llm_router.completion(
+                    model=self.model,
+                    messages=messages,
+                    temperature=kwargs.get('temperature', self.temperature),
+                    max_tokens=kwargs.get('max_tokens', self.max_tokens)
+                )
             
             return response.choices[0].message.content
         
@@ -122,12 +125,13 @@ class LLMClient:
         ]
         
         try:
-            response = completion(
-                model=self.model,
-                messages=messages,
-                temperature=kwargs.get('temperature', self.temperature),
-                max_tokens=kwargs.get('max_tokens', self.max_tokens)
-            )
+            with tracing.span("llm.vision", model=self.model):
+                response = completion(
+                    model=self.model,
+                    messages=messages,
+                    temperature=kwargs.get('temperature', self.temperature),
+                    max_tokens=kwargs.get('max_tokens', self.max_tokens)
+                )
             
             return response.choices[0].message.content
         
@@ -0,0 +1,310 @@
+"""
+Hedged, latency-aware routing for LLM calls
+
+acompletion() and completion() are drop-in replacements for the litellm
+functions. They track rolling latency per model. If the primary model has
+not answered within its p95 latency, they send a duplicate request to an
+equivalent backup model (HEDGE_BACKUP_MODELS), take whichever answers first
+and cancel the other. A failed primary fails over to the backup immediately.
+Only the answer that is used adds a latency sample: cancelled and losing
+attempts would pull the p95 down.
+"""
+import asyncio
+import contextvars
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait, FIRST_COMPLETED
+from typing import Any, Dict, Optional, Tuple
+import litellm
+import tracing
+from config import (
+    HEDGE_BACKUP_MODELS,
+    HEDGE_DEFAULT_DELAY,
+    HEDGE_MIN_DELAY,
+    HEDGE_MIN_SAMPLES,
+    LATENCY_WINDOW
+)
+
+logger = logging.getLogger(__name__)
+
+# Blocking calls are raced on this pool (threads cannot be cancelled; a
+# losing call finishes in the background and its result is dropped)
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+
+
+class LatencyTracker:
+    """Rolling latency samples per key"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float) -> None:
+        """Add a latency sample"""
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, key: str, pct: float, min_samples: int = HEDGE_MIN_SAMPLES) -> Optional[float]:
+        """
+        Latency percentile for key
+
+        Returns:
+            Seconds, or None with fewer than min_samples samples
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+
+        if len(samples) < min_samples:
+            return None
+
+        rank = max(1, math.ceil(pct / 100 * len(samples)))
+        return samples[rank - 1]
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Sample count and p50/p95 for every key"""
+        with self._lock:
+            keys = list(self._samples)
+        return {
+            key: {
+                "samples": len(self._samples[key]),
+                "p50": self.percentile(key, 50, 1),
+                "p95": self.percentile(key, 95, 1)
+            }
+            for key in keys
+        }
+
+
+class LLMRouter:
+    """Races a primary model against an equivalent backup on slow answers"""
+
+    def __init__(self, backups: Optional[Dict[str, str]] = None):
+        """
+        Initialize router
+
+        Args:
+            backups: Map of model -> equivalent backup model
+        """
+        self.backups = backups if backups is not None else HEDGE_BACKUP_MODELS
+        self.latency = LatencyTracker()
+
+    def backup_for(self, model: str) -> Optional[str]:
+        """Backup model for model, if one is configured and has an API key"""
+        backup = self.backups.get(model)
+        if backup and _has_credentials(backup):
+            return backup
+        return None
+
+    def hedge_delay(self, model: str, stream: bool) -> float:
+        """Seconds to wait for the primary before sending the hedge"""
+        p95 = self.latency.percentile(_latency_key(model, stream), 95)
+        if p95 is None:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, p95)
+
+    async def acompletion(self, **kwargs) -> Any:
+        """
+        Hedged litellm.acompletion
+
+        For streamed calls "answered" means the first chunk arrived; the
+        returned stream replays that chunk first.
+        """
+        model = kwargs["model"]
+        stream = bool(kwargs.get("stream"))
+        backup = self.backup_for(model)
+
+        if backup is None:
+            return self._use(model, stream, await self._attempt(model, kwargs))
+
+        primary = asyncio.create_task(self._attempt(model, kwargs))
+        models = {primary: model}
+        winner = None
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay(model, stream))
+
+            if primary in done:
+                if primary.exception() is None:
+                    winner = primary
+                    return self._use(model, stream, primary.result())
+                logger.warning(f"{model} failed, failing over to {backup}: {primary.exception()}")
+                failover = asyncio.create_task(self._attempt(backup, kwargs, hedge=True))
+                models[failover] = backup
+                response = await failover
+                winner = failover
+                return self._use(backup, stream, response)
+
+            logger.info(f"{model} slower than its p95, hedging with {backup}")
+            secondary = asyncio.create_task(self._attempt(backup, kwargs, hedge=True))
+            models[secondary] = backup
+            pending = {primary, secondary}
+            error = None
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    winner = task
+                    return self._use(models[task], stream, task.result())
+
+            raise error
+
+        finally:
+            # asyncio.wait never cancels what it waits on: stop every attempt
+            # that did not win (also when the caller is cancelled) and close
+            # the streams of those that already answered
+            for task in models:
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                else:
+                    await _close_stream(task)
+
+    def completion(self, **kwargs) -> Any:
+        """Hedged litellm.completion for blocking callers (non-streaming)"""
+        model = kwargs["model"]
+        backup = self.backup_for(model)
+
+        if backup is None:
+            return self._use(model, False, self._attempt_sync(model, kwargs))
+
+        primary = _submit(self._attempt_sync, model, kwargs)
+
+        try:
+            return self._use(model, False, primary.result(timeout=self.hedge_delay(model, False)))
+        except FutureTimeout:
+            pass
+        except Exception as e:
+            logger.warning(f"{model} failed, failing over to {backup}: {str(e)}")
+            return self._use(backup, False, self._attempt_sync(backup, kwargs, True))
+
+        logger.info(f"{model} slower than its p95, hedging with {backup}")
+        secondary = _submit(self._attempt_sync, backup, kwargs, True)
+        models = {primary: model, secondary: backup}
+        pending = {primary, secondary}
+        error = None
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+
+                for loser in pending:
+                    loser.cancel()
+                return self._use(models[future], False, future.result())
+
+        raise error
+
+    def _use(self, model: str, stream: bool, attempt: Tuple[Any, float]) -> Any:
+        """Record the latency of the attempt whose response is used and return it"""
+        response, seconds = attempt
+        self.latency.record(_latency_key(model, stream), seconds)
+        return response
+
+    async def _attempt(self, model: str, kwargs: Dict[str, Any], hedge: bool = False) -> Tuple[Any, float]:
+        """
+        One async call; streamed calls return once the first chunk arrived
+
+        Returns:
+            (response, seconds until it answered)
+        """
+        stream = bool(kwargs.get("stream"))
+
+        with tracing.span("llm.attempt", model=model, hedge=hedge):
+            start = time.time()
+            response = await litellm.acompletion(**{**kwargs, "model": model})
+
+            if stream:
+                iterator = response.__aiter__()
+                try:
+                    first = await iterator.__anext__()
+                except StopAsyncIteration:
+                    first = None
+                except BaseException:
+                    await _aclose(iterator)
+                    raise
+                response = _replay(first, iterator)
+
+            return response, time.time() - start
+
+    def _attempt_sync(self, model: str, kwargs: Dict[str, Any], hedge: bool = False) -> Tuple[Any, float]:
+        """One blocking call; returns (response, seconds)"""
+        with tracing.span("llm.attempt", model=model, hedge=hedge):
+            start = time.time()
+            response = litellm.completion(**{**kwargs, "model": model})
+            return response, time.time() - start
+
+
+async def _replay(first, iterator):
+    """Yield an already-received first chunk, then the rest of the stream"""
+    try:
+        if first is not None:
+            yield first
+        async for chunk in iterator:
+            yield chunk
+    finally:
+        await _aclose(iterator)
+
+
+async def _aclose(stream) -> None:
+    """Close a stream; litellm's stream wrapper only closes through the stream it wraps"""
+    for target in (stream, getattr(stream, "completion_stream", None)):
+        if hasattr(target, "aclose"):
+            await target.aclose()
+            return
+
+
+async def _close_stream(task: asyncio.Task) -> None:
+    """Close the stream of a losing attempt that also completed"""
+    if not task.cancelled() and task.exception() is None:
+        await _aclose(task.result()[0])
+
+
+def _submit(fn, *args):
+    """Run fn on the hedge pool, keeping the caller's tracing context"""
+    return _executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _latency_key(model: str, stream: bool) -> str:
+    return f"{model}:{'ttft' if stream else 'total'}"
+
+
+def _has_credentials(model: str) -> bool:
+    """Whether the provider of model has an API key configured"""
+    if model.startswith("groq/"):
+        return bool(os.getenv("GROQ_API_KEY"))
+    return bool(os.getenv("OPENAI_API_KEY"))
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> LLMRouter:
+    """Process-wide router, so latency history is shared by all sessions"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = LLMRouter()
+        return _router
+
+
+async def acompletion(**kwargs) -> Any:
+    """Drop-in replacement for litellm.acompletion with hedging"""
+    return await get_router().acompletion(**kwargs)
+
+
+def completion(**kwargs) -> Any:
+    """Drop-in replacement for litellm.completion with hedging"""
+    return get_router().completion(**kwargs)
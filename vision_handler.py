@@ -4,6 +4,7 @@ Vision and image processing utilities for ChefBot
 import os
 import logging
 from typing import Dict, List, Any, Optional
+import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -50,12 +51,14 @@ def detect_ingredients(
         return []
     
     try:
-        detection = detect_ingredients_from_image(
-            image_file,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            prefer_provider=None
-        )
+        with tracing.span("vision.detect") as vision_span:
+            detection = detect_ingredients_from_image(
+                image_file,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                prefer_provider=None
+            )
+            vision_span.set("ingredients", len(detection.get("ingredients", []) or []))
         
         ingredients = detection.get("ingredients", []) or []
         